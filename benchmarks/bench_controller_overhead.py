@@ -0,0 +1,101 @@
+# benchmarks/bench_controller_overhead.py
+"""
+Micro-benchmark: controller bookkeeping cost as the session state grows.
+
+Compares, for a growing `generated_images` list and a growing narrative
+(inspiration phrases and scene text):
+
+- before: every rerun validates the stored dict into an `AppState`; every run
+  dumps the whole state into the graph payload, validates the graph output into
+  a new `AppState` and dumps it back into the session;
+- after:  the session holds the `AppState` object; a run passes only the fields
+  the graph needs and applies the node updates with `apply_graph_updates`.
+
+Graph execution itself is not timed: each "run" applies the update a Stage 4
+run produces (one new image), so only the controller overhead is measured.
+
+Usage:
+    poetry run python benchmarks/bench_controller_overhead.py [--runs 50] [--sizes 0 100 1000 5000]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.schemas import (  # noqa: E402
+    AppState, CinematicNarrativeOutput, GeneratedImage, ImageGenerationParams, NarrativeState,
+)
+from src.core.state import apply_graph_updates  # noqa: E402
+
+
+def _make_state(size: int) -> AppState:
+    images = [
+        GeneratedImage(
+            image_url=f"https://example.com/{i}.png", model_used="sdxl",
+            prompt_used="A lone figure on a rain-soaked rooftop, neon reflections, cinematic lighting " * 3,
+            metadata={"aspect_ratio": "16:9", "candidate": 1, "batch_size": 1},
+        )
+        for i in range(size)
+    ]
+    scene_text = "The city exhales steam as the last train leaves. " * max(1, size // 10)
+    narrative = NarrativeState(
+        initial_idea="A secret is discovered.",
+        inspiration_phrases=[f"Motif {i}: a recurring image of broken clocks" for i in range(size)],
+        cinematic_output=CinematicNarrativeOutput(
+            before_scene_cinematic=scene_text, after_scene_cinematic=scene_text,
+            before_scene_prompt="before", after_scene_prompt="after", source_of_inspiration="AI",
+        ),
+    )
+    return AppState(
+        narrative_state=narrative, generated_images=images,
+        image_gen_params=ImageGenerationParams(prompt="A lone figure on a rooftop"),
+    )
+
+
+def _new_image() -> GeneratedImage:
+    return GeneratedImage(image_url="https://example.com/new.png", model_used="gpt-4o", prompt_used="new", metadata={"aspect_ratio": "1:1"})
+
+
+def _time_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"Median controller overhead in ms over {args.runs} runs (no graph execution)")
+    print(f"{'history':>8} | {'rerun before':>12} {'rerun after':>12} | {'run before':>11} {'run after':>10}")
+    for size in args.sizes:
+        state = _make_state(size)
+        stored_dict = state.model_dump()
+
+        # --- Per rerun (every widget interaction) ---
+        rerun_before = _time_ms(lambda: AppState.model_validate(stored_dict), args.runs)
+        session = {"app_state": state}
+        rerun_after = _time_ms(lambda: isinstance(session["app_state"], AppState), args.runs)
+
+        # --- Per workflow run (Stage 4 adds one image) ---
+        def run_before():
+            payload = state.model_dump()
+            output = dict(payload, generated_images=payload["generated_images"] + [_new_image().model_dump()])
+            session["app_state"] = AppState.model_validate(output).model_dump()
+
+        def run_after():
+            session["app_state"] = apply_graph_updates(state, [{"generated_images": [_new_image()], "error_message": None}])
+
+        print(f"{size:>8} | {rerun_before:>12.3f} {rerun_after:>12.4f} | {_time_ms(run_before, args.runs):>11.3f} {_time_ms(run_after, args.runs):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
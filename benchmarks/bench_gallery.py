@@ -0,0 +1,87 @@
+# benchmarks/bench_gallery.py
+"""
+Rerun cost of the Stage 4 gallery as the generation history grows.
+
+- before: every image of the history is rendered on each rerun (image, caption
+          and prompt expander; the old per-image download is left out, so this
+          is a lower bound);
+- after:  the history lives in the gallery store and `run_app.py` renders one
+          page of it.
+
+Both are timed with Streamlit's `AppTest`, as the median of several reruns
+after a warm-up run. Image URLs are placeholders; nothing is downloaded.
+
+Usage:
+    poetry run python benchmarks/bench_gallery.py [--runs 5] [--sizes 0 100 500 1000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("IMAGECODEX_CACHE_DIR", tempfile.mkdtemp(prefix="imagecodex-bench-"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from src.core.gallery import get_gallery_store  # noqa: E402
+from src.core.schemas import GeneratedImage  # noqa: E402
+
+
+def _images(count: int):
+    return [
+        GeneratedImage(
+            image_url=f"https://example.com/{i}.png", model_used=("sdxl", "gpt-4o", "kandinsky-2.2")[i % 3],
+            prompt_used="A lone figure on a rain-soaked rooftop, neon reflections, cinematic lighting",
+            metadata={"aspect_ratio": ("16:9", "1:1")[i % 2], "candidate": 1, "batch_size": 1},
+        )
+        for i in range(count)
+    ]
+
+
+def _render_everything(images):
+    import streamlit as st
+
+    for img in reversed(images):
+        with st.container(border=True):
+            st.image(img.image_url, caption=f"Generated with {img.model_used} ({img.metadata.get('aspect_ratio', 'N/A')})")
+            with st.expander("View Prompt Used"):
+                st.code(img.prompt_used, language="text")
+
+
+def _median_rerun_ms(at: AppTest, runs: int) -> float:
+    at.run()  # warm-up: imports, graph-free first render
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 100, 500, 1000])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    print(f"{'images':>8} {'before (ms)':>12} {'after (ms)':>11}")
+    for size in args.sizes:
+        images = _images(size)
+        before = _median_rerun_ms(AppTest.from_function(_render_everything, args=(images,), default_timeout=300), args.runs)
+
+        gallery_id = f"bench-{size}"
+        get_gallery_store().add(gallery_id, images)
+        app = AppTest.from_file("run_app.py", default_timeout=300)
+        app.query_params["gallery"] = gallery_id
+        after = _median_rerun_ms(app, args.runs)
+        print(f"{size:>8} {before:>12.1f} {after:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_refinement_session.py
+"""
+Cost of a 10-step "Refine Prompt A" session, before and after refinements
+went straight to the refiner.
+
+- before: the previous per-step call sequence, replayed with the same chains:
+          prompt engineer, inspector, refiner, inspector, with the analysis
+          and prompt sent to the inspector as indented JSON (the visual
+          analysis itself was served from its cache);
+- after:  the visual workflow graph as the app runs it now: the refiner, then
+          the inspector on compact JSON, which is skipped when the refined
+          prompt was critiqued before. Inspection runs inline here, so its
+          tokens and time are counted although the app runs it in the background.
+
+Both start from the same analysis and prompt (one Stage 1 run that is not
+counted) and get the same feedback. The report shows model calls, input and
+output tokens (from usage metadata) and wall time per session.
+
+This calls the OpenAI API: it needs OPENAI_API_KEY (read from `.env`) and
+costs a few cents per run.
+
+Usage:
+    poetry run python benchmarks/bench_refinement_session.py path/to/image.jpg
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(ROOT / ".env")
+
+from langchain_core.callbacks import BaseCallbackHandler  # noqa: E402
+
+from src.agents.inspector import get_inspector_chain  # noqa: E402
+from src.agents.prompt_engineer import get_prompt_engineer_chain  # noqa: E402
+from src.agents.refiner import get_refiner_chain  # noqa: E402
+from src.core.blobs import put_blob  # noqa: E402
+from src.graph import get_visual_workflow_graph  # noqa: E402
+
+FEEDBACK = [
+    "make it more futuristic",
+    "add a sense of urgency",
+    "shift the palette towards teal and orange",
+    "make the lighting harsher, like a midday sun",
+    "keep everything as it is",
+    "add light rain",
+    "make the main subject smaller in the frame",
+    "keep everything as it is",
+    "give it a film-grain, 35mm look",
+    "make the mood more hopeful",
+]
+
+
+class UsageCounter(BaseCallbackHandler):
+    """Counts model calls and adds up their token usage."""
+
+    def __init__(self):
+        self.calls = self.input_tokens = self.output_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        self.calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+
+def _legacy_inspect(analysis, prompt, run_config):
+    inputs = {"analysis": json.dumps(analysis.model_dump(), indent=2), "prompt": json.dumps(prompt.model_dump(), indent=2)}
+    get_inspector_chain().invoke(inputs, config=run_config)
+
+
+def before(state, usage: UsageCounter):
+    run_config = {"callbacks": [usage]}
+    analysis = state["visual_analysis"]
+    for feedback in FEEDBACK:
+        prompt = get_prompt_engineer_chain().invoke({"analysis": json.dumps(analysis.model_dump(), indent=2)}, config=run_config)
+        _legacy_inspect(analysis, prompt, run_config)
+        refined = get_refiner_chain().invoke({"original_prompt": prompt.prompt_body, "user_feedback": feedback}, config=run_config).content
+        _legacy_inspect(analysis, prompt.model_copy(update={"prompt_body": refined}), run_config)
+
+
+def after(state, usage: UsageCounter):
+    graph = get_visual_workflow_graph()
+    state = dict(state)
+    for feedback in FEEDBACK:
+        state = graph.invoke(
+            {**state, "user_feedback": feedback, "active_prompt_for_refinement": "image"},
+            config={"callbacks": [usage]},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", type=Path)
+    args = parser.parse_args()
+    if not os.getenv("OPENAI_API_KEY"):
+        sys.exit("OPENAI_API_KEY is not set; this benchmark calls the OpenAI API.")
+
+    start_state = get_visual_workflow_graph().invoke({"original_image_ref": put_blob(args.image.read_bytes())})
+    print(f"{len(FEEDBACK)}-step refinement session")
+    print(f"{'':<8} {'calls':>6} {'input tok':>10} {'output tok':>11} {'wall (s)':>9}")
+    for label, session in (("before", before), ("after", after)):
+        usage = UsageCounter()
+        start = time.perf_counter()
+        session(start_state, usage)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<8} {usage.calls:>6} {usage.input_tokens:>10} {usage.output_tokens:>11} {elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark: how long before the UI can render its first frame.
+
+Each sample runs in a fresh interpreter, so nothing is already imported:
+
+- import:       `python -X importtime -c "import src.app"`; reports the total
+                and the heaviest packages (cumulative);
+- first render: Streamlit's `AppTest` runs `run_app.py` once, measuring the
+                wall time from interpreter start to a rendered page.
+
+No API keys are needed; nothing is sent to the network at startup.
+
+Usage:
+    poetry run python benchmarks/bench_startup.py [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_FIRST_RENDER_SCRIPT = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("run_app.py", default_timeout=120).run()
+if at.exception:
+    raise SystemExit(f"run_app.py raised: {at.exception[0].value}")
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def _env():
+    # Startup must not depend on credentials, so measure without them.
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "TAVILY_API_KEY", "REPLICATE_API_TOKEN")}
+    env["PYTHONPATH"] = str(ROOT)
+    return env
+
+
+def _importtime():
+    """Returns {module: cumulative_us} for one cold `import src.app`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.app"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def _first_render_ms() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_RENDER_SCRIPT],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [_importtime() for _ in range(args.runs)]
+    totals = [s.get("src.app", 0) / 1000 for s in samples]
+    print(f"import src.app, {args.runs} cold runs: median {statistics.median(totals):.0f} ms (min {min(totals):.0f} ms)")
+    last = samples[-1]
+    # Top-level packages and the app's own modules; submodules would repeat their parents.
+    shown = {name: us for name, us in last.items() if "." not in name or name.startswith("src.")}
+    print("Heaviest imports (cumulative ms, last run):")
+    for name, us in sorted(shown.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f}  {name}")
+
+    renders = [_first_render_ms() for _ in range(args.runs)]
+    print(f"First render of run_app.py, {args.runs} cold runs: median {statistics.median(renders):.0f} ms (min {min(renders):.0f} ms)")
+    for heavy in ("langgraph", "langchain_openai", "openai", "replicate", "langchain_tavily"):
+        loaded = any(name == heavy or name.startswith(heavy + ".") for name in last)
+        print(f"  {heavy:<18} {'loaded at startup' if loaded else 'deferred'}")
+
+
+if __name__ == "__main__":
+    main()
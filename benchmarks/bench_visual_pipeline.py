@@ -0,0 +1,84 @@
+# benchmarks/bench_visual_pipeline.py
+"""
+Latency and token use of Stage 1 in its two pipeline modes:
+
+- quality:        visual analyst -> prompt engineer -> inspector (three calls);
+- fast:           one vision call for the analysis and the prompt;
+- fast + inspect: the fast call followed by the inspector.
+
+Each mode runs the visual workflow graph on the same image several times and
+reports the median wall time, the number of model calls and the median input
+and output tokens (from the models' usage metadata). The visual-analysis cache
+is switched off so the quality mode really calls the analyst every time.
+
+This calls the OpenAI API: it needs OPENAI_API_KEY (read from `.env`) and
+costs a few cents per run.
+
+Usage:
+    poetry run python benchmarks/bench_visual_pipeline.py path/to/image.jpg [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(ROOT / ".env")
+os.environ["IMAGECODEX_VISUAL_ANALYSIS_CACHE"] = "0"
+
+from langchain_core.callbacks import BaseCallbackHandler  # noqa: E402
+
+from src.core.blobs import put_blob  # noqa: E402
+from src.graph import get_visual_workflow_graph_for_mode  # noqa: E402
+
+MODES = (("quality", "quality", False), ("fast", "fast", False), ("fast + inspect", "fast", True))
+
+
+class UsageCounter(BaseCallbackHandler):
+    """Counts model calls and adds up their token usage."""
+
+    def __init__(self):
+        self.calls = self.input_tokens = self.output_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        self.calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+
+def _run_once(mode: str, inspect: bool, image_ref):
+    usage = UsageCounter()
+    graph = get_visual_workflow_graph_for_mode(mode)
+    start = time.perf_counter()
+    graph.invoke({"original_image_ref": image_ref, "inspect_prompt": inspect}, config={"callbacks": [usage]})
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return elapsed_ms, usage.calls, usage.input_tokens, usage.output_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", type=Path)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if not os.getenv("OPENAI_API_KEY"):
+        sys.exit("OPENAI_API_KEY is not set; this benchmark calls the OpenAI API.")
+
+    image_ref = put_blob(args.image.read_bytes())
+    print(f"{'mode':<16} {'median (ms)':>12} {'calls':>6} {'input tok':>10} {'output tok':>11}")
+    for label, mode, inspect in MODES:
+        samples = [_run_once(mode, inspect, image_ref) for _ in range(args.runs)]
+        elapsed, calls, input_tokens, output_tokens = (statistics.median(column) for column in zip(*samples))
+        print(f"{label:<16} {elapsed:>12.0f} {calls:>6.0f} {input_tokens:>10.0f} {output_tokens:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
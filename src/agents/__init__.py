@@ -1,11 +1,32 @@
 # src/agents/__init__.py
-from .visual_analyst import run_visual_analyst
-from .prompt_engineer import run_prompt_engineer
-from .inspector import run_inspector
-from .refiner import run_refiner
-from .video_director import run_video_director
-from .film_story_writer import story_concept_generator_node
-from .image_generator import generate_image_node
-# Note: script_expert and storyboard_artist are not used in current graphs, but good to have
-from .script_expert import script_expert_node
-from .storyboard_artist import storyboard_artist_node
\ No newline at end of file
+# Agent nodes are resolved on first access (PEP 562), so importing one agent
+# module does not load every other agent and its LLM client.
+from importlib import import_module
+
+_EXPORTS = {
+    "run_visual_analyst": ".visual_analyst",
+    "run_prompt_engineer": ".prompt_engineer",
+    "run_fast_visual_prompt": ".fast_visual_prompt",
+    "run_inspector": ".inspector",
+    "run_refiner": ".refiner",
+    "run_video_director": ".video_director",
+    "story_concept_generator_node": ".film_story_writer",
+    "generate_image_node": ".image_generator",
+    # Note: script_expert and storyboard_artist are not used in current graphs, but good to have
+    "script_expert_node": ".script_expert",
+    "storyboard_artist_node": ".storyboard_artist",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -8,8 +8,8 @@ from typing import Dict, Any
 # --- CORRECTED: Import AppState for type-safe function signature ---
 from src.core.schemas import AppState
 
-# --- CORRECTED: The function now correctly uses AppState for input and output ---
-def run_context_engineer(state: AppState) -> AppState:
+# Returns only the sub-state it changed, as a LangGraph partial update.
+def run_context_engineer(state: AppState) -> Dict[str, Any]:
     """
     Combines all inputs into a coherent context summary for the prompt engineer.
     """
@@ -37,11 +37,13 @@ def run_context_engineer(state: AppState) -> AppState:
         for phrase in narrative_state.inspiration_phrases:
             context_parts.append(f"- {phrase}")
 
+    # Add the vision analysis of the uploaded image (enriched workflow only)
+    if narrative_state.image_analysis:
+        context_parts.append("\nVisual Analysis of the Source Image:")
+        context_parts.append(narrative_state.image_analysis)
+
     context_summary = "\n".join(context_parts)
     print(f"   - Generated Context Summary:\n{context_summary}")
 
-    # Update the state object directly
     narrative_state.context_summary = context_summary
-    state.narrative_state = narrative_state
-    
-    return state
\ No newline at end of file
+    return {"narrative_state": narrative_state}
\ No newline at end of file
@@ -0,0 +1,60 @@
+# src/agents/fast_visual_prompt.py
+"""
+The fast Stage 1 pipeline: one structured-output vision call that returns the
+`VisualAnalysis` and the `ImagePrompt` together, instead of the visual analyst
+and the prompt engineer as two round trips.
+"""
+import asyncio
+from functools import lru_cache
+from typing import Dict, Any
+from langchain_core.prompts import ChatPromptTemplate
+from ..core.blobs import resolve_blob
+from ..core.images import prepare_image_for_vision
+from ..core.llm import get_chat_model
+from ..core.schemas import VisualPromptDraft
+from ..core.prompts import FAST_VISUAL_PROMPT
+
+FAST_VISUAL_PROMPT_MODEL = "gpt-4o"
+
+@lru_cache(maxsize=1)
+def get_fast_visual_prompt_chain():
+    """Builds the vision chain once; the image is passed in as the `image_url` variable."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", FAST_VISUAL_PROMPT),
+        ("human", [{"type": "text", "text": "Analyze this image and write the prompt..."},
+                   {"type": "image_url", "image_url": {"url": "{image_url}"}}])
+    ])
+    # Between the analyst's 0.2 and the prompt engineer's 0.5.
+    return prompt | get_chat_model(FAST_VISUAL_PROMPT_MODEL, temperature=0.4, schema=VisualPromptDraft)
+
+def _draft_update(draft: VisualPromptDraft) -> Dict[str, Any]:
+    # A critique of the previous prompt no longer applies to the new one.
+    return {"visual_analysis": draft.visual_analysis, "image_prompt": draft.image_prompt, "prompt_critique": None}
+
+def run_fast_visual_prompt(state: Dict[str, Any]) -> Dict[str, Any]:
+    print("---AGENT: FAST VISUAL PROMPT---")
+
+    image_bytes = resolve_blob(state.get("original_image_ref"))
+    if not image_bytes:
+        print("---AGENT: SKIPPING FAST VISUAL PROMPT - NO IMAGE---")
+        return {}
+
+    prepared_image = prepare_image_for_vision(image_bytes)
+    draft = get_fast_visual_prompt_chain().invoke({"image_url": prepared_image.data_url})
+    print("---AGENT: Generated Visual Analysis and Image Prompt---")
+    return _draft_update(draft)
+
+async def arun_fast_visual_prompt(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_fast_visual_prompt`."""
+    print("---AGENT: FAST VISUAL PROMPT (async)---")
+
+    image_bytes = resolve_blob(state.get("original_image_ref"))
+    if not image_bytes:
+        print("---AGENT: SKIPPING FAST VISUAL PROMPT - NO IMAGE---")
+        return {}
+
+    # Pillow work is CPU-bound, so keep it off the event loop.
+    prepared_image = await asyncio.to_thread(prepare_image_for_vision, image_bytes)
+    draft = await get_fast_visual_prompt_chain().ainvoke({"image_url": prepared_image.data_url})
+    print("---AGENT: Generated Visual Analysis and Image Prompt---")
+    return _draft_update(draft)
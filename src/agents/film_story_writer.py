@@ -2,39 +2,51 @@
 # FINAL VERIFIED VERSION - Now acts as a Story Concept Generator.
 
 import json
+from functools import lru_cache
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.llm import get_chat_model
 from ..core.schemas import StoryConceptCollection # Import the new schema
 from ..core.prompts import STORY_CONCEPT_GENERATOR_PROMPT # Import the new prompt
 
-def story_concept_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Takes a creative brief and generates a collection of distinct story concepts."""
-    print("---AGENT: STORY CONCEPT GENERATOR---")
-    
-    narrative_state = state.get("narrative_state", {})
-    visual_analysis = state.get("visual_analysis")
-
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.8, model_kwargs={"response_format": {"type": "json_object"}})
+@lru_cache(maxsize=1)
+def get_story_concept_chain():
     # Tell the tool to output our new collection schema
-    structured_llm = llm.with_structured_output(StoryConceptCollection)
+    structured_llm = get_chat_model("gpt-4o", temperature=0.8, schema=StoryConceptCollection, json_mode=True)
     prompt_template = ChatPromptTemplate.from_template(STORY_CONCEPT_GENERATOR_PROMPT)
-    chain = prompt_template | structured_llm
+    return prompt_template | structured_llm
+
+def _story_concept_inputs(state: Dict[str, Any]) -> Dict[str, Any]:
+    narrative_state = state.get("narrative_state", {})
+    visual_analysis = state.get("visual_analysis")
 
     if visual_analysis:
         analysis_summary = (f"Subject: {visual_analysis.main_subject}. Setting: {visual_analysis.setting_and_environment}. Style: {visual_analysis.artistic_style}. Mood: {visual_analysis.mood_and_atmosphere}.")
     else:
         analysis_summary = "N/A"
-    
-    response = chain.invoke({
+
+    return {
         "visual_analysis": analysis_summary,
         "genre": narrative_state.get("genre", "Filmmaker's Choice"),
         "mood": narrative_state.get("mood", "Filmmaker's Choice"),
         "initial_idea": narrative_state.get("initial_idea", "None provided.")
-    })
+    }
+
+def story_concept_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Takes a creative brief and generates a collection of distinct story concepts."""
+    print("---AGENT: STORY CONCEPT GENERATOR---")
+    
+    response = get_story_concept_chain().invoke(_story_concept_inputs(state))
     
     print("---AGENT: Generated Story Concepts---")
     
     # Update the state with the new concepts
     state["narrative_state"]["story_concepts"] = response
-    return state
\ No newline at end of file
+    return state
+
+async def astory_concept_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `story_concept_generator_node`."""
+    print("---AGENT: STORY CONCEPT GENERATOR (async)---")
+    state["narrative_state"]["story_concepts"] = await get_story_concept_chain().ainvoke(_story_concept_inputs(state))
+    print("---AGENT: Generated Story Concepts---")
+    return state
@@ -1,13 +1,25 @@
 # src/agents/image_generator.py
 
 import os
+import asyncio
+import threading
 import replicate
-from openai import OpenAI
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
+from openai import OpenAI, AsyncOpenAI
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import logging
 import io
 
-from src.core.schemas import AppState, GeneratedImage
+from langchain_core.runnables import RunnableConfig
+
+from src.core import config
+from src.core.artifacts import ImageArtifact, archive_image_url
+from src.core.blobs import resolve_blob
+from src.core.callbacks import IMAGE_READY_CALLBACK_KEY
+from src.core.rate_limit import get_backend_limiter
+from src.core.schemas import AppState, GeneratedImage, ImageGenerationParams
+from src.core.tracing import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,18 +32,63 @@ REPLICATE_MODELS = {
     "kandinsky-2.2": "ai-forever/kandinsky-2.2:ea1addaab376f4dc227f5368bbd8eff901820fd1cc14ed8cad63b29249e9d463",
 }
 
+# Receives each GeneratedImage as soon as it finishes (e.g. to fill a UI grid).
+ImageReadyCallback = Callable[[GeneratedImage], None]
+
 class ImageGenerator:
     """A class to handle image generation from various models."""
 
-    def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # The OpenAI clients are created on first use, so constructing the agent
+    # (and importing this module) works without API keys.
+    @cached_property
+    def openai_client(self) -> OpenAI:
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    @cached_property
+    def async_openai_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    # --- Shared request builders (used by both the sync and async paths) ---
+    @staticmethod
+    def _openai_size(aspect_ratio: str) -> str:
+        size_mapping = {"1:1": "1024x1024", "16:9": "1792x1024", "9:16": "1024x1792"}
+        return size_mapping.get(aspect_ratio, "1024x1024")
+
+    @staticmethod
+    def _replicate_version(model_name: str) -> str:
+        model_version = REPLICATE_MODELS.get(model_name)
+        if not model_version: raise ValueError(f"Model {model_name} not found.")
+        return model_version
+
+    @staticmethod
+    def _replicate_text2img_payload(params: Dict) -> Dict:
+        width, height = 1024, 1024
+        if params["aspect_ratio"] == "16:9": width, height = 1344, 768
+        elif params["aspect_ratio"] == "9:16": width, height = 768, 1344
+        return {"prompt": params["prompt"], "negative_prompt": params.get("negative_prompt", ""), "width": width, "height": height}
+
+    @staticmethod
+    def _replicate_img2img_payload(params: Dict, image_bytes: bytes) -> Dict:
+        return {
+            "prompt": params["prompt"],
+            "negative_prompt": params.get("negative_prompt", ""),
+            # IMPORTANT: Pass the image bytes to the API
+            "image": io.BytesIO(image_bytes),
+            # Img2Img models often use a strength parameter
+            "prompt_strength": 0.85, 
+        }
+
+    @staticmethod
+    def _replicate_output_url(output) -> str:
+        if isinstance(output, list) and len(output) > 0:
+            return output[0]
+        raise ConnectionError(f"Replicate API did not return a valid image URL. Output: {output}")
 
     # --- Text-to-Image Methods (Existing) ---
     def _generate_openai_text2img(self, prompt: str, aspect_ratio: str) -> str:
         # ... (This function is the same as the old _generate_with_openai)
         logger.info(f"Generating image with GPT-4o (Text-to-Image). Prompt: {prompt[:50]}...")
-        size_mapping = {"1:1": "1024x1024", "16:9": "1792x1024", "9:16": "1024x1792"}
-        response = self.openai_client.images.generate(model="dall-e-3", prompt=prompt, n=1, size=size_mapping.get(aspect_ratio, "1024x1024"), quality="standard", style="vivid")
+        response = self.openai_client.images.generate(model="dall-e-3", prompt=prompt, n=1, size=self._openai_size(aspect_ratio), quality="standard", style="vivid")
         image_url = response.data[0].url
         logger.info(f"GPT-4o image generated: {image_url}")
         return image_url
@@ -40,27 +97,19 @@ class ImageGenerator:
         # ... (This function is the same as the old _generate_with_replicate)
         logger.info(f"Generating image with Replicate model (Text-to-Image): {model_name}. Prompt: {params['prompt'][:50]}...")
         # ... (rest of the logic is identical)
-        model_version = REPLICATE_MODELS.get(model_name)
-        if not model_version: raise ValueError(f"Model {model_name} not found.")
-        width, height = 1024, 1024
-        if params["aspect_ratio"] == "16:9": width, height = 1344, 768
-        elif params["aspect_ratio"] == "9:16": width, height = 768, 1344
-        input_payload = {"prompt": params["prompt"], "negative_prompt": params.get("negative_prompt", ""), "width": width, "height": height}
-        output = replicate.run(model_version, input=input_payload)
-        if isinstance(output, list) and len(output) > 0:
-            return output[0]
-        raise ConnectionError(f"Replicate API did not return a valid image URL. Output: {output}")
+        model_version = self._replicate_version(model_name)
+        output = replicate.run(model_version, input=self._replicate_text2img_payload(params))
+        return self._replicate_output_url(output)
 
     # --- NEW: Image-to-Image Methods ---
     def _generate_openai_variation(self, image_bytes: bytes, aspect_ratio: str) -> str:
         """Generates a variation of an image using OpenAI's API. Note: This API ignores text prompts."""
         logger.info("Generating image variation with OpenAI...")
-        size_mapping = {"1:1": "1024x1024", "16:9": "1792x1024", "9:16": "1024x1792"}
         response = self.openai_client.images.create_variation(
             image=image_bytes,
             n=1,
             model="dall-e-2", # The variation endpoint currently uses the dall-e-2 model
-            size=size_mapping.get(aspect_ratio, "1024x1024")
+            size=self._openai_size(aspect_ratio)
         )
         image_url = response.data[0].url
         logger.info(f"OpenAI image variation generated: {image_url}")
@@ -69,70 +118,232 @@ class ImageGenerator:
     def _generate_replicate_img2img(self, model_name: str, params: Dict, image_bytes: bytes) -> str:
         """Generates an image from a prompt and a reference image using a Replicate model."""
         logger.info(f"Generating image with Replicate model (Image-to-Image): {model_name}. Prompt: {params['prompt'][:50]}...")
-        model_version = REPLICATE_MODELS.get(model_name)
-        if not model_version: raise ValueError(f"Model {model_name} not found.")
-        
-        input_payload = {
-            "prompt": params["prompt"],
-            "negative_prompt": params.get("negative_prompt", ""),
-            # IMPORTANT: Pass the image bytes to the API
-            "image": io.BytesIO(image_bytes),
-            # Img2Img models often use a strength parameter
-            "prompt_strength": 0.85, 
-        }
-        output = replicate.run(model_version, input=input_payload)
-        if isinstance(output, list) and len(output) > 0:
-            return output[0]
-        raise ConnectionError(f"Replicate API did not return a valid image URL. Output: {output}")
+        model_version = self._replicate_version(model_name)
+        output = replicate.run(model_version, input=self._replicate_img2img_payload(params, image_bytes))
+        return self._replicate_output_url(output)
+
+    # --- Async twins of the backend calls (used by `arun`) ---
+    async def _agenerate_openai_text2img(self, prompt: str, aspect_ratio: str) -> str:
+        logger.info(f"Generating image with GPT-4o (Text-to-Image, async). Prompt: {prompt[:50]}...")
+        response = await self.async_openai_client.images.generate(model="dall-e-3", prompt=prompt, n=1, size=self._openai_size(aspect_ratio), quality="standard", style="vivid")
+        return response.data[0].url
+
+    async def _agenerate_replicate_text2img(self, model_name: str, params: Dict) -> str:
+        logger.info(f"Generating image with Replicate model (Text-to-Image, async): {model_name}. Prompt: {params['prompt'][:50]}...")
+        output = await replicate.async_run(self._replicate_version(model_name), input=self._replicate_text2img_payload(params))
+        return self._replicate_output_url(output)
+
+    async def _agenerate_openai_variation(self, image_bytes: bytes, aspect_ratio: str) -> str:
+        logger.info("Generating image variation with OpenAI (async)...")
+        response = await self.async_openai_client.images.create_variation(
+            image=image_bytes, n=1, model="dall-e-2", size=self._openai_size(aspect_ratio)
+        )
+        return response.data[0].url
+
+    async def _agenerate_replicate_img2img(self, model_name: str, params: Dict, image_bytes: bytes) -> str:
+        logger.info(f"Generating image with Replicate model (Image-to-Image, async): {model_name}. Prompt: {params['prompt'][:50]}...")
+        output = await replicate.async_run(self._replicate_version(model_name), input=self._replicate_img2img_payload(params, image_bytes))
+        return self._replicate_output_url(output)
+
+    # --- Single-request routing (one image from one model) ---
+    @staticmethod
+    def backend_for(model: str) -> str:
+        """The rate-limit/concurrency bucket `model`'s requests count against."""
+        return "openai" if model == "gpt-4o" else "replicate"
+
+    def _api_span(self, model: str, params: ImageGenerationParams, reference_image: Optional[bytes]):
+        """Traces one image API request; the limiter wait before it is not counted."""
+        name = "openai.images" if self.backend_for(model) == "openai" else "replicate.run"
+        return span(
+            name, model=model, operation="img2img" if reference_image else "text2img",
+            payload_bytes=len(params.prompt.encode("utf-8")) + len(reference_image or b""),
+        )
+
+    def _request_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str]:
+        """Generates one image with `model` and returns (image_url, prompt_for_log)."""
+        request = params.model_dump()
+        reference_image = resolve_blob(params.reference_image_ref)
+        with get_backend_limiter(self.backend_for(model)).slot(), self._api_span(model, params, reference_image):
+            # ROUTING LOGIC: Check if a reference image was provided
+            if reference_image:
+                if model == "gpt-4o":
+                    # OpenAI variation API ignores the prompt, so we log that.
+                    return self._generate_openai_variation(reference_image, params.aspect_ratio), "Variation of uploaded image"
+                # SDXL or Kandinsky
+                return self._generate_replicate_img2img(model, request, reference_image), params.prompt
+            # Standard text-to-image
+            if model == "gpt-4o":
+                return self._generate_openai_text2img(params.prompt, params.aspect_ratio), params.prompt
+            return self._generate_replicate_text2img(model, request), params.prompt
+
+    async def _arequest_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str]:
+        """Async twin of `_request_one`."""
+        request = params.model_dump()
+        reference_image = resolve_blob(params.reference_image_ref)
+        async with get_backend_limiter(self.backend_for(model)).aslot():
+            with self._api_span(model, params, reference_image):
+                if reference_image:
+                    if model == "gpt-4o":
+                        return await self._agenerate_openai_variation(reference_image, params.aspect_ratio), "Variation of uploaded image"
+                    return await self._agenerate_replicate_img2img(model, request, reference_image), params.prompt
+                if model == "gpt-4o":
+                    return await self._agenerate_openai_text2img(params.prompt, params.aspect_ratio), params.prompt
+                return await self._agenerate_replicate_text2img(model, request), params.prompt
+
+    def _generate_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str, Optional[ImageArtifact]]:
+        """
+        Generates one image and downloads it into the artifact store once the
+        backend slot is released. Returns (image_url, prompt_for_log, artifact).
+        """
+        image_url, prompt_for_log = self._request_one(model, params)
+        return image_url, prompt_for_log, archive_image_url(image_url)
+
+    async def _agenerate_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str, Optional[ImageArtifact]]:
+        """Async twin of `_generate_one`; the download runs on a worker thread."""
+        image_url, prompt_for_log = await self._arequest_one(model, params)
+        return image_url, prompt_for_log, await asyncio.to_thread(archive_image_url, image_url)
+
+    def generate(self, params: ImageGenerationParams, model: Optional[str] = None) -> GeneratedImage:
+        """Generates one image without touching any app state. Raises on failure."""
+        return self.generate_candidate(params, model or params.model, 1, 1)
+
+    def generate_candidate(self, params: ImageGenerationParams, model: str, candidate: int, batch_size: int) -> GeneratedImage:
+        """Generates one planned image of a batch (see `plan_batch`). Raises on failure."""
+        return self._build_image(params, model, candidate, batch_size, *self._generate_one(model, params))
+
+    async def agenerate(self, params: ImageGenerationParams, model: Optional[str] = None) -> GeneratedImage:
+        """Async twin of `generate`."""
+        model = model or params.model
+        return self._build_image(params, model, 1, 1, *await self._agenerate_one(model, params))
+
+    @staticmethod
+    def plan_batch(params: ImageGenerationParams) -> List[Tuple[str, int]]:
+        """One (model, candidate number) pair per image, interleaved so every model starts early."""
+        candidates = min(params.num_candidates, config.IMAGE_GEN_MAX_CANDIDATES)
+        return [(model, candidate) for candidate in range(1, candidates + 1) for model in params.target_models()]
 
     # --- Main Agent Router ---
-    def run(self, state: AppState) -> AppState:
-        """The main execution method for the agent, now routing between text2img and img2img."""
+    def run(self, state: AppState, on_image: Optional[ImageReadyCallback] = None) -> AppState:
+        """
+        Generates every requested image (`num_candidates` per model in
+        `target_models()`) on a bounded thread pool. Images are appended to
+        `state.generated_images`, and passed to `on_image`, as soon as each finishes.
+        """
         params = state.image_gen_params
         if not params:
             state.error_message = "Image generation parameters not provided."
             return state
 
-        try:
-            image_url = ""
-            prompt_for_log = params.prompt
-            
-            # ROUTING LOGIC: Check if a reference image was provided
-            if params.reference_image:
-                if params.model == "gpt-4o":
-                    # OpenAI variation API ignores the prompt, so we log that.
-                    prompt_for_log = "Variation of uploaded image"
-                    image_url = self._generate_openai_variation(params.reference_image, params.aspect_ratio)
-                else: # SDXL or Kandinsky
-                    image_url = self._generate_replicate_img2img(params.model, params.model_dump(), params.reference_image)
-            else: # Standard text-to-image
-                if params.model == "gpt-4o":
-                    image_url = self._generate_openai_text2img(params.prompt, params.aspect_ratio)
-                else:
-                    image_url = self._generate_replicate_text2img(params.model, params.model_dump())
-
-            new_image = GeneratedImage(
-                image_url=image_url, model_used=params.model,
-                prompt_used=prompt_for_log, metadata={"aspect_ratio": params.aspect_ratio}
-            )
-            state.generated_images.append(new_image)
-            state.error_message = None
-        except Exception as e:
-            error_msg = f"Failed to generate image with {params.model}: {e}"
-            logger.error(error_msg, exc_info=True)
-            state.error_message = error_msg
+        jobs = self.plan_batch(params)
+        if len(jobs) > 1:
+            logger.info(f"Generating a batch of {len(jobs)} images across {params.target_models()}.")
+        failures = []
+        with ThreadPoolExecutor(max_workers=min(len(jobs), config.IMAGE_GEN_MAX_WORKERS), thread_name_prefix="image-gen") as pool:
+            futures = {pool.submit(self._generate_one, model, params): (model, candidate) for model, candidate in jobs}
+            for future in as_completed(futures):
+                model, candidate = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append(self._log_failure(model, e))
+                    continue
+                image = self._record_image(state, params, model, candidate, len(jobs), *result)
+                if on_image:
+                    on_image(image)
+        state.error_message = self._summarize_failures(failures, len(jobs))
         return state
 
+    async def arun(self, state: AppState, on_image: Optional[ImageReadyCallback] = None) -> AppState:
+        """Async twin of `run`: the batch runs as concurrent tasks on the event loop."""
+        params = state.image_gen_params
+        if not params:
+            state.error_message = "Image generation parameters not provided."
+            return state
+
+        jobs = self.plan_batch(params)
+        if len(jobs) > 1:
+            logger.info(f"Generating a batch of {len(jobs)} images across {params.target_models()} (async).")
+        workers = asyncio.Semaphore(config.IMAGE_GEN_MAX_WORKERS)
+
+        async def generate(model: str, candidate: int):
+            async with workers:
+                try:
+                    return model, candidate, await self._agenerate_one(model, params), None
+                except Exception as e:
+                    return model, candidate, None, e
+
+        failures = []
+        for finished in asyncio.as_completed([generate(model, candidate) for model, candidate in jobs]):
+            model, candidate, result, error = await finished
+            if error is not None:
+                failures.append(self._log_failure(model, error))
+                continue
+            image = self._record_image(state, params, model, candidate, len(jobs), *result)
+            if on_image:
+                on_image(image)
+        state.error_message = self._summarize_failures(failures, len(jobs))
+        return state
+
+    @staticmethod
+    def _build_image(params: ImageGenerationParams, model: str, candidate: int, batch_size: int, image_url: str, prompt_for_log: str, artifact: Optional[ImageArtifact] = None) -> GeneratedImage:
+        return GeneratedImage(
+            image_url=image_url, model_used=model, prompt_used=prompt_for_log, artifact=artifact,
+            metadata={"aspect_ratio": params.aspect_ratio, "candidate": candidate, "batch_size": batch_size}
+        )
+
+    def _record_image(self, state: AppState, params: ImageGenerationParams, model: str, candidate: int, batch_size: int, image_url: str, prompt_for_log: str, artifact: Optional[ImageArtifact] = None) -> GeneratedImage:
+        new_image = self._build_image(params, model, candidate, batch_size, image_url, prompt_for_log, artifact)
+        state.generated_images.append(new_image)
+        return new_image
+
+    @staticmethod
+    def _log_failure(model: str, e: Exception) -> str:
+        error_msg = f"Failed to generate image with {model}: {e}"
+        logger.error(error_msg, exc_info=e)
+        return error_msg
+
+    @staticmethod
+    def _summarize_failures(failures: List[str], total: int) -> Optional[str]:
+        if not failures:
+            return None
+        if total == 1:
+            return failures[0]
+        return f"{len(failures)} of {total} images failed. " + " | ".join(failures)
+
 # --- CRITICAL: These lines connect the class to LangGraph ---
 
-# 1. Create a single, shared instance of the agent's logic.
-image_generator_agent = ImageGenerator()
+# 1. A single, shared instance of the agent's logic, created on first use.
+_image_generator: Optional[ImageGenerator] = None
+_image_generator_lock = threading.Lock()
+
+def get_image_generator() -> ImageGenerator:
+    global _image_generator
+    if _image_generator is None:
+        with _image_generator_lock:
+            if _image_generator is None:
+                _image_generator = ImageGenerator()
+    return _image_generator
+
+def _get_image_ready_callback(config: Optional[RunnableConfig]) -> Optional[ImageReadyCallback]:
+    return ((config or {}).get("configurable") or {}).get(IMAGE_READY_CALLBACK_KEY)
 
 # 2. Define the function that will be registered as a node in the graph.
 # This is the function that was missing and causing the ImportError.
-def generate_image_node(state: AppState) -> AppState:
+def generate_image_node(state: AppState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
     """
     LangGraph node to orchestrate image generation.
-    It takes the current state, invokes the ImageGenerator, and returns the updated state.
+    It takes the current state, invokes the ImageGenerator, and returns only the
+    new images (appended by the `generated_images` reducer) and the error status.
+    If the run config carries an `IMAGE_READY_CALLBACK_KEY` callback, each image
+    is passed to it as soon as it is ready.
     """
-    return image_generator_agent.run(state)
\ No newline at end of file
+    already_generated = len(state.generated_images)
+    get_image_generator().run(state, on_image=_get_image_ready_callback(config))
+    return {"generated_images": state.generated_images[already_generated:], "error_message": state.error_message}
+
+
+async def agenerate_image_node(state: AppState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Async twin of `generate_image_node`, used when the graph runs via `ainvoke`."""
+    already_generated = len(state.generated_images)
+    await get_image_generator().arun(state, on_image=_get_image_ready_callback(config))
+    return {"generated_images": state.generated_images[already_generated:], "error_message": state.error_message}
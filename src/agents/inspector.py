@@ -1,11 +1,21 @@
 # src/agents/inspector.py
-import json
+from functools import lru_cache
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.llm import get_chat_model
+from ..core.response_cache import critique_cache_key, get_cached_critique, store_critique
 from ..core.schemas import PromptCritique, ImagePrompt, VisualAnalysis
 from ..core.prompts import INSPECTOR_PROMPT
 
+@lru_cache(maxsize=1)
+def get_inspector_chain():
+    prompt_template = ChatPromptTemplate.from_template(INSPECTOR_PROMPT)
+    return prompt_template | get_chat_model("gpt-4o", temperature=0.0, schema=PromptCritique)
+
+def _inspector_inputs(analysis: VisualAnalysis, prompt: ImagePrompt) -> Dict[str, str]:
+    # Compact JSON: the indentation was a third of the analysis' tokens and told the model nothing.
+    return {"analysis": analysis.model_dump_json(), "prompt": prompt.model_dump_json()}
+
 def run_inspector(state: Dict[str, Any]) -> Dict[str, Any]:
     print("---AGENT: PROMPT INSPECTOR---")
     print(f"STATE KEYS RECEIVED BY INSPECTOR: {list(state.keys())}")
@@ -14,18 +24,37 @@ def run_inspector(state: Dict[str, Any]) -> Dict[str, Any]:
     prompt: ImagePrompt = state.get("image_prompt")
     if not analysis or not prompt:
         print("---AGENT: SKIPPING INSPECTOR - MISSING ANALYSIS OR PROMPT IN STATE---")
-        return state
+        return {}
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0)
-    structured_llm = llm.with_structured_output(PromptCritique)
-    prompt_template = ChatPromptTemplate.from_template(INSPECTOR_PROMPT)
-    chain = prompt_template | structured_llm
-    analysis_json_string = json.dumps(analysis.model_dump(), indent=2)
-    prompt_json_string = json.dumps(prompt.model_dump(), indent=2)
-    response = chain.invoke({"analysis": analysis_json_string, "prompt": prompt_json_string})
-    
-    print("---AGENT: Generated Prompt Critique---")
+    # A refinement that leaves the prompt as it was keeps its critique.
+    cache_key = critique_cache_key(analysis, prompt)
+    response = get_cached_critique(cache_key)
+    if response is not None:
+        print("---AGENT: Prompt Critique served from cache---")
+    else:
+        response = get_inspector_chain().invoke(_inspector_inputs(analysis, prompt))
+        store_critique(cache_key, response)
+        print("---AGENT: Generated Prompt Critique---")
+
+    # Return only the key this node changed; the graph merges it into the state.
+    return {"prompt_critique": response}
+
+async def arun_inspector(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_inspector`."""
+    print("---AGENT: PROMPT INSPECTOR (async)---")
+
+    analysis: VisualAnalysis = state.get("visual_analysis")
+    prompt: ImagePrompt = state.get("image_prompt")
+    if not analysis or not prompt:
+        print("---AGENT: SKIPPING INSPECTOR - MISSING ANALYSIS OR PROMPT IN STATE---")
+        return {}
 
-    # --- THIS IS THE FIX ---
-    state["prompt_critique"] = response
-    return state
\ No newline at end of file
+    cache_key = critique_cache_key(analysis, prompt)
+    response = get_cached_critique(cache_key)
+    if response is not None:
+        print("---AGENT: Prompt Critique served from cache---")
+    else:
+        response = await get_inspector_chain().ainvoke(_inspector_inputs(analysis, prompt))
+        store_critique(cache_key, response)
+        print("---AGENT: Generated Prompt Critique---")
+    return {"prompt_critique": response}
@@ -3,24 +3,22 @@
 The Inspiration Agent enriches narrative prompts with poetic metaphors.
 FINAL CORRECTED VERSION: Fixes the bug caused by the new TavilySearch output format.
 """
-import json
-from pathlib import Path
-from typing import List, Dict
-from langchain_tavily import TavilySearch
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from typing import Any, List, Dict
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 
+from src.core.llm import get_chat_model
+from src.core.response_cache import cached_web_search, cached_story_reference, acached_web_search, acached_story_reference
 from src.core.schemas import AppState
+from src.core.style_bank import get_style_bank
 
 class CreativeInspiration(BaseModel):
     thematic_elements: List[str] = Field(description="A list of 2-3 core thematic elements or feelings (e.g., 'a sense of inevitable loss', 'the triumph of community').")
     visual_style_notes: List[str] = Field(description="A list of 2-3 visual style notes or motifs (e.g., 'high-contrast shadows and neon lights', 'sweeping natural landscapes').")
     poetic_metaphors: List[str] = Field(description="A list of 2-3 original, poetic metaphors inspired by the story's themes (e.g., 'a city that breathes chrome and sorrow').")
 
-tavily_tool = TavilySearch(max_results=3)
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
 parser = JsonOutputParser(pydantic_object=CreativeInspiration)
 
 prompt_template = PromptTemplate(
@@ -35,52 +33,110 @@ prompt_template = PromptTemplate(
     partial_variables={"format_instructions": parser.get_format_instructions()},
 )
 
-inspiration_chain = prompt_template | llm | parser
+# The search tool and chain hold API clients, so they are built on first use
+# rather than at import time (importing must work without API keys).
+@lru_cache(maxsize=1)
+def get_inspiration_search_tool():
+    from langchain_tavily import TavilySearch
+    return TavilySearch(max_results=3)
 
-STYLE_BANK_PATH = Path(__file__).parent.parent / "data" / "style_bank.json"
+@lru_cache(maxsize=1)
+def get_inspiration_chain():
+    return prompt_template | get_chat_model("gpt-4o", temperature=0.7) | parser
 
-def load_style_bank() -> Dict:
-    try:
-        with open(STYLE_BANK_PATH, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+def _format_search_results(results) -> str:
+    # CORRECTED: The new TavilySearch returns a list of strings directly.
+    return "\n".join([f"- {r}" for r in results])
 
-def run_inspiration_agent(state: AppState) -> AppState:
-    print("---AGENT: Running Inspiration Agent---")
-    narrative_state = state.narrative_state
+def _inspiration_to_phrases(response: Dict) -> List[str]:
     inspiration_phrases = []
+    for theme in response.get("thematic_elements", []): inspiration_phrases.append(f"Thematic Element: {theme}")
+    for style in response.get("visual_style_notes", []): inspiration_phrases.append(f"Visual Style: {style}")
+    for metaphor in response.get("poetic_metaphors", []): inspiration_phrases.append(f"Poetic Metaphor: {metaphor}")
+    return inspiration_phrases
 
-    if narrative_state.inspiration_mode == "🧠 AI Imagination" and narrative_state.genre != "Filmmaker's Choice":
-        print("   - Using local StyleBank for inspiration.")
-        style_bank = load_style_bank()
-        phrases = style_bank.get(narrative_state.genre, {}).get(narrative_state.mood, {}).get("default", [])
-        if phrases:
-            inspiration_phrases.extend(phrases)
+def fetch_creative_inspiration(story_reference: str) -> Dict:
+    """
+    Searches the web for `story_reference` and distils it into CreativeInspiration
+    (as a dict). Both the raw search results and the parsed result are cached.
+    """
+    def search_and_distil() -> Dict:
+        results = cached_web_search(get_inspiration_search_tool(), f"Thematic elements, visual style, and atmosphere of the story {story_reference}")
+        return get_inspiration_chain().invoke({
+            "story_reference": story_reference,
+            "search_results": _format_search_results(results)
+        })
 
-    elif narrative_state.inspiration_mode == "🎞️ Inspired By" and narrative_state.story_reference:
-        print(f"   - Querying for inspiration from '{narrative_state.story_reference}' using Tavily + GPT-4o...")
-        try:
-            results = tavily_tool.invoke(f"Thematic elements, visual style, and atmosphere of the story {narrative_state.story_reference}")
-            # CORRECTED: The new TavilySearch returns a list of strings directly.
-            search_context = "\n".join([f"- {r}" for r in results])
-            
-            response: Dict = inspiration_chain.invoke({
-                "story_reference": narrative_state.story_reference,
-                "search_results": search_context
-            })
-            for theme in response.get("thematic_elements", []): inspiration_phrases.append(f"Thematic Element: {theme}")
-            for style in response.get("visual_style_notes", []): inspiration_phrases.append(f"Visual Style: {style}")
-            for metaphor in response.get("poetic_metaphors", []): inspiration_phrases.append(f"Poetic Metaphor: {metaphor}")
-        except Exception as e:
-            print(f"   - ERROR in Inspiration Agent: {e}")
-            inspiration_phrases.append(f"Could not get creative inspiration for '{narrative_state.story_reference}'.")
-    
+    return cached_story_reference("inspiration", story_reference, prompt_template.template, search_and_distil)
+
+async def afetch_creative_inspiration(story_reference: str) -> Dict:
+    """Async twin of `fetch_creative_inspiration`."""
+    async def search_and_distil() -> Dict:
+        results = await acached_web_search(get_inspiration_search_tool(), f"Thematic elements, visual style, and atmosphere of the story {story_reference}")
+        return await get_inspiration_chain().ainvoke({
+            "story_reference": story_reference,
+            "search_results": _format_search_results(results)
+        })
+
+    return await acached_story_reference("inspiration", story_reference, prompt_template.template, search_and_distil)
+
+def get_style_bank_phrases(genre: str, mood: str) -> List[str]:
+    """Looks up the StyleBank phrases for a genre/mood pair (with fallbacks; see `src.core.style_bank`)."""
+    return get_style_bank().phrases(genre, mood)
+
+def fetch_inspiration_phrases(story_reference: str) -> List[str]:
+    """Returns creative inspiration for `story_reference` as context phrases (or an explanatory phrase on failure)."""
+    print(f"   - Querying for inspiration from '{story_reference}' using Tavily + GPT-4o...")
+    try:
+        return _inspiration_to_phrases(fetch_creative_inspiration(story_reference))
+    except Exception as e:
+        print(f"   - ERROR in Inspiration Agent: {e}")
+        return [f"Could not get creative inspiration for '{story_reference}'."]
+
+async def afetch_inspiration_phrases(story_reference: str) -> List[str]:
+    """Async twin of `fetch_inspiration_phrases`."""
+    print(f"   - Querying for inspiration from '{story_reference}' using Tavily + GPT-4o...")
+    try:
+        return _inspiration_to_phrases(await afetch_creative_inspiration(story_reference))
+    except Exception as e:
+        print(f"   - ERROR in Inspiration Agent: {e}")
+        return [f"Could not get creative inspiration for '{story_reference}'."]
+
+def _merge_inspiration_phrases(state: AppState, inspiration_phrases: List[str]) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
     if inspiration_phrases:
         if narrative_state.inspiration_phrases:
             narrative_state.inspiration_phrases.extend(inspiration_phrases)
         else:
             narrative_state.inspiration_phrases = inspiration_phrases
             
-    state.narrative_state = narrative_state
-    return state
\ No newline at end of file
+    return {"narrative_state": narrative_state}
+
+def run_inspiration_agent(state: AppState) -> Dict[str, Any]:
+    print("---AGENT: Running Inspiration Agent---")
+    narrative_state = state.narrative_state
+    inspiration_phrases = []
+
+    if narrative_state.inspiration_mode == "🧠 AI Imagination":
+        print("   - Using local StyleBank for inspiration.")
+        inspiration_phrases.extend(get_style_bank_phrases(narrative_state.genre, narrative_state.mood))
+
+    elif narrative_state.inspiration_mode == "🎞️ Inspired By" and narrative_state.story_reference:
+        inspiration_phrases.extend(fetch_inspiration_phrases(narrative_state.story_reference))
+    
+    return _merge_inspiration_phrases(state, inspiration_phrases)
+
+async def arun_inspiration_agent(state: AppState) -> Dict[str, Any]:
+    """Async twin of `run_inspiration_agent`."""
+    print("---AGENT: Running Inspiration Agent (async)---")
+    narrative_state = state.narrative_state
+    inspiration_phrases = []
+
+    if narrative_state.inspiration_mode == "🧠 AI Imagination":
+        print("   - Using local StyleBank for inspiration.")
+        inspiration_phrases.extend(get_style_bank_phrases(narrative_state.genre, narrative_state.mood))
+
+    elif narrative_state.inspiration_mode == "🎞️ Inspired By" and narrative_state.story_reference:
+        inspiration_phrases.extend(await afetch_inspiration_phrases(narrative_state.story_reference))
+
+    return _merge_inspiration_phrases(state, inspiration_phrases)
\ No newline at end of file
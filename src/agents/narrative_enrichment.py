@@ -0,0 +1,94 @@
+# src/agents/narrative_enrichment.py
+"""
+Parallel research branches for the enriched Stage 3 workflow.
+
+Reference lookup, inspiration lookup, StyleBank lookup and a vision analysis of
+the uploaded image are independent, so the enriched graph runs them as
+concurrent branches. Each branch returns only its own contribution; the
+`enrichment_phrases` reducer on `EnrichedNarrativeGraphState` merges them, and
+`merge_enrichment_into_context` folds the result into the narrative state.
+"""
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from src.core.blobs import resolve_blob
+from src.core.schemas import EnrichedNarrativeGraphState
+from src.agents.context_engineer import run_context_engineer
+from src.agents.inspiration_agent import fetch_inspiration_phrases, afetch_inspiration_phrases, get_style_bank_phrases
+from src.agents.reference_agent import fetch_reference_phrases, afetch_reference_phrases
+from src.agents.storytelling_agent import run_cinematic_prompt_engineer, arun_cinematic_prompt_engineer
+from src.agents.utils import analyze_image_for_narrative, aanalyze_image_for_narrative
+
+
+def run_reference_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    if narrative_state.inspiration_mode != "📚 Original Story" or not narrative_state.story_reference:
+        return {}
+    print("---BRANCH: Reference lookup---")
+    return {"enrichment_phrases": fetch_reference_phrases(narrative_state.story_reference)}
+
+
+async def arun_reference_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    if narrative_state.inspiration_mode != "📚 Original Story" or not narrative_state.story_reference:
+        return {}
+    print("---BRANCH: Reference lookup (async)---")
+    return {"enrichment_phrases": await afetch_reference_phrases(narrative_state.story_reference)}
+
+
+def run_inspiration_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    if narrative_state.inspiration_mode != "🎞️ Inspired By" or not narrative_state.story_reference:
+        return {}
+    print("---BRANCH: Inspiration lookup---")
+    return {"enrichment_phrases": fetch_inspiration_phrases(narrative_state.story_reference)}
+
+
+async def arun_inspiration_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    if narrative_state.inspiration_mode != "🎞️ Inspired By" or not narrative_state.story_reference:
+        return {}
+    print("---BRANCH: Inspiration lookup (async)---")
+    return {"enrichment_phrases": await afetch_inspiration_phrases(narrative_state.story_reference)}
+
+
+def run_style_bank_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    print("---BRANCH: StyleBank lookup---")
+    phrases = get_style_bank_phrases(narrative_state.genre, narrative_state.mood)
+    return {"enrichment_phrases": phrases} if phrases else {}
+
+
+def run_image_analysis_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    image_bytes = resolve_blob(state.narrative_state.input_image_ref)
+    if not image_bytes:
+        return {}
+    print("---BRANCH: Vision analysis of the input image---")
+    return {"image_analysis": analyze_image_for_narrative(image_bytes)}
+
+
+async def arun_image_analysis_branch(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    image_bytes = resolve_blob(state.narrative_state.input_image_ref)
+    if not image_bytes:
+        return {}
+    print("---BRANCH: Vision analysis of the input image (async)---")
+    return {"image_analysis": await aanalyze_image_for_narrative(image_bytes)}
+
+
+def merge_enrichment_into_context(state: EnrichedNarrativeGraphState) -> Dict[str, Any]:
+    """Join point: folds every branch's output into the narrative state, then builds the context."""
+    narrative_state = state.narrative_state
+    phrases = list(narrative_state.inspiration_phrases or []) + state.enrichment_phrases
+    narrative_state.inspiration_phrases = phrases or None
+    narrative_state.image_analysis = state.image_analysis
+    run_context_engineer(state)
+    return {"narrative_state": narrative_state}
+
+
+def run_enriched_storyteller(state: EnrichedNarrativeGraphState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    return run_cinematic_prompt_engineer(state, config)
+
+
+async def arun_enriched_storyteller(state: EnrichedNarrativeGraphState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    return await arun_cinematic_prompt_engineer(state, config)
@@ -1,11 +1,17 @@
 # src/agents/prompt_engineer.py
 import json
+from functools import lru_cache
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.llm import get_chat_model
 from ..core.schemas import ImagePrompt, VisualAnalysis
 from ..core.prompts import PROMPT_ENGINEER_PROMPT
 
+@lru_cache(maxsize=1)
+def get_prompt_engineer_chain():
+    prompt = ChatPromptTemplate.from_template(PROMPT_ENGINEER_PROMPT)
+    return prompt | get_chat_model("gpt-4o", temperature=0.5, schema=ImagePrompt)
+
 def run_prompt_engineer(state: Dict[str, Any]) -> Dict[str, Any]:
     print("---AGENT: PROMPT ENGINEER---")
     print(f"STATE KEYS RECEIVED BY PROMPT_ENGINEER: {list(state.keys())}")
@@ -13,17 +19,26 @@ def run_prompt_engineer(state: Dict[str, Any]) -> Dict[str, Any]:
     analysis: VisualAnalysis = state.get("visual_analysis")
     if not analysis:
         print("---AGENT: SKIPPING PROMPT ENGINEER - NO VISUAL ANALYSIS---")
-        return state
+        return {}
 
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.5)
-    structured_llm = llm.with_structured_output(ImagePrompt)
-    prompt = ChatPromptTemplate.from_template(PROMPT_ENGINEER_PROMPT)
-    chain = prompt | structured_llm
     analysis_json_string = json.dumps(analysis.model_dump(), indent=2)
-    response = chain.invoke({"analysis": analysis_json_string})
+    response = get_prompt_engineer_chain().invoke({"analysis": analysis_json_string})
     
     print("---AGENT: Generated Image Prompt---")
     
-    # --- THIS IS THE FIX ---
-    state["image_prompt"] = response
-    return state
\ No newline at end of file
+    # Return only the key this node changed; the graph merges it into the state.
+    return {"image_prompt": response}
+
+async def arun_prompt_engineer(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_prompt_engineer`."""
+    print("---AGENT: PROMPT ENGINEER (async)---")
+
+    analysis: VisualAnalysis = state.get("visual_analysis")
+    if not analysis:
+        print("---AGENT: SKIPPING PROMPT ENGINEER - NO VISUAL ANALYSIS---")
+        return {}
+
+    analysis_json_string = json.dumps(analysis.model_dump(), indent=2)
+    response = await get_prompt_engineer_chain().ainvoke({"analysis": analysis_json_string})
+    print("---AGENT: Generated Image Prompt---")
+    return {"image_prompt": response}
@@ -3,13 +3,14 @@
 The Reference Agent ensures factual integrity for narratives.
 FINAL CORRECTED VERSION: Fixes the bug caused by the new TavilySearch output format.
 """
-from typing import List, Dict
-from langchain_tavily import TavilySearch
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from typing import Any, List, Dict
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 
+from src.core.llm import get_chat_model
+from src.core.response_cache import cached_web_search, cached_story_reference, acached_web_search, acached_story_reference
 from src.core.schemas import AppState
 
 class StoryMotifs(BaseModel):
@@ -18,8 +19,6 @@ class StoryMotifs(BaseModel):
     key_plot_points: List[str] = Field(description="A short list of 3-4 key plot points or events.")
     symbolic_objects_or_places: List[str] = Field(description="List of symbolic items or locations.")
 
-tavily_tool = TavilySearch(max_results=4)
-llm = ChatOpenAI(model="gpt-4o", temperature=0.2)
 parser = JsonOutputParser(pydantic_object=StoryMotifs)
 
 prompt_template = PromptTemplate(
@@ -35,42 +34,93 @@ prompt_template = PromptTemplate(
     partial_variables={"format_instructions": parser.get_format_instructions()},
 )
 
-reference_chain = prompt_template | llm | parser
+# The search tool and chain hold API clients, so they are built on first use
+# rather than at import time (importing must work without API keys).
+@lru_cache(maxsize=1)
+def get_reference_search_tool():
+    from langchain_tavily import TavilySearch
+    return TavilySearch(max_results=4)
 
-def run_reference_agent(state: AppState) -> AppState:
-    print("---AGENT: Running Reference Agent (Live)---")
-    narrative_state = state.narrative_state
-    reference = narrative_state.story_reference
-    
-    if not reference:
-        return state
+@lru_cache(maxsize=1)
+def get_reference_chain():
+    return prompt_template | get_chat_model("gpt-4o", temperature=0.2) | parser
 
-    print(f"   - Searching for motifs from '{reference}' using Tavily...")
-    
-    try:
-        results = tavily_tool.invoke(f"Key story motifs, characters, and themes in {reference}")
-        # CORRECTED: The new TavilySearch returns a list of strings directly.
-        # We no longer access a 'content' key.
-        search_context = "\n".join([f"- {r}" for r in results])
+def _format_search_results(results) -> str:
+    # CORRECTED: The new TavilySearch returns a list of strings directly.
+    # We no longer access a 'content' key.
+    return "\n".join([f"- {r}" for r in results])
+
+def _motifs_to_phrases(response: Dict) -> List[str]:
+    inspiration_phrases = []
+    for char in response.get("key_characters", []): inspiration_phrases.append(f"Character: {char}")
+    for theme in response.get("central_themes", []): inspiration_phrases.append(f"Theme: {theme}")
+    for plot in response.get("key_plot_points", []): inspiration_phrases.append(f"Plot Point: {plot}")
+    for item in response.get("symbolic_objects_or_places", []): inspiration_phrases.append(f"Symbol: {item}")
+    print(f"   - Found Motifs: {inspiration_phrases}")
+    return inspiration_phrases
+
+def fetch_reference_motifs(reference: str) -> Dict:
+    """
+    Searches the web for `reference` and extracts its StoryMotifs (as a dict).
+    Both the raw search results and the parsed motifs are cached.
+    """
+    def search_and_extract() -> Dict:
+        results = cached_web_search(get_reference_search_tool(), f"Key story motifs, characters, and themes in {reference}")
         print("   - Search complete. Analyzing results with GPT-4o...")
+        return get_reference_chain().invoke({
+            "story_reference": reference,
+            "search_results": _format_search_results(results)
+        })
 
-        response: Dict = reference_chain.invoke({
+    return cached_story_reference("motifs", reference, prompt_template.template, search_and_extract)
+
+async def afetch_reference_motifs(reference: str) -> Dict:
+    """Async twin of `fetch_reference_motifs`."""
+    async def search_and_extract() -> Dict:
+        results = await acached_web_search(get_reference_search_tool(), f"Key story motifs, characters, and themes in {reference}")
+        print("   - Search complete. Analyzing results with GPT-4o...")
+        return await get_reference_chain().ainvoke({
             "story_reference": reference,
-            "search_results": search_context
+            "search_results": _format_search_results(results)
         })
 
-        inspiration_phrases = []
-        for char in response.get("key_characters", []): inspiration_phrases.append(f"Character: {char}")
-        for theme in response.get("central_themes", []): inspiration_phrases.append(f"Theme: {theme}")
-        for plot in response.get("key_plot_points", []): inspiration_phrases.append(f"Plot Point: {plot}")
-        for item in response.get("symbolic_objects_or_places", []): inspiration_phrases.append(f"Symbol: {item}")
+    return await acached_story_reference("motifs", reference, prompt_template.template, search_and_extract)
 
-        print(f"   - Found Motifs: {inspiration_phrases}")
-        narrative_state.inspiration_phrases = inspiration_phrases
+def fetch_reference_phrases(reference: str) -> List[str]:
+    """Returns the motifs of `reference` as context phrases (or an explanatory phrase on failure)."""
+    print(f"   - Searching for motifs from '{reference}' using Tavily...")
+    try:
+        return _motifs_to_phrases(fetch_reference_motifs(reference))
+    except Exception as e:
+        print(f"   - ERROR in Reference Agent: {e}")
+        return [f"Could not retrieve details for '{reference}'."]
 
+async def afetch_reference_phrases(reference: str) -> List[str]:
+    """Async twin of `fetch_reference_phrases`."""
+    print(f"   - Searching for motifs from '{reference}' using Tavily...")
+    try:
+        return _motifs_to_phrases(await afetch_reference_motifs(reference))
     except Exception as e:
         print(f"   - ERROR in Reference Agent: {e}")
-        narrative_state.inspiration_phrases = [f"Could not retrieve details for '{reference}'."]
+        return [f"Could not retrieve details for '{reference}'."]
+
+def run_reference_agent(state: AppState) -> Dict[str, Any]:
+    print("---AGENT: Running Reference Agent (Live)---")
+    narrative_state = state.narrative_state
+    reference = narrative_state.story_reference
+    
+    if not reference:
+        return {}
+
+    narrative_state.inspiration_phrases = fetch_reference_phrases(reference)
+    return {"narrative_state": narrative_state}
+
+async def arun_reference_agent(state: AppState) -> Dict[str, Any]:
+    """Async twin of `run_reference_agent`."""
+    print("---AGENT: Running Reference Agent (Live, async)---")
+    narrative_state = state.narrative_state
+    if not narrative_state.story_reference:
+        return {}
 
-    state.narrative_state = narrative_state
-    return state
\ No newline at end of file
+    narrative_state.inspiration_phrases = await afetch_reference_phrases(narrative_state.story_reference)
+    return {"narrative_state": narrative_state}
@@ -1,16 +1,53 @@
 # src/agents/refiner.py
 # FINAL VERIFIED VERSION - Corrected the prompt import and added robust logic.
 
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.llm import get_chat_model
 from ..core.schemas import ImagePrompt
 
 # --- THIS IS THE FIX ---
 # We are now importing the correct variable name from the prompts file.
 from ..core.prompts import PROMPT_REFINER_PROMPT
 
+@lru_cache(maxsize=1)
+def get_refiner_chain():
+    prompt_template = ChatPromptTemplate.from_template(PROMPT_REFINER_PROMPT)
+    return prompt_template | get_chat_model("gpt-4o", temperature=0.5)
+
+def _get_refinement_source(state: Dict[str, Any]) -> Optional[str]:
+    """Returns the text of the prompt the user asked to refine, if there is one."""
+    refinement_target = state.get("active_prompt_for_refinement")
+    if refinement_target == "image":
+        original_prompt_obj: ImagePrompt = state.get("image_prompt")
+        return original_prompt_obj.prompt_body if original_prompt_obj else None
+    if refinement_target == "video":
+        return state.get("video_prompt")
+    return None # Invalid target
+
+def _build_refinement_update(state: Dict[str, Any], refined_prompt_str: str) -> Dict[str, Any]:
+    print(f"---AGENT: Refined prompt to: {refined_prompt_str[:100]}...---")
+
+    # Prepare the state update dictionary
+    update_dict = {
+        "user_feedback": None,  # Clear feedback to prevent loops
+        "active_prompt_for_refinement": None # Clear target
+    }
+
+    # Update the correct part of the state with the new prompt
+    refinement_target = state.get("active_prompt_for_refinement")
+    if refinement_target == "image":
+        # When refining an image prompt, we only update the body, keeping the tech parameters.
+        # Copy rather than mutate: the state's prompt object is shared with the caller.
+        original_prompt_obj: ImagePrompt = state.get("image_prompt")
+        update_dict["image_prompt"] = original_prompt_obj.model_copy(update={"prompt_body": refined_prompt_str})
+    elif refinement_target == "video":
+        update_dict["video_prompt"] = refined_prompt_str
+        
+    return update_dict
+
 def run_refiner(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Takes user feedback and refines an existing prompt (either image or video).
@@ -25,47 +62,33 @@ def run_refiner(state: Dict[str, Any]) -> Dict[str, Any]:
         return {}
 
     # Determine which prompt to refine based on the target
-    if refinement_target == "image":
-        original_prompt_obj: ImagePrompt = state.get("image_prompt")
-        if not original_prompt_obj:
-            return {"user_feedback": None} # Nothing to refine, clear feedback
-        original_prompt_text = original_prompt_obj.prompt_body
-    elif refinement_target == "video":
-        original_prompt_text = state.get("video_prompt")
-        if not original_prompt_text:
-            return {"user_feedback": None} # Nothing to refine, clear feedback
-    else:
-        return {"user_feedback": None} # Invalid target, clear feedback
-
-    # Initialize the LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.5)
-
-    # --- THIS IS THE SECOND PART OF THE FIX ---
-    # Create the prompt template using the CORRECT variable name.
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_REFINER_PROMPT)
-    
-    chain = prompt_template | llm
+    original_prompt_text = _get_refinement_source(state)
+    if not original_prompt_text:
+        return {"user_feedback": None} # Nothing to refine, clear feedback
 
-    # Invoke the chain to get the refined prompt string
-    refined_prompt_str = chain.invoke({
+    # Invoke the shared chain to get the refined prompt string
+    refined_prompt_str = get_refiner_chain().invoke({
         "original_prompt": original_prompt_text,
         "user_feedback": user_feedback
     }).content
     
-    print(f"---AGENT: Refined prompt to: {refined_prompt_str[:100]}...---")
+    return _build_refinement_update(state, refined_prompt_str)
 
-    # Prepare the state update dictionary
-    update_dict = {
-        "user_feedback": None,  # Clear feedback to prevent loops
-        "active_prompt_for_refinement": None # Clear target
-    }
+async def arun_refiner(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_refiner`."""
+    print("---AGENT: PROMPT REFINER (async)---")
 
-    # Update the correct part of the state with the new prompt
-    if refinement_target == "image":
-        # When refining an image prompt, we only update the body, keeping the tech parameters.
-        original_prompt_obj.prompt_body = refined_prompt_str
-        update_dict["image_prompt"] = original_prompt_obj
-    elif refinement_target == "video":
-        update_dict["video_prompt"] = refined_prompt_str
-        
-    return update_dict
\ No newline at end of file
+    user_feedback = state.get("user_feedback")
+    if not user_feedback or not state.get("active_prompt_for_refinement"):
+        print("---AGENT: SKIPPING REFINER - NO FEEDBACK OR TARGET---")
+        return {}
+
+    original_prompt_text = _get_refinement_source(state)
+    if not original_prompt_text:
+        return {"user_feedback": None} # Nothing to refine, clear feedback
+
+    refined_message = await get_refiner_chain().ainvoke({
+        "original_prompt": original_prompt_text,
+        "user_feedback": user_feedback
+    })
+    return _build_refinement_update(state, refined_message.content)
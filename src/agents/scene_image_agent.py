@@ -0,0 +1,79 @@
+# src/agents/scene_image_agent.py
+"""
+Generates the Before and After scene images for a finished Stage 3 narrative.
+
+The two prompts are independent, so the scene-image graph runs one branch per
+scene in the same superstep; the total latency is a single generation
+round-trip. `link_scene_images` then stores both images on the narrative state
+they were generated from.
+"""
+import logging
+from typing import Any, Callable, Dict, Literal
+
+from src.core.schemas import ImageGenerationParams, SceneImageGraphState
+from src.agents.image_generator import get_image_generator
+
+logger = logging.getLogger(__name__)
+
+Scene = Literal["before", "after"]
+
+
+def _scene_params(state: SceneImageGraphState, scene: Scene) -> ImageGenerationParams:
+    output = state.narrative_state.cinematic_output
+    prompt = output.before_scene_prompt if scene == "before" else output.after_scene_prompt
+    return ImageGenerationParams(prompt=prompt, model=state.model, aspect_ratio=state.aspect_ratio)
+
+
+def _scene_failure(scene: Scene, e: Exception) -> Dict[str, Any]:
+    error_msg = f"Failed to generate the {scene} scene image: {e}"
+    logger.error(error_msg, exc_info=e)
+    return {"scene_image_errors": [error_msg]}
+
+
+def _make_scene_node(scene: Scene) -> Callable[[SceneImageGraphState], Dict[str, Any]]:
+    def run_scene_image(state: SceneImageGraphState) -> Dict[str, Any]:
+        if not state.narrative_state.cinematic_output:
+            return {}
+        print(f"---BRANCH: {scene.capitalize()} scene image---")
+        try:
+            return {f"{scene}_scene_image": get_image_generator().generate(_scene_params(state, scene))}
+        except Exception as e:
+            return _scene_failure(scene, e)
+
+    run_scene_image.__name__ = f"run_{scene}_scene_image"
+    return run_scene_image
+
+
+def _make_async_scene_node(scene: Scene):
+    async def arun_scene_image(state: SceneImageGraphState) -> Dict[str, Any]:
+        if not state.narrative_state.cinematic_output:
+            return {}
+        print(f"---BRANCH: {scene.capitalize()} scene image (async)---")
+        try:
+            return {f"{scene}_scene_image": await get_image_generator().agenerate(_scene_params(state, scene))}
+        except Exception as e:
+            return _scene_failure(scene, e)
+
+    arun_scene_image.__name__ = f"arun_{scene}_scene_image"
+    return arun_scene_image
+
+
+run_before_scene_image = _make_scene_node("before")
+arun_before_scene_image = _make_async_scene_node("before")
+run_after_scene_image = _make_scene_node("after")
+arun_after_scene_image = _make_async_scene_node("after")
+
+
+def link_scene_images(state: SceneImageGraphState) -> Dict[str, Any]:
+    """Attaches the generated images to the narrative state (a failed scene keeps its previous image)."""
+    if not state.narrative_state.cinematic_output:
+        return {"error_message": "Generate a cinematic scene before creating its images."}
+    updates = {
+        field: image
+        for field, image in (("before_scene_image", state.before_scene_image), ("after_scene_image", state.after_scene_image))
+        if image is not None
+    }
+    return {
+        "narrative_state": state.narrative_state.model_copy(update=updates),
+        "error_message": " | ".join(state.scene_image_errors) or None,
+    }
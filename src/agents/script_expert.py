@@ -2,12 +2,19 @@
 # DIAGNOSTIC VERSION - This will force the hidden error to be printed.
 
 import json
+from functools import lru_cache
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.llm import get_chat_model
 from ..core.schemas import Screenplay, StoryArc
 from ..core.prompts import SCRIPT_EXPERT_PROMPT
 
+@lru_cache(maxsize=1)
+def get_script_expert_chain():
+    structured_llm = get_chat_model("gpt-4o", temperature=0.5, schema=Screenplay, json_mode=True)
+    prompt_template = ChatPromptTemplate.from_template(SCRIPT_EXPERT_PROMPT)
+    return prompt_template | structured_llm
+
 def script_expert_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Takes a StoryArc and writes a full Screenplay."""
     print("---AGENT: SCRIPT EXPERT---")
@@ -22,15 +29,10 @@ def script_expert_node(state: Dict[str, Any]) -> Dict[str, Any]:
     # We will wrap the most likely point of failure in a try...except block.
     # This will catch the silent error and print it for us to see.
     try:
-        llm = ChatOpenAI(model="gpt-4o", temperature=0.5, model_kwargs={"response_format": {"type": "json_object"}})
-        structured_llm = llm.with_structured_output(Screenplay)
-        prompt_template = ChatPromptTemplate.from_template(SCRIPT_EXPERT_PROMPT)
-        chain = prompt_template | structured_llm
-
         story_arc_json_string = json.dumps(story_arc.model_dump(), indent=2)
         
         # This is the line that is likely failing.
-        response = chain.invoke({"story_arc": story_arc_json_string})
+        response = get_script_expert_chain().invoke({"story_arc": story_arc_json_string})
         
         print("---AGENT: Generated Screenplay---")
         
@@ -47,4 +49,22 @@ def script_expert_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # Return the state unmodified so the app doesn't crash completely.
         return state
 
-    return state
\ No newline at end of file
+    return state
+
+async def ascript_expert_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `script_expert_node`."""
+    print("---AGENT: SCRIPT EXPERT (async)---")
+
+    narrative_state = state.get("narrative_state", {})
+    story_arc: StoryArc = narrative_state.get("story_arc")
+    if not story_arc:
+        print("---AGENT: SKIPPING SCRIPT EXPERT - NO STORY ARC---")
+        return state
+
+    try:
+        story_arc_json_string = json.dumps(story_arc.model_dump(), indent=2)
+        state["narrative_state"]["screenplay"] = await get_script_expert_chain().ainvoke({"story_arc": story_arc_json_string})
+        print("---AGENT: Generated Screenplay---")
+    except Exception as e:
+        print(f"!!!!!! AGENT `script_expert` CRASHED! ERROR_TYPE: {type(e)} ERROR_DETAILS: {e}")
+    return state
@@ -3,14 +3,18 @@
 The "Master Storyteller" agent for the Cinematic Narrative Engine (Stage 3).
 This version is updated to use modern LangChain libraries and remove deprecation warnings.
 """
-from typing import Dict
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+from langchain_core.outputs import Generation
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableConfig
 # UPDATED: Import directly from Pydantic v2
 from pydantic import BaseModel, Field
 
 # --- Import schemas for type-safety and structured output ---
+from src.core.callbacks import SCENE_STREAM_CALLBACK_KEY
+from src.core.llm import get_chat_model
 from src.core.schemas import AppState, CinematicNarrativeOutput
 
 # ==============================================================================
@@ -24,9 +28,8 @@ class LLMStorytellerOutput(BaseModel):
     after_scene_prompt: str = Field(description="A clean, descriptive text-to-image prompt for the 'After' scene. No technical parameters like --ar.")
 
 # ==============================================================================
-# == 2. INITIALIZE THE LLM AND OUTPUT PARSER
+# == 2. INITIALIZE THE OUTPUT PARSER (the LLM client is created on first use)
 # ==============================================================================
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
 parser = JsonOutputParser(pydantic_object=LLMStorytellerOutput)
 
 # ==============================================================================
@@ -67,42 +70,84 @@ master_prompt = ChatPromptTemplate.from_messages([
 # ==============================================================================
 # == 4. BUILD THE FINAL AGENTIC CHAIN
 # ==============================================================================
-storyteller_chain = master_prompt | llm | parser
+@lru_cache(maxsize=1)
+def get_storyteller_chain():
+    return master_prompt | get_chat_model("gpt-4o", temperature=0.7) | parser
+
+# The same prompt and model without the parser, so raw tokens can be streamed.
+@lru_cache(maxsize=1)
+def get_storyteller_text_chain():
+    return master_prompt | get_chat_model("gpt-4o", temperature=0.7)
+
+# The callback receives the partially parsed LLMStorytellerOutput dict as it grows.
+SceneStreamCallback = Callable[[Dict], None]
+
+def _emit_if_scenes_changed(full_text: str, last_scenes: tuple, on_partial: SceneStreamCallback) -> tuple:
+    """Parses the partial JSON and calls `on_partial` when the scene text has grown."""
+    partial = parser.parse_result([Generation(text=full_text)], partial=True)
+    if not isinstance(partial, dict):
+        return last_scenes
+    scenes = (partial.get("before_scene_cinematic"), partial.get("after_scene_cinematic"))
+    if scenes != last_scenes:
+        on_partial(partial)
+    return scenes
+
+def stream_storyteller(inputs: Dict, on_partial: SceneStreamCallback) -> Dict:
+    """
+    Streams the storyteller's JSON token-by-token, calling `on_partial` whenever
+    the before/after scene text grows. The return value is parsed from the full
+    text exactly as `get_storyteller_chain().invoke` would parse it.
+    """
+    full_text = ""
+    last_scenes = (None, None)
+    for chunk in get_storyteller_text_chain().stream(inputs):
+        if not isinstance(chunk.content, str):
+            continue
+        full_text += chunk.content
+        last_scenes = _emit_if_scenes_changed(full_text, last_scenes, on_partial)
+    return parser.parse(full_text)
+
+async def astream_storyteller(inputs: Dict, on_partial: SceneStreamCallback) -> Dict:
+    """Async twin of `stream_storyteller`."""
+    full_text = ""
+    last_scenes = (None, None)
+    async for chunk in get_storyteller_text_chain().astream(inputs):
+        if not isinstance(chunk.content, str):
+            continue
+        full_text += chunk.content
+        last_scenes = _emit_if_scenes_changed(full_text, last_scenes, on_partial)
+    return parser.parse(full_text)
 
 # ==============================================================================
 # == 5. CREATE THE NODE FUNCTION FOR THE GRAPH
 # ==============================================================================
-def run_cinematic_prompt_engineer(state: AppState) -> AppState:
-    """
-    This is the final creative step. It calls the LLM with all gathered context
-    to generate the final cinematic output.
-    """
-    print("---AGENT: Running Master Storyteller (Cinematic Prompt Engineer)---")
-    narrative_state = state.narrative_state
-    
+def _get_scene_stream_callback(config: Optional[RunnableConfig]) -> Optional[SceneStreamCallback]:
+    return ((config or {}).get("configurable") or {}).get(SCENE_STREAM_CALLBACK_KEY)
+
+def _storyteller_inputs(narrative_state) -> Dict:
     inspiration_text = "No specific inspiration provided."
     if narrative_state.inspiration_phrases:
         inspiration_text = "\n".join([f"- {phrase}" for phrase in narrative_state.inspiration_phrases])
+    if narrative_state.image_analysis:
+        inspiration_text += f"\n\n**VISUAL ANALYSIS OF THE SOURCE IMAGE:**\n{narrative_state.image_analysis}"
 
-    print("   - Synthesizing all context and calling GPT-4o...")
-    try:
-        llm_response_dict: Dict = storyteller_chain.invoke({
-            "initial_idea": narrative_state.initial_idea,
-            "genre": narrative_state.genre,
-            "mood": narrative_state.mood,
-            "inspiration_phrases": inspiration_text,
-        })
-        
-        final_output = CinematicNarrativeOutput(
+    return {
+        "initial_idea": narrative_state.initial_idea,
+        "genre": narrative_state.genre,
+        "mood": narrative_state.mood,
+        "inspiration_phrases": inspiration_text,
+    }
+
+def _apply_storyteller_result(state: AppState, llm_response_dict: Optional[Dict], error: Optional[Exception] = None) -> Dict[str, Any]:
+    narrative_state = state.narrative_state
+    if error is None:
+        narrative_state.cinematic_output = CinematicNarrativeOutput(
             **llm_response_dict,
             source_of_inspiration=f"{narrative_state.inspiration_mode} - {narrative_state.story_reference or 'N/A'}"
         )
-        
         print("   - GPT-4o generation complete.")
-        narrative_state.cinematic_output = final_output
-
-    except Exception as e:
-        print(f"   - ERROR in Storyteller Agent: {e}")
+    else:
+        print(f"   - ERROR in Storyteller Agent: {error}")
         narrative_state.cinematic_output = CinematicNarrativeOutput(
             before_scene_cinematic="An error occurred while generating the story.",
             after_scene_cinematic="Please check your API keys and try again.",
@@ -112,6 +157,40 @@ def run_cinematic_prompt_engineer(state: AppState) -> AppState:
         )
     
     narrative_state.is_locked = True
-    state.narrative_state = narrative_state
-    
-    return state
\ No newline at end of file
+    return {"narrative_state": narrative_state}
+
+def run_cinematic_prompt_engineer(state: AppState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """
+    This is the final creative step. It calls the LLM with all gathered context
+    to generate the final cinematic output. When a scene stream callback is set
+    in the run config, the scenes are streamed to it while they are written.
+    """
+    print("---AGENT: Running Master Storyteller (Cinematic Prompt Engineer)---")
+    on_partial = _get_scene_stream_callback(config)
+    storyteller_inputs = _storyteller_inputs(state.narrative_state)
+
+    print("   - Synthesizing all context and calling GPT-4o...")
+    try:
+        if on_partial:
+            llm_response_dict: Dict = stream_storyteller(storyteller_inputs, on_partial)
+        else:
+            llm_response_dict: Dict = get_storyteller_chain().invoke(storyteller_inputs)
+        return _apply_storyteller_result(state, llm_response_dict)
+    except Exception as e:
+        return _apply_storyteller_result(state, None, e)
+
+async def arun_cinematic_prompt_engineer(state: AppState, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+    """Async twin of `run_cinematic_prompt_engineer`."""
+    print("---AGENT: Running Master Storyteller (Cinematic Prompt Engineer, async)---")
+    on_partial = _get_scene_stream_callback(config)
+    storyteller_inputs = _storyteller_inputs(state.narrative_state)
+
+    print("   - Synthesizing all context and calling GPT-4o...")
+    try:
+        if on_partial:
+            llm_response_dict: Dict = await astream_storyteller(storyteller_inputs, on_partial)
+        else:
+            llm_response_dict: Dict = await get_storyteller_chain().ainvoke(storyteller_inputs)
+        return _apply_storyteller_result(state, llm_response_dict)
+    except Exception as e:
+        return _apply_storyteller_result(state, None, e)
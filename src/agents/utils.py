@@ -1,49 +1,64 @@
 # src/agents/utils.py
 # This file contains utility functions shared across different agents.
 
-from langchain_openai import ChatOpenAI
+import asyncio
+from functools import lru_cache
+from langchain_core.prompts import ChatPromptTemplate
+from src.core.images import prepare_image_for_vision
+from src.core.llm import get_chat_model
+from src.core.response_cache import visual_analysis_cache_key, get_cached_visual_analysis, store_visual_analysis
 from src.core.schemas import VisualAnalysis
-import base64
 
-# --- Import the correct message classes from LangChain ---
-from langchain_core.messages import HumanMessage
+NARRATIVE_ANALYSIS_MODEL = "gpt-4o"
+NARRATIVE_ANALYSIS_INSTRUCTION = "You are a master art director. Analyze this image for its narrative potential. Deconstruct its visual and emotional components into the structured format requested. Focus on details a filmmaker would find invaluable."
+
+@lru_cache(maxsize=1)
+def get_narrative_analysis_chain():
+    # gpt-4o is the modern, preferred choice for this.
+    # It fully supports structured output and is generally faster and cheaper.
+    # A single HumanMessage carries both content blocks (text and image).
+    prompt = ChatPromptTemplate.from_messages([
+        ("human", [
+            {"type": "text", "text": NARRATIVE_ANALYSIS_INSTRUCTION},
+            {"type": "image_url", "image_url": {"url": "{image_url}"}},
+        ])
+    ])
+    return prompt | get_chat_model(NARRATIVE_ANALYSIS_MODEL, max_tokens=1024, schema=VisualAnalysis)
 
 def analyze_image_for_narrative(image_bytes: bytes) -> str:
     """
     Analyzes an image using a vision model and returns a structured analysis
     as a string, ready to be injected into a subsequent prompt.
     """
-    # 1. Select the right model. gpt-4o is the modern, preferred choice for this.
-    # It fully supports structured output and is generally faster and cheaper.
-    vision_llm = ChatOpenAI(model="gpt-4o", max_tokens=1024)
-    structured_llm = vision_llm.with_structured_output(VisualAnalysis)
+    prepared_image = prepare_image_for_vision(image_bytes)
+    cache_key = visual_analysis_cache_key(prepared_image.content_hash, NARRATIVE_ANALYSIS_MODEL, NARRATIVE_ANALYSIS_INSTRUCTION)
 
-    encoded_image = base64.b64encode(image_bytes).decode('utf-8')
-    image_url = f"data:image/png;base64,{encoded_image}"
-
-    # 2. THIS IS THE FIX: Construct the message using the correct "envelope".
-    # We create a single HumanMessage that contains a list of content blocks (text and image).
-    message = HumanMessage(
-        content=[
-            {
-                "type": "text",
-                "text": "You are a master art director. Analyze this image for its narrative potential. Deconstruct its visual and emotional components into the structured format requested. Focus on details a filmmaker would find invaluable.",
-            },
-            {
-                "type": "image_url",
-                "image_url": {"url": image_url},
-            },
-        ]
-    )
-    
     try:
-        # 3. Invoke the model with the correctly formatted message.
-        # We pass the message inside a list, as the invoke method expects an iterable.
-        analysis_result = structured_llm.invoke([message])
+        # 1. Reuse a cached analysis of this exact image, or invoke the shared vision chain.
+        analysis_result = get_cached_visual_analysis(cache_key)
+        if analysis_result is None:
+            analysis_result = get_narrative_analysis_chain().invoke({"image_url": prepared_image.data_url})
+            store_visual_analysis(cache_key, analysis_result)
         
-        # 4. Convert the Pydantic object to a nicely formatted JSON string for the next LLM.
+        # 2. Convert the Pydantic object to a nicely formatted JSON string for the next LLM.
         return analysis_result.model_dump_json(indent=2)
     except Exception as e:
         print(f"Error during image analysis: {e}")
         # This print will now show up in your terminal if something else goes wrong.
-        return "Error: The provided image could not be analyzed."
\ No newline at end of file
+        return "Error: The provided image could not be analyzed."
+
+async def aanalyze_image_for_narrative(image_bytes: bytes) -> str:
+    """Async twin of `analyze_image_for_narrative`."""
+    # Pillow work is CPU-bound, so keep it off the event loop.
+    prepared_image = await asyncio.to_thread(prepare_image_for_vision, image_bytes)
+    cache_key = visual_analysis_cache_key(prepared_image.content_hash, NARRATIVE_ANALYSIS_MODEL, NARRATIVE_ANALYSIS_INSTRUCTION)
+
+    try:
+        analysis_result = get_cached_visual_analysis(cache_key)
+        if analysis_result is None:
+            analysis_result = await get_narrative_analysis_chain().ainvoke({"image_url": prepared_image.data_url})
+            store_visual_analysis(cache_key, analysis_result)
+        return analysis_result.model_dump_json(indent=2)
+    except Exception as e:
+        print(f"Error during image analysis: {e}")
+        return "Error: The provided image could not be analyzed."
@@ -1,14 +1,52 @@
 # src/agents/video_director.py
 # FINAL VERIFIED VERSION - Corrected the logic for handling image data.
 
+import asyncio
+from functools import lru_cache
 from typing import Dict, Any
-import base64
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage
 
+from ..core.blobs import resolve_blob
+from ..core.images import prepare_image_for_vision
+from ..core.llm import get_chat_model
 from ..core.prompts import VIDEO_DIRECTOR_PROMPT
+from ..core.schemas import VideoCreativeBrief
+
+# The brief is filled in per call; the image travels as the `image_url` variable.
+VIDEO_TASK_TEMPLATE = """
+    **Creative Brief:**
+    - Moods to capture: {moods}
+    - Desired camera movement: {camera_movement}
+    - Additional Director's Notes: {additional_notes}
+
+    **Your Task:**
+    Based on the provided image and the creative brief, generate a concise, single-paragraph video prompt.
+    The prompt should be suitable for a text-to-video model like Sora or Runway.
+    Describe the scene, the action, and the cinematic style.
+    """
+
+@lru_cache(maxsize=1)
+def get_video_director_chain():
+    # We use gpt-4o as it's best for multimodal tasks.
+    prompt = ChatPromptTemplate.from_messages([
+        ("human", [
+            {"type": "text", "text": VIDEO_TASK_TEMPLATE},
+            {"type": "image_url", "image_url": {"url": "{image_url}"}},
+        ])
+    ])
+    return prompt | get_chat_model("gpt-4o", temperature=0.4)
+
+def _brief_inputs(state: Dict[str, Any]) -> Dict[str, str]:
+    """Reads the user's creative brief from the state, with the agent's defaults."""
+    brief = state.get("video_creative_brief") or {}
+    if isinstance(brief, VideoCreativeBrief):
+        brief = brief.model_dump(exclude_none=True)
+    return {
+        "moods": ', '.join(brief.get("moods", ["cinematic"])),
+        "camera_movement": brief.get("camera_movement", "none"),
+        "additional_notes": brief.get("additional_notes", "N/A"),
+    }
 
 def run_video_director(state: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -19,7 +57,7 @@ def run_video_director(state: Dict[str, Any]) -> Dict[str, Any]:
     
     # --- THIS IS THE FIX ---
     # The agent was failing to correctly find the image. We now have robust logic.
-    image_bytes = state.get("original_image_bytes")
+    image_bytes = resolve_blob(state.get("original_image_ref"))
     
     if not image_bytes:
         # This was the message you saw in your log.
@@ -30,48 +68,37 @@ def run_video_director(state: Dict[str, Any]) -> Dict[str, Any]:
     # If we have an image, proceed with the agent's main logic.
     print("---AGENT: Image found, generating video prompt...---")
     
-    # Encode the image for the API call
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    # Downscale and encode the image for the API call (shared with Stage 1 via the cache)
+    prepared_image = prepare_image_for_vision(image_bytes)
     
-    # Get the user's creative brief from the state
-    brief = state.get("video_creative_brief", {})
-    moods = brief.get("moods", ["cinematic"])
-    camera_movement = brief.get("camera_movement", "none")
-    additional_notes = brief.get("additional_notes", "N/A")
-
-    # Initialize the LLM
-    # We use gpt-4o as it's best for multimodal tasks.
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.4)
+    # Invoke the shared multimodal chain with the user's creative brief
+    response = get_video_director_chain().invoke({
+        **_brief_inputs(state),
+        "image_url": prepared_image.data_url,
+    })
+    video_prompt_text = response.content
+    
+    print(f"---AGENT: Generated Video Prompt: {video_prompt_text[:100]}...---")
 
-    # Construct the prompt with all the information
-    prompt_text = f"""
-    **Creative Brief:**
-    - Moods to capture: {', '.join(moods)}
-    - Desired camera movement: {camera_movement}
-    - Additional Director's Notes: {additional_notes}
+    # Return the result in the correct key to update the application's master state
+    return {"video_prompt": video_prompt_text}
 
-    **Your Task:**
-    Based on the provided image and the creative brief, generate a concise, single-paragraph video prompt.
-    The prompt should be suitable for a text-to-video model like Sora or Runway.
-    Describe the scene, the action, and the cinematic style.
-    """
+async def arun_video_director(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_video_director`."""
+    print("---AGENT: VIDEO DIRECTOR (async)---")
 
-    # Create the message payload for the multimodal LLM
-    message = HumanMessage(
-        content=[
-            {"type": "text", "text": prompt_text},
-            {
-                "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-            },
-        ]
-    )
+    image_bytes = resolve_blob(state.get("original_image_ref"))
+    if not image_bytes:
+        print("---AGENT: SKIPPING VIDEO DIRECTOR - NO IMAGE PROVIDED IN STATE---")
+        return {}
 
-    # Invoke the LLM and get the response
-    response = llm.invoke([message])
+    # Pillow work is CPU-bound, so keep it off the event loop.
+    prepared_image = await asyncio.to_thread(prepare_image_for_vision, image_bytes)
+    response = await get_video_director_chain().ainvoke({
+        **_brief_inputs(state),
+        "image_url": prepared_image.data_url,
+    })
     video_prompt_text = response.content
-    
-    print(f"---AGENT: Generated Video Prompt: {video_prompt_text[:100]}...---")
 
-    # Return the result in the correct key to update the application's master state
-    return {"video_prompt": video_prompt_text}
\ No newline at end of file
+    print(f"---AGENT: Generated Video Prompt: {video_prompt_text[:100]}...---")
+    return {"video_prompt": video_prompt_text}
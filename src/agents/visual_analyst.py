@@ -1,34 +1,71 @@
 # src/agents/visual_analyst.py
-import base64
+import asyncio
+from functools import lru_cache
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from ..core.blobs import resolve_blob
+from ..core.images import prepare_image_for_vision
+from ..core.llm import get_chat_model
+from ..core.response_cache import visual_analysis_cache_key, get_cached_visual_analysis, store_visual_analysis
 from ..core.schemas import VisualAnalysis
 from ..core.prompts import VISUAL_ANALYST_PROMPT
 
+VISUAL_ANALYST_MODEL = "gpt-4o"
+
+@lru_cache(maxsize=1)
+def get_visual_analyst_chain():
+    """Builds the vision chain once; the image is passed in as the `image_url` variable."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", VISUAL_ANALYST_PROMPT),
+        ("human", [{"type": "text", "text": "Analyze this image..."},
+                   {"type": "image_url", "image_url": {"url": "{image_url}"}}])
+    ])
+    return prompt | get_chat_model(VISUAL_ANALYST_MODEL, temperature=0.2, schema=VisualAnalysis)
+
 def run_visual_analyst(state: Dict[str, Any]) -> Dict[str, Any]:
     print("---AGENT: VISUAL ANALYST---")
     print(f"STATE KEYS RECEIVED BY VISUAL_ANALYST: {list(state.keys())}")
 
-    image_bytes = state.get("original_image_bytes")
+    image_bytes = resolve_blob(state.get("original_image_ref"))
     if not image_bytes:
         print("---AGENT: SKIPPING VISUAL ANALYST - NO IMAGE---")
-        return state
+        return {}
 
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.2)
-    structured_llm = llm.with_structured_output(VisualAnalysis)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", VISUAL_ANALYST_PROMPT),
-        ("human", [{"type": "text", "text": "Analyze this image..."},
-                   {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}])
-    ])
-    chain = prompt | structured_llm
-    response = chain.invoke({})
-    
-    print("---AGENT: Generated Visual Analysis---")
+    # Downscaled, re-encoded and labelled with its real MIME type.
+    prepared_image = prepare_image_for_vision(image_bytes)
+
+    # The same image, model and prompt always yield a reusable analysis.
+    cache_key = visual_analysis_cache_key(prepared_image.content_hash, VISUAL_ANALYST_MODEL, VISUAL_ANALYST_PROMPT)
+    response = get_cached_visual_analysis(cache_key)
+    if response is not None:
+        print("---AGENT: Visual Analysis served from cache---")
+    else:
+        response = get_visual_analyst_chain().invoke({"image_url": prepared_image.data_url})
+        store_visual_analysis(cache_key, response)
+        print("---AGENT: Generated Visual Analysis---")
     
-    # --- THIS IS THE FIX ---
-    # Add the result to the state and return the ENTIRE state.
-    state["visual_analysis"] = response
-    return state
\ No newline at end of file
+    # Return only the key this node changed; the graph merges it into the state.
+    return {"visual_analysis": response}
+
+async def arun_visual_analyst(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async twin of `run_visual_analyst`, used when the graph runs through `ainvoke`."""
+    print("---AGENT: VISUAL ANALYST (async)---")
+
+    image_bytes = resolve_blob(state.get("original_image_ref"))
+    if not image_bytes:
+        print("---AGENT: SKIPPING VISUAL ANALYST - NO IMAGE---")
+        return {}
+
+    # Pillow work is CPU-bound, so keep it off the event loop.
+    prepared_image = await asyncio.to_thread(prepare_image_for_vision, image_bytes)
+
+    cache_key = visual_analysis_cache_key(prepared_image.content_hash, VISUAL_ANALYST_MODEL, VISUAL_ANALYST_PROMPT)
+    response = get_cached_visual_analysis(cache_key)
+    if response is not None:
+        print("---AGENT: Visual Analysis served from cache---")
+    else:
+        response = await get_visual_analyst_chain().ainvoke({"image_url": prepared_image.data_url})
+        store_visual_analysis(cache_key, response)
+        print("---AGENT: Generated Visual Analysis---")
+
+    return {"visual_analysis": response}
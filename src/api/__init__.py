@@ -0,0 +1,5 @@
+# src/api/__init__.py
+"""
+HTTP API for ImageCodeX (optional; install with `poetry install --extras api`).
+"""
+from .app import app, create_app
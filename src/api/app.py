@@ -0,0 +1,318 @@
+# src/api/app.py
+"""
+ASGI service exposing the ImageCodeX workflows to programmatic clients.
+
+Endpoints:
+
+- `POST /v1/visual-prompt`         Stages 1 & 2 (analysis, prompt, critique, refinement; "fast" mode)
+- `POST /v1/cinematic-narrative`   Stage 3 Before/After scenes
+- `POST /v1/images/generations`    Stage 4, as a job: returns 202 and a job id
+- `GET  /v1/jobs/{job_id}`         job status and the images finished so far
+- `GET  /v1/jobs/{job_id}/events`  the job's progress as an NDJSON stream (ends with
+                                   "done", or "timeout" once the job stops progressing)
+- `GET  /metrics`                  span latencies, tokens and cache hits (Prometheus text)
+
+Image jobs are batches on the durable queue in `src.jobs` (the job id is the
+batch id), so they survive a restart and can be run by standalone workers.
+
+The two workflow endpoints answer with JSON, or with an NDJSON stream of
+per-node updates (and, for Stage 3, the scenes as they are written) when
+called with `?stream=true`.
+
+Graphs are the process-wide compiled ones and run on the shared I/O loop, so
+requests from many clients share one connection pool. At most
+`API_MAX_CONCURRENT_REQUESTS` workflow requests run at once; others wait up to
+`API_QUEUE_TIMEOUT_SECONDS` and are then turned away with 429.
+
+Run with:
+    poetry install --extras api
+    poetry run imagecodex-api            # or: uvicorn src.api.app:app
+"""
+import asyncio
+import base64
+import binascii
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+# --- Load environment variables FIRST (as run_app.py does) ---
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException, Query  # noqa: E402
+from fastapi.responses import PlainTextResponse, StreamingResponse  # noqa: E402
+
+from src.api.schemas import (  # noqa: E402
+    CinematicNarrativeRequest, CinematicNarrativeResponse, ImageGenerationRequest, JobAccepted,
+    JobStatus, VisualPromptRequest, VisualPromptResponse,
+)
+from src.api.streaming import NDJSON_MEDIA_TYPE, EventChannel, ndjson_line  # noqa: E402
+from src.core import config  # noqa: E402
+from src.core.async_runtime import run_on_io_loop  # noqa: E402
+from src.core.blobs import BlobRef, put_blob  # noqa: E402
+from src.core.callbacks import SCENE_STREAM_CALLBACK_KEY  # noqa: E402
+from src.core.schemas import AppState, GeneratedImage, ImageGenerationParams, NarrativeState, VisualWorkflowState  # noqa: E402
+from src.core.state import apply_graph_updates, astream_node_updates, graph_input  # noqa: E402
+from src.core.tracing import PROMETHEUS_MEDIA_TYPE, get_tracer  # noqa: E402
+from src.graph import get_cinematic_narrative_graph, get_enriched_cinematic_narrative_graph, get_visual_workflow_graph_for_mode  # noqa: E402
+from src.jobs import (  # noqa: E402
+    BatchStatus, QueueFullError, batch_error_message, batch_images, ensure_embedded_workers, get_job_queue,
+    submit_image_generation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimit:
+    """At most `limit` holders at once; a caller that waits longer than `timeout` gets a 429."""
+
+    def __init__(self, limit: int, timeout: float):
+        self._semaphore = asyncio.Semaphore(max(1, limit))
+        self.timeout = timeout
+
+    async def acquire(self) -> Callable[[], None]:
+        """Waits for a slot; returns its release function, which is safe to call more than once."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(429, "The service is at capacity; retry shortly.", headers={"Retry-After": "5"})
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._semaphore.release()
+
+        return release
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """
+    A streaming response that holds a request slot. The body releases it when
+    it ends, and so does the response once it has been served, which covers a
+    client that hangs up before the body starts.
+    """
+
+    def __init__(self, content: AsyncIterator[str], release: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+async def _store_image(image_base64: Optional[str]) -> Optional[BlobRef]:
+    """Decodes a base64 image into the blob store; a bad payload is the client's error."""
+    if not image_base64:
+        return None
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.partition(",")[2]
+    if len(image_base64) * 3 // 4 > config.API_MAX_IMAGE_BYTES:
+        raise HTTPException(413, f"Images are limited to {config.API_MAX_IMAGE_BYTES} bytes.")
+    try:
+        data = base64.b64decode(image_base64, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(422, "The image is not valid base64.")
+    return await asyncio.to_thread(put_blob, data)
+
+
+def _visual_result(state: AppState) -> VisualPromptResponse:
+    return VisualPromptResponse(**{field: getattr(state, field) for field in VisualPromptResponse.model_fields})
+
+
+def _narrative_result(state: AppState) -> CinematicNarrativeResponse:
+    return CinematicNarrativeResponse(narrative_state=state.narrative_state, error_message=state.error_message)
+
+
+def _timestamp(seconds: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(seconds, timezone.utc) if seconds is not None else None
+
+
+def _job_status(batch: BatchStatus) -> JobStatus:
+    """An image batch from the job queue, as the API's job status."""
+    started = [job.started_at for job in batch.jobs if job.started_at is not None]
+    return JobStatus(
+        job_id=batch.batch_id, kind=batch.jobs[0].kind, status=batch.status,
+        created_at=_timestamp(batch.jobs[0].created_at),
+        started_at=_timestamp(min(started)) if started else None,
+        finished_at=_timestamp(max(job.finished_at for job in batch.jobs)) if batch.finished else None,
+        images=batch_images(batch), error_message=batch_error_message(batch),
+    )
+
+
+def _events_idle_timeout() -> float:
+    """
+    How long a job's event stream waits without any progress before it ends:
+    one lease (a worker that died mid-job) plus the longest backoff of every retry.
+    """
+    backoff = sum(min(config.JOB_RETRY_MAX_SECONDS, config.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1)) for attempt in range(1, config.JOB_MAX_ATTEMPTS))
+    return config.JOB_LEASE_SECONDS + backoff
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Image jobs run on this process's workers unless they run standalone (imagecodex-worker).
+    await asyncio.to_thread(ensure_embedded_workers)
+    yield
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="ImageCodeX API", version="0.1.0", lifespan=_lifespan)
+    request_limit = ConcurrencyLimit(config.API_MAX_CONCURRENT_REQUESTS, config.API_QUEUE_TIMEOUT_SECONDS)
+
+    async def run_workflow(graph_getter, state: AppState, payload: Any, result: Callable[[AppState], Any], stream: bool, callback_key: Optional[str] = None, callback_event: str = ""):
+        """
+        Runs one workflow under the request limit. Returns the response model,
+        or a streaming response whose slot is released when the stream ends.
+        """
+        graph = graph_getter()
+        release = await request_limit.acquire()
+        if not stream:
+            try:
+                updates = await run_on_io_loop(astream_node_updates(graph, payload))
+                return result(apply_graph_updates(state, updates))
+            except Exception as e:
+                logger.error(f"Workflow request failed: {e}", exc_info=e)
+                raise HTTPException(500, f"The workflow failed: {e}")
+            finally:
+                release()
+
+        channel = EventChannel()
+        run_config = {"configurable": {callback_key: lambda data: channel.emit({"event": callback_event, "data": data})}} if callback_key else None
+
+        async def produce():
+            try:
+                updates = await run_on_io_loop(astream_node_updates(
+                    graph, payload, config=run_config,
+                    on_update=lambda node, update: channel.emit({"event": "node", "node": node, "update": update}),
+                ))
+                channel.emit({"event": "result", "result": result(apply_graph_updates(state, updates))})
+            except Exception as e:
+                logger.error(f"Streaming workflow request failed: {e}", exc_info=e)
+                channel.emit({"event": "error", "detail": str(e)})
+            finally:
+                channel.close()
+
+        async def body() -> AsyncIterator[str]:
+            task = asyncio.create_task(produce())
+            try:
+                async for event in channel:
+                    yield ndjson_line(event)
+            finally:
+                # A client that hangs up cancels its run on the I/O loop too.
+                task.cancel()
+                release()
+
+        return _SlotStreamingResponse(body(), release, media_type=NDJSON_MEDIA_TYPE)
+
+    @app.get("/healthz")
+    async def healthz() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(get_tracer().render_prometheus(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+    @app.post("/v1/visual-prompt", response_model=VisualPromptResponse)
+    async def visual_prompt(request: VisualPromptRequest, stream: bool = Query(False)):
+        state = AppState(
+            original_image_ref=await _store_image(request.image_base64),
+            video_creative_brief=request.video_creative_brief,
+            user_feedback=request.user_feedback,
+            active_prompt_for_refinement=request.active_prompt_for_refinement,
+            image_prompt=request.image_prompt,
+            video_prompt=request.video_prompt,
+        )
+        payload = graph_input(state, VisualWorkflowState.__annotations__, inspect_prompt=request.inspect)
+        return await run_workflow(lambda: get_visual_workflow_graph_for_mode(request.mode), state, payload, _visual_result, stream)
+
+    @app.post("/v1/cinematic-narrative", response_model=CinematicNarrativeResponse)
+    async def cinematic_narrative(request: CinematicNarrativeRequest, stream: bool = Query(False)):
+        narrative = NarrativeState(
+            input_image_ref=await _store_image(request.image_base64),
+            **request.model_dump(include={"initial_idea", "genre", "mood", "inspiration_mode", "story_reference"}),
+        )
+        state = AppState(narrative_state=narrative)
+        graph_getter = get_enriched_cinematic_narrative_graph if request.enriched else get_cinematic_narrative_graph
+        return await run_workflow(
+            graph_getter, state, {"narrative_state": narrative}, _narrative_result, stream,
+            callback_key=SCENE_STREAM_CALLBACK_KEY, callback_event="scene",
+        )
+
+    @app.post("/v1/images/generations", status_code=202, response_model=JobAccepted)
+    async def create_image_generation(request: ImageGenerationRequest):
+        params = ImageGenerationParams(
+            reference_image_ref=await _store_image(request.reference_image_base64),
+            **request.model_dump(exclude={"reference_image_base64"}),
+        )
+        try:
+            job_id = await asyncio.to_thread(submit_image_generation, params)
+        except QueueFullError:
+            raise HTTPException(429, "Too many queued jobs; retry shortly.", headers={"Retry-After": "30"})
+        return JobAccepted(job_id=job_id, status="queued", status_url=f"/v1/jobs/{job_id}", events_url=f"/v1/jobs/{job_id}/events")
+
+    async def _get_batch(job_id: str) -> BatchStatus:
+        batch = await asyncio.to_thread(get_job_queue().get_batch, job_id)
+        if batch is None:
+            raise HTTPException(404, f"No job '{job_id}' (finished jobs expire after {config.JOB_RETENTION_SECONDS:.0f} s).")
+        return batch
+
+    @app.get("/v1/jobs/{job_id}", response_model=JobStatus)
+    async def get_job(job_id: str):
+        return _job_status(await _get_batch(job_id))
+
+    @app.get("/v1/jobs/{job_id}/events")
+    async def job_events(job_id: str):
+        batch = await _get_batch(job_id)
+        idle_timeout = _events_idle_timeout()
+
+        async def body() -> AsyncIterator[str]:
+            # The queue is polled, so a client that connects late still gets every image.
+            current, status, sent = batch, None, set()
+            loop = asyncio.get_running_loop()
+            progress, progressed_at = None, loop.time()
+            while True:
+                if current.status != status:
+                    status = current.status
+                    yield ndjson_line({"event": "status", "status": status})
+                for job in current.jobs:
+                    if job.status == "succeeded" and job.id not in sent:
+                        sent.add(job.id)
+                        yield ndjson_line({"event": "image", "image": GeneratedImage.model_validate(job.result)})
+                if current.finished:
+                    yield ndjson_line({"event": "done", "job": _job_status(current)})
+                    return
+                snapshot = [(job.status, job.attempts) for job in current.jobs]
+                if snapshot != progress:
+                    progress, progressed_at = snapshot, loop.time()
+                elif loop.time() - progressed_at > idle_timeout:
+                    # E.g. a dead worker still inside its lease. The client can
+                    # reconnect (the stream replays) or poll the status URL.
+                    yield ndjson_line({"event": "timeout", "job": _job_status(current)})
+                    return
+                await asyncio.sleep(config.JOB_POLL_SECONDS)
+                current = await asyncio.to_thread(get_job_queue().get_batch, job_id) or current
+
+        return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+    return app
+
+
+app = create_app()
+
+
+def main() -> None:
+    """Serves the API with uvicorn on IMAGECODEX_API_HOST:IMAGECODEX_API_PORT."""
+    import uvicorn
+
+    uvicorn.run("src.api.app:app", host=config.API_HOST, port=config.API_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# src/api/schemas.py
+"""
+Request and response models of the HTTP API.
+
+Images travel as base64 strings; they are stored in the blob store on arrival
+and the workflows only ever see `BlobRef` handles, as in the Streamlit app.
+"""
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from src.core import config
+from src.core.schemas import (
+    GeneratedImage, ImageModelName, ImagePrompt, NarrativeState, PromptCritique,
+    VideoCreativeBrief, VisualAnalysis, VisualPipelineMode,
+)
+
+
+# ==============================================================================
+# == VISUAL PROMPTING (STAGES 1 & 2)
+# ==============================================================================
+class VisualPromptRequest(BaseModel):
+    image_base64: Optional[str] = Field(None, description="The image to analyse (Stage 1).")
+    video_creative_brief: Optional[VideoCreativeBrief] = Field(None, description="Creative brief for a video prompt (Stage 2).")
+    mode: VisualPipelineMode = Field(
+        default_factory=lambda: config.VISUAL_PIPELINE_MODE,
+        description='"quality": analysis, prompt and inspection as three calls; "fast": analysis and prompt in one call.',
+    )
+    inspect: bool = Field(default_factory=lambda: config.FAST_PIPELINE_INSPECT, description="In fast mode, also inspect the prompt.")
+    # --- Refinement of a prompt returned by an earlier call ---
+    user_feedback: Optional[str] = None
+    active_prompt_for_refinement: Optional[Literal["image", "video"]] = None
+    image_prompt: Optional[ImagePrompt] = None
+    video_prompt: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _needs_input(self):
+        if not (self.image_base64 or self.video_creative_brief or self.user_feedback):
+            raise ValueError("Provide an image, a video creative brief, or feedback on an earlier prompt.")
+        return self
+
+
+class VisualPromptResponse(BaseModel):
+    visual_analysis: Optional[VisualAnalysis] = None
+    image_prompt: Optional[ImagePrompt] = None
+    prompt_critique: Optional[PromptCritique] = None
+    video_prompt: Optional[str] = None
+    error_message: Optional[str] = None
+
+
+# ==============================================================================
+# == CINEMATIC NARRATIVE (STAGE 3)
+# ==============================================================================
+class CinematicNarrativeRequest(BaseModel):
+    initial_idea: str
+    image_base64: Optional[str] = None
+    genre: str = "Filmmaker's Choice"
+    mood: str = "Filmmaker's Choice"
+    inspiration_mode: Literal["🧠 AI Imagination", "🎞️ Inspired By", "📚 Original Story"] = "🧠 AI Imagination"
+    story_reference: Optional[str] = None
+    enriched: bool = Field(False, description="Run the reference, inspiration, StyleBank and image-analysis lookups in parallel.")
+
+
+class CinematicNarrativeResponse(BaseModel):
+    narrative_state: NarrativeState
+    error_message: Optional[str] = None
+
+
+# ==============================================================================
+# == IMAGE GENERATION (STAGE 4) JOBS
+# ==============================================================================
+class ImageGenerationRequest(BaseModel):
+    prompt: str
+    model: ImageModelName = "gpt-4o"
+    negative_prompt: Optional[str] = None
+    aspect_ratio: Literal["1:1", "16:9", "9:16"] = "1:1"
+    reference_image_base64: Optional[str] = Field(None, description="Optional reference image for img2img or variations.")
+    num_candidates: int = Field(1, ge=1)
+    extra_models: List[ImageModelName] = Field(default_factory=list)
+
+
+JobState = Literal["queued", "running", "succeeded", "failed"]
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: JobState = "queued"
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    images: List[GeneratedImage] = Field(default_factory=list)
+    error_message: Optional[str] = None
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: JobState
+    status_url: str
+    events_url: str
@@ -0,0 +1,44 @@
+# src/api/streaming.py
+"""
+Plumbing between the workflows and streaming HTTP responses.
+
+Graphs run on the shared I/O loop (`src.core.async_runtime`), where the LLM
+and image clients keep their connections, while responses are written from the
+server's own event loop. An `EventChannel` carries events from one to the
+other: `emit` is safe to call from any thread, and the response iterates it.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.encoders import jsonable_encoder
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_CLOSED = object()
+
+
+class EventChannel:
+    """A one-consumer queue owned by the loop that created it, fed from any thread."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _CLOSED)
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            event = await self._queue.get()
+            if event is _CLOSED:
+                return
+            yield event
+
+
+def ndjson_line(event: Dict[str, Any]) -> str:
+    """One event as a line of newline-delimited JSON (pydantic models included)."""
+    return json.dumps(jsonable_encoder(event), ensure_ascii=False) + "\n"
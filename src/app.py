@@ -1,51 +1,131 @@
 # src/app.py
 # FINAL CORRECTED VERSION - Contains all required controller methods for the new UI.
 
+import uuid
+from typing import Dict
+
 import streamlit as st
 
 # --- RELATIVE IMPORTS ---
 # This line is now corrected to import the new cinematic graph builder
-from src.core.schemas import AppState, VideoCreativeBrief, NarrativeState
-from src.graph import build_visual_workflow_graph, build_cinematic_narrative_graph, build_image_generation_graph
-from src.ui import show_visual_prompting_ui, show_stage3_ui, show_stage4_ui
+from src.core.schemas import AppState, ImageGenerationParams, VideoCreativeBrief, NarrativeState, VisualWorkflowState
+from src.core.config import (
+    ASYNC_EXECUTION_ENABLED, BACKGROUND_INSPECTION_ENABLED, FAST_PIPELINE_INSPECT, SPECULATE_IMAGES, SPECULATION_ENABLED,
+    VISUAL_PIPELINE_MODE,
+)
+from src.core.background_inspection import collect_inspection, inspection_key, start_inspection, is_running as is_inspection_running
+from src.core.blobs import put_blob
+from src.core.gallery import get_gallery_store
+from src.core.callbacks import SCENE_STREAM_CALLBACK_KEY
+from src.core.speculation import get_speculative_executor, speculation_key
+from src.core.state import apply_graph_updates, graph_input, run_graph_for_updates
+from src.jobs import BatchStatus, QueueFullError, batch_error_message, batch_images, ensure_embedded_workers, get_image_batches, submit_image_generation
+from src.graph import get_visual_workflow_graph, get_visual_workflow_graph_for_mode, get_prompt_inspection_graph, get_cinematic_narrative_graph, get_enriched_cinematic_narrative_graph, get_image_generation_graph, get_scene_image_graph
+from src.ui import DEFAULT_VIDEO_BRIEF, default_generation_params, show_visual_prompting_ui, show_stage3_ui, show_stage4_ui, show_state_inspector, show_latency_panel
+
+PENDING_BATCHES_PARAM = "batch"
+GALLERY_PARAM = "gallery"
 
 class AppController:
     """A dedicated controller to manage the application's state and logic."""
     def __init__(self):
-        if 'app_state' not in st.session_state:
-            st.session_state['app_state'] = AppState().model_dump()
-        self.state: AppState = AppState.model_validate(st.session_state['app_state'])
+        # The AppState object itself lives in the session, so a rerun costs no
+        # validation or serialisation. (Older sessions stored a dict: upgrade once.)
+        stored = st.session_state.get('app_state')
+        if not isinstance(stored, AppState):
+            stored = AppState.model_validate(stored) if stored else AppState()
+            st.session_state['app_state'] = stored
+        # Queued image batches and the gallery survive a page reload through the URL.
+        if not stored.pending_image_batches and st.query_params.get_all(PENDING_BATCHES_PARAM):
+            stored.pending_image_batches = st.query_params.get_all(PENDING_BATCHES_PARAM)
+        if GALLERY_PARAM in st.query_params:
+            stored.gallery_id = st.query_params[GALLERY_PARAM]
+        else:
+            st.query_params[GALLERY_PARAM] = stored.gallery_id
+        # (Older sessions kept every image in the state: this files them in the gallery.)
+        self.state: AppState
+        self._update_and_persist_state(stored)
+        ensure_embedded_workers()
 
     def _update_and_persist_state(self, new_state: AppState):
+        # New images go to the gallery store; the session only keeps a handle to it.
+        if new_state.generated_images:
+            get_gallery_store().add(new_state.gallery_id, new_state.generated_images)
+            new_state = new_state.model_copy(update={"generated_images": []})
         self.state = new_state
-        st.session_state['app_state'] = self.state.model_dump()
+        st.session_state['app_state'] = new_state
+
+    def _run_and_update(self, graph_getter, input_payload, workflow_name, config=None, streaming=False, then=None, speculation=None, inputs=None):
+        """
+        Runs a workflow and applies only the keys its nodes returned to the
+        current state (see `src.core.state.apply_graph_updates`). `inputs` are
+        the state fields the run was started with (a new upload, brief or
+        feedback): nodes do not return them, so they are applied first, with
+        the node updates, once the run succeeds. `then`, if
+        given, gets the updated state and returns the one to keep. If a
+        speculative run with the key `speculation` exists, its updates are used
+        instead of running the graph again.
 
-    def _run_and_update(self, graph_builder, input_payload, workflow_name):
+        By default the graph is streamed with `astream` on the shared I/O loop.
+        Runs that stream into Streamlit placeholders (`streaming=True`) stay on
+        the session thread, because Streamlit elements can only be updated from there.
+        """
         with st.spinner(f"The AI team is working on the '{workflow_name}'..."):
             try:
-                graph = graph_builder()
-                final_state_data = graph.invoke(input_payload)
-                validated_state = AppState.model_validate(final_state_data)
-                self._update_and_persist_state(validated_state)
+                updates = self._claim_speculation(speculation) if speculation else None
+                if updates is None:
+                    # Graphs are compiled once per process and shared across sessions.
+                    graph = graph_getter()
+                    updates = run_graph_for_updates(graph, input_payload, config=config, use_async=ASYNC_EXECUTION_ENABLED and not streaming)
+                new_state = apply_graph_updates(self.state, [inputs, *updates])
+                self._update_and_persist_state(then(new_state) if then else new_state)
             except Exception as e:
                 st.error(f"An error occurred during the {workflow_name}.")
                 st.exception(e)
         st.rerun()
 
     # --- NEW METHOD to run the Stage 3 cinematic workflow ---
-    def run_cinematic_narrative_workflow(self, image_bytes: bytes, text_idea: str, genre: str, mood: str, inspiration_mode: str, story_reference: str):
-        """Prepares and runs the new Stage 3 cinematic narrative workflow."""
+    def run_cinematic_narrative_workflow(self, image_bytes: bytes, text_idea: str, genre: str, mood: str, inspiration_mode: str, story_reference: str, on_scene_update=None, enriched: bool = False):
+        """
+        Prepares and runs the new Stage 3 cinematic narrative workflow.
+        If `on_scene_update` is given, the Before/After scenes are streamed to it
+        as partial dicts while the storyteller writes them. `enriched` runs the
+        reference, inspiration, StyleBank and image-analysis lookups in parallel.
+        """
         current_state = self.state
         
         # Update the narrative state with fresh inputs from the UI
-        current_state.narrative_state.input_image_bytes = image_bytes
+        # Only a handle goes into the state; the bytes live once in the blob store.
+        current_state.narrative_state.input_image_ref = put_blob(image_bytes)
         current_state.narrative_state.initial_idea = text_idea
         current_state.narrative_state.genre = genre
         current_state.narrative_state.mood = mood
         current_state.narrative_state.inspiration_mode = inspiration_mode
         current_state.narrative_state.story_reference = story_reference
         
-        self._run_and_update(build_cinematic_narrative_graph, current_state.model_dump(), "Cinematic Narrative Workflow")
+        config = {"configurable": {SCENE_STREAM_CALLBACK_KEY: on_scene_update}} if on_scene_update else None
+        # Both graphs only read and write the narrative state, so that is all they get.
+        payload = {"narrative_state": current_state.narrative_state}
+        then = self._prefetch_scene_images
+        if enriched:
+            self._run_and_update(get_enriched_cinematic_narrative_graph, payload, "Enriched Cinematic Narrative Workflow", config=config, streaming=bool(on_scene_update), then=then)
+        else:
+            self._run_and_update(get_cinematic_narrative_graph, payload, "Cinematic Narrative Workflow", config=config, streaming=bool(on_scene_update), then=then)
+
+    @staticmethod
+    def _scene_images_key(narrative: NarrativeState, model: str, aspect_ratio: str) -> str:
+        return speculation_key("scene_images", narrative.model_dump_json(exclude={"before_scene_image", "after_scene_image"}), model, aspect_ratio)
+
+    def run_scene_image_workflow(self, model: str = "gpt-4o", aspect_ratio: str = "16:9"):
+        """
+        Generates the Before and After images for the current Stage 3 output in
+        parallel and stores them on the narrative state.
+        """
+        payload = {"narrative_state": self.state.narrative_state, "model": model, "aspect_ratio": aspect_ratio}
+        self._run_and_update(
+            get_scene_image_graph, payload, "Scene Image Generation",
+            speculation=self._scene_images_key(self.state.narrative_state, model, aspect_ratio),
+        )
 
     # --- NEW METHOD to reset the UI ---
     def reset_narrative_state(self):
@@ -55,19 +135,167 @@ class AppController:
         self._update_and_persist_state(current_state)
 
     # --- LEGACY METHODS (Unchanged) ---
-    def run_visual_workflow(self, image_bytes: bytes = None, video_brief: VideoCreativeBrief = None, feedback: str = None, refinement_target: str = None):
-        state_dict = self.state.model_dump()
-        if image_bytes: state_dict['original_image_bytes'] = image_bytes
-        if video_brief: state_dict.update({'video_creative_brief': video_brief.model_dump()})
+    def run_visual_workflow(self, image_bytes: bytes = None, video_brief: VideoCreativeBrief = None, feedback: str = None, refinement_target: str = None,
+                            mode: str = VISUAL_PIPELINE_MODE, inspect: bool = FAST_PIPELINE_INSPECT):
+        """
+        Runs Stages 1 & 2. `mode` picks the pipeline: "quality" (analyst, prompt
+        engineer and inspector) or "fast" (one vision call, inspected only if `inspect`).
+        With BACKGROUND_INSPECTION_ENABLED the new prompt is shown as soon as it
+        is written and the inspector runs in the background (see `poll_prompt_critique`).
+        """
+        background = BACKGROUND_INSPECTION_ENABLED
+        overrides = {"inspect_prompt": inspect, "background_inspection": background}
+        if image_bytes: overrides['original_image_ref'] = put_blob(image_bytes)
+        if video_brief: overrides['video_creative_brief'] = video_brief
         if feedback:
-            state_dict['user_feedback'] = feedback
-            state_dict['active_prompt_for_refinement'] = refinement_target
-        # This will call the old graph using a different graph builder
-        self._run_and_update(build_visual_workflow_graph, state_dict, "Visual Workflow")
+            overrides['user_feedback'] = feedback
+            overrides['active_prompt_for_refinement'] = refinement_target
+        # Only a brief passed in asks for a video prompt: the one an earlier
+        # Stage 2 run stored would send a new Stage 1 run to the video director.
+        keys = [key for key in VisualWorkflowState.__annotations__ if key != "video_creative_brief"]
+        payload = graph_input(self.state, keys, **overrides)
+        previous_prompt = self.state.image_prompt
+        wants_critique = mode != "fast" or inspect
+
+        def after_new_prompt(state: AppState) -> AppState:
+            if state.image_prompt is previous_prompt:
+                return state
+            if background:
+                # The old critique is for the old prompt.
+                state = state.model_copy(update={"prompt_critique": None, "pending_critique": None})
+                state = self._start_inspection(state) if wants_critique else state
+            self._prefetch_after_prompt(state)
+            return state
+
+        # A video prompt for a brief prefetched after Stage 1 is picked up here.
+        video_key = None
+        if video_brief and not feedback:
+            video_key = self._video_prompt_key(overrides.get('original_image_ref') or self.state.original_image_ref, video_brief)
+        self._run_and_update(
+            lambda: get_visual_workflow_graph_for_mode(mode), payload, "Visual Workflow",
+            then=after_new_prompt, speculation=video_key, inputs=overrides,
+        )
+
+    def _start_inspection(self, state: AppState) -> AppState:
+        if not (state.visual_analysis and state.image_prompt):
+            return state
+        return state.model_copy(update={"pending_critique": start_inspection(state.visual_analysis, state.image_prompt)})
+
+    def run_prompt_inspection(self):
+        """Critiques the current image prompt against its analysis (fast mode skips this by default)."""
+        if BACKGROUND_INSPECTION_ENABLED:
+            self._update_and_persist_state(self._start_inspection(self.state))
+            return
+        payload = graph_input(self.state, ("visual_analysis", "image_prompt"))
+        self._run_and_update(get_prompt_inspection_graph, payload, "Prompt Inspection")
+
+    def poll_prompt_critique(self) -> bool:
+        """
+        Attaches the background critique to the state once it is ready.
+        Returns whether it is still running.
+        """
+        key = self.state.pending_critique
+        if key is None:
+            return False
+        if is_inspection_running(key):
+            return True
+        critique = collect_inspection(key)
+        current = self.state.image_prompt
+        still_current = self.state.visual_analysis and current and inspection_key(self.state.visual_analysis, current) == key
+        updates = {"pending_critique": None}
+        if critique is not None and still_current:
+            updates["prompt_critique"] = critique
+        self._update_and_persist_state(self.state.model_copy(update=updates))
+        return False
+
+    def submit_image_generation(self, params: ImageGenerationParams):
+        """
+        Queues Stage 4 generation as a durable background batch (see `src.jobs`);
+        its images are collected by `poll_image_batches`. A matching image that
+        was already rendered speculatively goes straight to the gallery.
+        """
+        self.state.image_gen_params = params
+        updates = self._claim_speculation(speculation_key("images", params), wait=False)
+        if updates:
+            self._update_and_persist_state(apply_graph_updates(self.state, updates))
+            return
+        try:
+            batch_id = submit_image_generation(params)
+        except QueueFullError as e:
+            self.state.error_message = f"The image queue is full, please try again shortly. ({e})"
+            return
+        self.state.error_message = None
+        self.state.pending_image_batches = [*self.state.pending_image_batches, batch_id]
+        st.query_params[PENDING_BATCHES_PARAM] = self.state.pending_image_batches
+
+    # --- Speculative prefetch (opt-in, see src.core.speculation) ---
+    @property
+    def _session_id(self) -> str:
+        return st.session_state.setdefault("speculation_session", uuid.uuid4().hex)
+
+    @staticmethod
+    def _video_prompt_key(image_ref, brief: VideoCreativeBrief) -> str:
+        return speculation_key("video_prompt", image_ref, brief)
+
+    def _speculate(self, slot: str, key: str, graph_getter, payload, cost: int = 1) -> None:
+        if SPECULATION_ENABLED:
+            get_speculative_executor().speculate(self._session_id, slot, key, graph_getter, payload, cost)
+
+    def _claim_speculation(self, key: str, wait: bool = True):
+        if not SPECULATION_ENABLED:
+            return None
+        return get_speculative_executor().claim(self._session_id, key, wait=wait)
+
+    def _prefetch_after_prompt(self, state: AppState) -> None:
+        """
+        After Stage 1: a video prompt for the default brief and, if allowed, the
+        default Stage 4 image. That is a full render of exactly what "Generate
+        Image" would submit, so a hit replaces the queued batch (a cheaper
+        preview could not).
+        """
+        if state.original_image_ref:
+            self._speculate(
+                "video_prompt", self._video_prompt_key(state.original_image_ref, DEFAULT_VIDEO_BRIEF), get_visual_workflow_graph,
+                {"original_image_ref": state.original_image_ref, "video_creative_brief": DEFAULT_VIDEO_BRIEF},
+            )
+        params = default_generation_params(state) if SPECULATE_IMAGES else None
+        if params:
+            self._speculate("images", speculation_key("images", params), get_image_generation_graph, {"image_gen_params": params})
+
+    def _prefetch_scene_images(self, state: AppState) -> AppState:
+        """After Stage 3: the Before/After images with the Stage 3 defaults, if image speculation is allowed."""
+        narrative = state.narrative_state
+        if SPECULATE_IMAGES and narrative.cinematic_output:
+            model, aspect_ratio = "gpt-4o", "16:9"
+            payload = {"narrative_state": narrative, "model": model, "aspect_ratio": aspect_ratio}
+            self._speculate("scene_images", self._scene_images_key(narrative, model, aspect_ratio), get_scene_image_graph, payload, cost=2)
+        return state
+
+    def cancel_speculation(self) -> None:
+        if SPECULATION_ENABLED:
+            get_speculative_executor().cancel(self._session_id)
 
-    def run_image_generation_workflow(self):
-        """Runs the image generation workflow (Stage 4)."""
-        self._run_and_update(build_image_generation_graph, self.state, "Image Generation")
+    def poll_image_batches(self) -> Dict[str, BatchStatus]:
+        """
+        Reads the pending batches, moves the images of finished ones into the
+        state and returns the batches still running.
+        """
+        batch_ids = self.state.pending_image_batches
+        batches = get_image_batches(batch_ids)
+        finished = [batches[batch_id] for batch_id in batch_ids if batch_id in batches and batches[batch_id].finished]
+        running = {batch_id: batches[batch_id] for batch_id in batch_ids if batch_id in batches and not batches[batch_id].finished}
+        if len(running) == len(batch_ids):
+            return running
+        # Unknown ids (purged, or from another queue file) are dropped as well.
+        updates = [{"generated_images": batch_images(batch)} for batch in finished]
+        errors = [message for message in map(batch_error_message, finished) if message]
+        updates.append({"pending_image_batches": list(running), "error_message": " | ".join(errors) or None})
+        self._update_and_persist_state(apply_graph_updates(self.state, updates))
+        if running:
+            st.query_params[PENDING_BATCHES_PARAM] = list(running)
+        else:
+            st.query_params.pop(PENDING_BATCHES_PARAM, None)
+        return running
 
 
 def main():
@@ -77,9 +305,13 @@ def main():
     with st.sidebar:
         st.header("Dev: App State")
         if st.button("Clear All State"):
+            controller.cancel_speculation()
             st.session_state.clear()
+            st.query_params.clear()
             st.rerun()
-        st.json(controller.state.model_dump(), expanded=False)
+        st.caption(f"Gallery: {get_gallery_store().count(controller.state.gallery_id)} images (browse them in Stage 4).")
+        show_state_inspector(controller.state)
+        show_latency_panel()
     
     st.title("🎬 ImageCodeX")
     st.markdown("#### An AI-powered partner for turning static images into cinematic stories.")
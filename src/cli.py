@@ -0,0 +1,289 @@
+# src/cli.py
+"""
+Headless batch runner for the visual prompting workflow (Stages 1 & 2).
+
+Walks a directory of images (or a manifest that lists them) and pushes each one
+through the visual workflow graph: visual analysis, prompt engineering and
+inspection. Images are processed concurrently on the shared I/O loop, up to
+`--concurrency` at a time.
+
+Every finished image is appended to the output JSONL file straight away. When
+a run is interrupted, running the same command again skips the images that
+are already recorded as "ok" and retries the rest. Throughput and latency
+statistics are printed at the end.
+
+Usage:
+    poetry run imagecodex-batch ./catalog -o results.jsonl
+    poetry run python -m src.cli manifest.txt -o results.jsonl --concurrency 16
+
+A manifest is either a text file with one image path per line, or a JSONL file
+of {"path": ..., "id": ...} objects ("id" is optional). Relative paths are
+resolved against the manifest's directory.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from dotenv import load_dotenv
+
+# --- Load environment variables FIRST (as run_app.py does) ---
+# src.core.config reads its settings when it is imported.
+load_dotenv()
+
+from pydantic import BaseModel, ConfigDict  # noqa: E402
+
+from src.core import config  # noqa: E402
+from src.core.async_runtime import run_sync  # noqa: E402
+from src.core.blobs import put_blob  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+# Workflow outputs copied into each result record.
+RESULT_KEYS = ("visual_analysis", "image_prompt", "prompt_critique")
+
+
+class BatchItem(BaseModel):
+    """One image to process; `id` is the key used for checkpoint/resume."""
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    path: Path
+
+
+# ==============================================================================
+# == INPUT DISCOVERY
+# ==============================================================================
+def _scan_directory(root: Path, recursive: bool) -> List[BatchItem]:
+    pattern = "**/*" if recursive else "*"
+    paths = sorted(p for p in root.glob(pattern) if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+    return [BatchItem(id=p.relative_to(root).as_posix(), path=p) for p in paths]
+
+
+def _read_manifest(manifest: Path) -> List[BatchItem]:
+    items = []
+    for line_no, line in enumerate(manifest.read_text(encoding="utf-8").splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            entry = json.loads(line)
+            if "path" not in entry:
+                raise ValueError(f"{manifest}:{line_no}: manifest entries need a 'path'.")
+            raw_path, item_id = entry["path"], entry.get("id")
+        else:
+            raw_path, item_id = line, None
+        path = Path(raw_path).expanduser()
+        if not path.is_absolute():
+            path = manifest.parent / path
+        items.append(BatchItem(id=str(item_id or raw_path), path=path))
+    return items
+
+
+def discover_items(source: Path, recursive: bool = True) -> List[BatchItem]:
+    """Lists the images under a directory, or the entries of a manifest file."""
+    if source.is_dir():
+        return _scan_directory(source, recursive)
+    if source.is_file():
+        return _read_manifest(source)
+    raise FileNotFoundError(f"No such directory or manifest: {source}")
+
+
+# ==============================================================================
+# == CHECKPOINTED RESULT LOG
+# ==============================================================================
+class ResultLog:
+    """
+    Append-only JSONL results file. Each record is flushed as soon as it is
+    written, so after a crash the file holds every image that finished.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed: Set[str] = set()
+        last_line = b""
+        if path.exists():
+            with path.open("rb") as f:
+                for line in f:
+                    last_line = line
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash; that image is redone
+                    if record.get("status") == "ok":
+                        self.completed.add(record["id"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8")
+        if last_line and not last_line.endswith(b"\n"):
+            self._file.write("\n")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if record.get("status") == "ok":
+            self.completed.add(record["id"])
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# ==============================================================================
+# == PROCESSING
+# ==============================================================================
+def _dump(value: Any) -> Any:
+    return value.model_dump() if isinstance(value, BaseModel) else value
+
+
+def _load_image(path: Path):
+    return put_blob(path.read_bytes())
+
+
+async def _process_item(item: BatchItem, graph, semaphore: asyncio.Semaphore, inspect: bool = True) -> Dict[str, Any]:
+    async with semaphore:
+        record: Dict[str, Any] = {"id": item.id, "path": str(item.path)}
+        start = time.perf_counter()
+        try:
+            image_ref = await asyncio.to_thread(_load_image, item.path)
+            if image_ref is None:
+                raise ValueError("the file is empty")
+            final_state = await graph.ainvoke({"original_image_ref": image_ref, "inspect_prompt": inspect})
+            record["sha256"] = image_ref.digest
+            record.update({key: _dump(final_state.get(key)) for key in RESULT_KEYS})
+            expected = RESULT_KEYS if inspect else RESULT_KEYS[:-1]
+            missing = [key for key in expected if final_state.get(key) is None]
+            error = final_state.get("error_message") or (f"workflow produced no {', '.join(missing)}" if missing else None)
+            record["status"] = "error" if error else "ok"
+            if error:
+                record["error"] = error
+        except Exception as e:
+            logger.error(f"Batch item '{item.id}' failed: {e}", exc_info=e)
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        record["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return record
+
+
+async def run_batch(
+    items: Iterable[BatchItem], results: ResultLog, concurrency: int, progress=None,
+    mode: str = "quality", inspect: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Runs every item through the visual workflow with at most `concurrency` in
+    flight, writing each record to `results` as it completes. Returns the records.
+    In "fast" mode the prompt is only inspected when `inspect` is set.
+    """
+    from src.graph import get_visual_workflow_graph_for_mode
+
+    graph = get_visual_workflow_graph_for_mode(mode)
+    inspect = inspect or mode != "fast"
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [asyncio.ensure_future(_process_item(item, graph, semaphore, inspect)) for item in items]
+    records = []
+    for finished in asyncio.as_completed(tasks):
+        record = await finished
+        results.write(record)
+        records.append(record)
+        if progress:
+            progress(record, len(records), len(tasks))
+    return records
+
+
+# ==============================================================================
+# == REPORTING
+# ==============================================================================
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(records: List[Dict[str, Any]], skipped: int, wall_seconds: float) -> str:
+    ok = sum(1 for r in records if r["status"] == "ok")
+    failed = len(records) - ok
+    lines = [
+        f"Processed {len(records)} images in {wall_seconds:.1f} s "
+        f"({ok} ok, {failed} failed, {skipped} skipped from an earlier run)",
+    ]
+    if records and wall_seconds > 0:
+        lines.append(f"Throughput: {len(records) / wall_seconds * 60:.1f} images/min")
+    latencies = sorted(r["latency_ms"] / 1000 for r in records if r["status"] == "ok")
+    if latencies:
+        lines.append(
+            f"Latency (ok): mean {statistics.mean(latencies):.2f} s, p50 {_percentile(latencies, 50):.2f} s, "
+            f"p95 {_percentile(latencies, 95):.2f} s, max {latencies[-1]:.2f} s"
+        )
+    return "\n".join(lines)
+
+
+def _print_progress(record: Dict[str, Any], done: int, total: int) -> None:
+    detail = f"  {record['error']}" if record["status"] != "ok" else ""
+    print(f"[{done}/{total}] {record['status']:<5} {record['latency_ms'] / 1000:6.2f} s  {record['id']}{detail}", file=sys.stderr)
+
+
+# ==============================================================================
+# == ENTRY POINT
+# ==============================================================================
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="imagecodex-batch",
+        description="Run Stage 1-2 visual analysis, prompt engineering and inspection over a folder of images.",
+    )
+    parser.add_argument("source", type=Path, help="A directory of images, or a manifest file (.txt or .jsonl).")
+    parser.add_argument("-o", "--output", type=Path, default=Path("visual_prompts.jsonl"), help="JSONL results file; also the resume checkpoint.")
+    parser.add_argument("-c", "--concurrency", type=int, default=config.BATCH_CONCURRENCY, help="Images in flight at once.")
+    parser.add_argument("--mode", choices=("quality", "fast"), default=config.VISUAL_PIPELINE_MODE,
+                        help="quality: analysis, prompt and inspection as three calls; fast: analysis and prompt in one call.")
+    parser.add_argument("--inspect", action="store_true", default=config.FAST_PIPELINE_INSPECT,
+                        help="In fast mode, also run the inspector.")
+    parser.add_argument("--limit", type=int, help="Process at most this many pending images.")
+    parser.add_argument("--no-recursive", action="store_true", help="Only scan the top level of a source directory.")
+    parser.add_argument("--no-resume", action="store_true", help="Reprocess images already recorded as ok.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the agents' own log output.")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    items = discover_items(args.source, recursive=not args.no_recursive)
+    results = ResultLog(args.output)
+    done = set() if args.no_resume else results.completed
+    pending = [item for item in items if item.id not in done]
+    skipped = len(items) - len(pending)
+    if args.limit is not None:
+        pending = pending[:args.limit]
+    print(f"{len(items)} images found, {skipped} already done, {len(pending)} to process "
+          f"({args.mode} mode, concurrency {args.concurrency}) -> {args.output}", file=sys.stderr)
+
+    start = time.perf_counter()
+    # Agents print a progress line per node; for thousands of images that is
+    # noise, so unless --verbose it is discarded and only the per-image status
+    # lines (on stderr) remain.
+    try:
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+            records = run_sync(run_batch(
+                pending, results, args.concurrency, progress=_print_progress, mode=args.mode, inspect=args.inspect,
+            ))
+    except KeyboardInterrupt:
+        print(f"Interrupted; finished images are saved in {args.output}. Re-run to resume.", file=sys.stderr)
+        return 130
+    finally:
+        results.close()
+
+    print(summarize(records, skipped, time.perf_counter() - start), file=sys.stderr)
+    return 1 if any(r["status"] != "ok" for r in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
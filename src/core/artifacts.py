@@ -0,0 +1,252 @@
+# src/core/artifacts.py
+"""
+Local store for generated images.
+
+Provider URLs expire, and fetching them again on every Streamlit rerun was the
+most expensive part of showing the gallery. Each generated image is instead
+downloaded once, right after generation, through a pooled HTTP session. It is
+stored by its SHA-256 under `config.ARTIFACT_DIR` next to a small thumbnail,
+and `GeneratedImage.artifact` carries an `ImageArtifact` handle to it.
+
+A SQLite index (shared by every process using the directory) records the
+bytes each artifact occupies and when it was last read. Once the total
+exceeds `config.ARTIFACT_MAX_BYTES`, the least recently used artifacts are
+deleted. Callers fall back to the provider URL when an artifact is gone.
+"""
+import io
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+from pydantic import BaseModel, ConfigDict
+
+from src.core import config
+from src.core.cache import content_hash
+from src.core.tracing import span
+
+if TYPE_CHECKING:
+    import requests
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp", "image/gif": ".gif"}
+# Reads refresh an artifact's LRU position at most this often, so a rerun that
+# shows the whole gallery does not write to the index for every image.
+_TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class ImageArtifact(BaseModel):
+    """A handle to a stored image and its thumbnail."""
+    model_config = ConfigDict(frozen=True)
+
+    digest: str
+    size: int
+    mime_type: str
+    width: int
+    height: int
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS.get(self.mime_type, ".img")
+
+
+@lru_cache(maxsize=None)
+def get_download_session() -> "requests.Session":
+    """One keep-alive session, with retries on transient errors, shared by every download."""
+    # Imported here: `GeneratedImage` imports this module, and the app should not pay for requests at startup.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.ARTIFACT_DOWNLOAD_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _make_thumbnail(img: "Image.Image", max_edge: int) -> Tuple[bytes, str]:
+    from PIL import Image, ImageOps
+
+    thumb = ImageOps.exif_transpose(img)
+    thumb.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    if thumb.mode in ("RGBA", "LA", "PA") or (thumb.mode == "P" and "transparency" in thumb.info):
+        thumb.convert("RGBA").save(buffer, format="WEBP", quality=80)
+        return buffer.getvalue(), ".webp"
+    thumb.convert("RGB").save(buffer, format="JPEG", quality=80, optimize=True)
+    return buffer.getvalue(), ".jpg"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temp file first so readers never see a partial image.
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ArtifactStore:
+    """Images and thumbnails under `root`, evicted least-recently-used beyond `max_bytes`."""
+
+    def __init__(self, root: Union[str, Path], max_bytes: int, thumbnail_edge: int = 384):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.thumbnail_edge = thumbnail_edge
+        self.evictions = 0
+        self._touched: dict = {}
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " digest TEXT PRIMARY KEY, extension TEXT NOT NULL, thumbnail_extension TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_accessed ON artifacts (accessed_at)")
+
+    def _image_path(self, digest: str, extension: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{extension}"
+
+    def _thumbnail_path(self, digest: str, extension: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.thumb{extension}"
+
+    def put(self, data: bytes) -> ImageArtifact:
+        """Stores image bytes (a no-op if already stored) and returns the handle. Raises ValueError if unreadable."""
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                mime_type = Image.MIME.get(img.format) or "application/octet-stream"
+                width, height = img.size
+                thumbnail, thumbnail_extension = _make_thumbnail(img, self.thumbnail_edge)
+        except (UnidentifiedImageError, OSError) as e:
+            raise ValueError(f"Not a readable image: {e}") from e
+        artifact = ImageArtifact(digest=content_hash(data), size=len(data), mime_type=mime_type, width=width, height=height)
+
+        image_path = self._image_path(artifact.digest, artifact.extension)
+        if not image_path.exists():
+            _write_atomic(image_path, data)
+        thumbnail_path = self._thumbnail_path(artifact.digest, thumbnail_extension)
+        if not thumbnail_path.exists():
+            _write_atomic(thumbnail_path, thumbnail)
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (digest, extension, thumbnail_extension, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, COALESCE((SELECT created_at FROM artifacts WHERE digest = ?), ?), ?)",
+                (artifact.digest, artifact.extension, thumbnail_extension, len(data) + len(thumbnail), artifact.digest, now, now),
+            )
+            self._evict_locked(keep=artifact.digest)
+        return artifact
+
+    def download(self, url: str) -> ImageArtifact:
+        """Fetches `url` with the shared session and stores it. Raises on HTTP or image errors."""
+        started = time.monotonic()
+        with span("artifact.download") as attributes:
+            response = get_download_session().get(url, timeout=config.ARTIFACT_DOWNLOAD_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            attributes["response_bytes"] = len(response.content)
+        artifact = self.put(response.content)
+        logger.info(f"Stored image {artifact.digest[:12]} ({artifact.size} bytes) in {time.monotonic() - started:.2f}s.")
+        return artifact
+
+    def _evict_locked(self, keep: Optional[str] = None) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT digest, extension, thumbnail_extension, size FROM artifacts WHERE digest != ? ORDER BY accessed_at ASC LIMIT 1",
+                (keep or "",),
+            ).fetchone()
+            if oldest is None:
+                break
+            digest, extension, thumbnail_extension, size = oldest
+            self._conn.execute("DELETE FROM artifacts WHERE digest = ?", (digest,))
+            for path in (self._image_path(digest, extension), self._thumbnail_path(digest, thumbnail_extension)):
+                path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def _lookup(self, artifact: ImageArtifact) -> Optional[Tuple[Path, Path]]:
+        """(image path, thumbnail path) if the artifact is still stored, refreshing its LRU position."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extension, thumbnail_extension FROM artifacts WHERE digest = ?", (artifact.digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - self._touched.get(artifact.digest, 0.0) > _TOUCH_INTERVAL_SECONDS:
+                with self._conn:
+                    self._conn.execute("UPDATE artifacts SET accessed_at = ? WHERE digest = ?", (now, artifact.digest))
+                self._touched[artifact.digest] = now
+        image_path, thumbnail_path = self._image_path(artifact.digest, row[0]), self._thumbnail_path(artifact.digest, row[1])
+        return (image_path, thumbnail_path) if image_path.exists() else None
+
+    def image_path(self, artifact: ImageArtifact) -> Optional[Path]:
+        paths = self._lookup(artifact)
+        return paths[0] if paths else None
+
+    def thumbnail_path(self, artifact: ImageArtifact) -> Optional[Path]:
+        paths = self._lookup(artifact)
+        return paths[1] if paths and paths[1].exists() else None
+
+    def read(self, artifact: ImageArtifact) -> Optional[bytes]:
+        path = self.image_path(artifact)
+        try:
+            return path.read_bytes() if path else None
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {"artifacts": count, "bytes": total, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+_artifact_store: Optional[ArtifactStore] = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Returns the process-wide artifact store, creating its directory on first use."""
+    global _artifact_store
+    if _artifact_store is None:
+        with _artifact_store_lock:
+            if _artifact_store is None:
+                _artifact_store = ArtifactStore(config.ARTIFACT_DIR, config.ARTIFACT_MAX_BYTES, config.ARTIFACT_THUMBNAIL_EDGE)
+    return _artifact_store
+
+
+def archive_image_url(url: str) -> Optional[ImageArtifact]:
+    """
+    Downloads a freshly generated image into the store. Returns None (and logs)
+    on failure: the image is still usable through its URL while that lasts.
+    """
+    try:
+        return get_artifact_store().download(url)
+    except Exception as e:
+        logger.warning(f"Could not store generated image from {url[:80]}: {e}")
+        return None
+
+
+def display_source(artifact: Optional[ImageArtifact], url: str, thumbnail: bool = True) -> str:
+    """What to hand `st.image`: the stored thumbnail (or full image), else the provider URL."""
+    if artifact is not None:
+        store = get_artifact_store()
+        path = store.thumbnail_path(artifact) if thumbnail else store.image_path(artifact)
+        if path is not None:
+            return str(path)
+    return url
@@ -0,0 +1,42 @@
+# src/core/async_runtime.py
+"""
+A process-wide asyncio event loop for network I/O.
+
+Streamlit runs every session's script in its own thread. Rather than each of
+those threads driving its own requests one by one, coroutines are submitted to
+a single background loop, where the awaits of all sessions are multiplexed.
+Sharing one loop also keeps the async HTTP pool's connections on a single loop.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_io_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared I/O loop, starting its daemon thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="imagecodex-io-loop", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Runs `coro` on the shared I/O loop and blocks the calling (non-loop) thread for its result."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_io_loop())
+    return future.result(timeout)
+
+
+async def run_on_io_loop(coro: Awaitable[Any]) -> Any:
+    """Awaits `coro` on the shared I/O loop from code running on a different event loop."""
+    loop = get_io_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
@@ -0,0 +1,83 @@
+# src/core/background_inspection.py
+"""
+Prompt inspection off the critical path.
+
+The inspector used to sit between the prompt engineer (or the refiner) and the
+end of the visual workflow, so the user waited a whole LLM round trip for the
+critique before seeing the prompt. The UI now runs the workflow with
+`background_inspection` set: the graph stops once the prompt is written, and
+the critique is computed here, on the shared I/O loop, while the prompt is
+already on screen.
+
+Inspections are keyed by the analysis and the prompt they critique. Asking
+twice for the same pair shares one task, and a result is only attached to a
+state whose prompt still matches its key.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Dict, Optional
+
+from src.core.async_runtime import get_io_loop
+from src.core.response_cache import critique_cache_key
+from src.core.schemas import ImagePrompt, PromptCritique, VisualAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Finished inspections are kept (other sessions may share them) up to this many.
+MAX_TRACKED_INSPECTIONS = 256
+
+_tasks: Dict[str, concurrent.futures.Future] = {}
+_tasks_lock = threading.Lock()
+
+
+def inspection_key(analysis: VisualAnalysis, prompt: ImagePrompt) -> str:
+    """Identifies the (analysis, prompt) pair a critique belongs to; prompts that only differ in case or spacing share it."""
+    return critique_cache_key(analysis, prompt)
+
+
+async def _inspect(analysis: VisualAnalysis, prompt: ImagePrompt) -> Optional[PromptCritique]:
+    from src.graph import get_prompt_inspection_graph
+
+    final_state = await get_prompt_inspection_graph().ainvoke({"visual_analysis": analysis, "image_prompt": prompt})
+    return final_state.get("prompt_critique")
+
+
+def _failed(task: concurrent.futures.Future) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+def start_inspection(analysis: VisualAnalysis, prompt: ImagePrompt) -> str:
+    """Starts (or joins) the background inspection of `prompt`; returns its key."""
+    key = inspection_key(analysis, prompt)
+    with _tasks_lock:
+        task = _tasks.get(key)
+        if task is None or _failed(task):
+            if len(_tasks) >= MAX_TRACKED_INSPECTIONS:
+                for stale in [k for k, other in _tasks.items() if other.done()]:
+                    del _tasks[stale]
+            _tasks[key] = asyncio.run_coroutine_threadsafe(_inspect(analysis, prompt), get_io_loop())
+    return key
+
+
+def is_running(key: str) -> bool:
+    with _tasks_lock:
+        task = _tasks.get(key)
+    return task is not None and not task.done()
+
+
+def collect_inspection(key: str) -> Optional[PromptCritique]:
+    """
+    The critique for `key` once its task has finished, else None. A failed or
+    unknown task (e.g. after a restart) also gives None; `start_inspection`
+    retries a failed one.
+    """
+    with _tasks_lock:
+        task = _tasks.get(key)
+    if task is None or not task.done():
+        return None
+    if _failed(task):
+        logger.warning(f"Background prompt inspection failed: {task.exception() if not task.cancelled() else 'cancelled'}")
+        return None
+    return task.result()
@@ -0,0 +1,170 @@
+# src/core/blobs.py
+"""
+Content-addressed storage for image bytes.
+
+Streamlit reruns validate and dump `AppState` on every interaction, and graph
+payloads are built from it. Keeping raw uploads in the state meant every rerun
+copied them several times. Instead, bytes are stored once here, keyed by their
+SHA-256, and the state carries a `BlobRef` of a few dozen bytes.
+
+Blobs are written through to a temp directory, so any session (or worker
+thread) can resolve a handle, and the most recently used ones are also kept
+in memory within a byte budget. Files not written or read for
+`BLOB_TTL_SECONDS` are pruned when the store opens.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel, ConfigDict
+
+from src.core import config
+from src.core.cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+# How often a blob's file mtime is refreshed while it is being used.
+TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class BlobRef(BaseModel):
+    """A lightweight handle to bytes held in the `BlobStore`."""
+    model_config = ConfigDict(frozen=True)
+
+    digest: str
+    size: int
+
+
+class BlobStore:
+    """Write-through blob store: files under `root`, plus an in-memory LRU bounded by `max_memory_bytes`."""
+
+    def __init__(self, root: Union[str, Path], max_memory_bytes: int, ttl_seconds: Optional[float] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        if ttl_seconds:
+            self.prune(ttl_seconds)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _touch(self, digest: str) -> None:
+        # `prune` goes by mtime, so a blob still in use must look recent. Refreshed
+        # at most once per TOUCH_INTERVAL_SECONDS per blob to keep reads cheap.
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(digest, 0.0) < TOUCH_INTERVAL_SECONDS:
+                return
+            self._touched[digest] = now
+        try:
+            os.utime(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, digest: str, data: bytes) -> None:
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return
+            self._memory[digest] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def put(self, data: bytes) -> BlobRef:
+        """Stores `data` (a no-op if it is already stored) and returns its handle."""
+        digest = content_hash(data)
+        path = self._path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so readers never see a partial blob.
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        else:
+            self._touch(digest)
+        self._remember(digest, data)
+        return BlobRef(digest=digest, size=len(data))
+
+    def get(self, ref: Union[BlobRef, str]) -> Optional[bytes]:
+        """Returns the bytes for `ref` (a handle or a digest), or None if they are gone."""
+        digest = ref.digest if isinstance(ref, BlobRef) else ref
+        with self._lock:
+            data = self._memory.get(digest)
+            if data is not None:
+                self._memory.move_to_end(digest)
+        if data is not None:
+            self._touch(digest)
+            return data
+        try:
+            data = self._path(digest).read_bytes()
+        except FileNotFoundError:
+            logger.warning(f"Blob {digest[:12]} is no longer available.")
+            return None
+        self._touch(digest)
+        self._remember(digest, data)
+        return data
+
+    def __contains__(self, ref: Union[BlobRef, str]) -> bool:
+        digest = ref.digest if isinstance(ref, BlobRef) else ref
+        with self._lock:
+            if digest in self._memory:
+                return True
+        return self._path(digest).exists()
+
+    def prune(self, ttl_seconds: float) -> int:
+        """Deletes blob files not written or read within `ttl_seconds`; returns how many were removed."""
+        cutoff = time.time() - ttl_seconds
+        removed = 0
+        for path in self.root.glob("*/*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Returns the process-wide blob store, creating its directory on first use."""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(config.BLOB_DIR, config.BLOB_MEMORY_MAX_BYTES, config.BLOB_TTL_SECONDS)
+    return _blob_store
+
+
+def put_blob(data: Optional[bytes]) -> Optional[BlobRef]:
+    """Stores `data` and returns its handle (None in, None out)."""
+    return get_blob_store().put(data) if data else None
+
+
+def resolve_blob(ref: Any) -> Optional[bytes]:
+    """
+    Returns the bytes behind a handle. Accepts a `BlobRef`, its dumped dict form
+    (graphs with dict state see the dumped form), or None.
+    """
+    if not ref:
+        return None
+    if isinstance(ref, dict):
+        ref = BlobRef.model_validate(ref)
+    return get_blob_store().get(ref)
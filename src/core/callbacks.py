@@ -0,0 +1,13 @@
+# src/core/callbacks.py
+"""
+Keys under `config["configurable"]` that carry per-run UI callbacks.
+
+They live here rather than in the agent modules so the controller can set them
+without importing the agents (and the LLM SDKs behind them) at startup.
+"""
+
+# An optional `SceneStreamCallback` for the cinematic storyteller.
+SCENE_STREAM_CALLBACK_KEY = "scene_stream_callback"
+
+# An optional `ImageReadyCallback` for the image generator.
+IMAGE_READY_CALLBACK_KEY = "image_ready_callback"
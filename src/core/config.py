@@ -0,0 +1,211 @@
+# src/core/config.py
+"""
+Runtime settings for ImageCodeX, read from environment variables.
+
+`run_app.py` loads the `.env` file before anything in `src` is imported, so
+every value below can be overridden there.
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_path(name: str, default: Optional[Path]) -> Optional[Path]:
+    """The path in `name` (or `default`), with "~" expanded as in the README's examples."""
+    value = os.getenv(name)
+    path = Path(value) if value not in (None, "") else default
+    return path.expanduser() if path is not None else None
+
+
+# ==============================================================================
+# == LLM HTTP CONNECTION POOL
+# ==============================================================================
+# One keep-alive pool is shared by every agent; these bound its size and timeouts.
+LLM_MAX_CONNECTIONS = _env_int("IMAGECODEX_LLM_MAX_CONNECTIONS", 20)
+LLM_MAX_KEEPALIVE_CONNECTIONS = _env_int("IMAGECODEX_LLM_MAX_KEEPALIVE_CONNECTIONS", 10)
+LLM_KEEPALIVE_EXPIRY_SECONDS = _env_float("IMAGECODEX_LLM_KEEPALIVE_EXPIRY_SECONDS", 60.0)
+LLM_CONNECT_TIMEOUT_SECONDS = _env_float("IMAGECODEX_LLM_CONNECT_TIMEOUT_SECONDS", 10.0)
+LLM_REQUEST_TIMEOUT_SECONDS = _env_float("IMAGECODEX_LLM_REQUEST_TIMEOUT_SECONDS", 120.0)
+LLM_MAX_RETRIES = _env_int("IMAGECODEX_LLM_MAX_RETRIES", 2)
+
+# ==============================================================================
+# == ASYNC EXECUTION
+# ==============================================================================
+# When enabled, the Streamlit controller runs graphs through `graph.ainvoke` on a
+# single shared I/O event loop instead of blocking on each network call in turn.
+ASYNC_EXECUTION_ENABLED = _env_bool("IMAGECODEX_ASYNC_EXECUTION", True)
+
+# ==============================================================================
+# == VISUAL PROMPTING PIPELINE (STAGES 1 & 2)
+# ==============================================================================
+# "quality" runs the visual analyst, the prompt engineer and the inspector as
+# three calls; "fast" asks one vision call for both the analysis and the prompt,
+# and runs the inspector only when FAST_PIPELINE_INSPECT is set (or the UI/API
+# asks for it).
+VISUAL_PIPELINE_MODE = os.getenv("IMAGECODEX_VISUAL_PIPELINE_MODE", "quality").strip().lower()
+FAST_PIPELINE_INSPECT = _env_bool("IMAGECODEX_FAST_PIPELINE_INSPECT", False)
+# The Streamlit app shows a new prompt at once and inspects it in the background.
+BACKGROUND_INSPECTION_ENABLED = _env_bool("IMAGECODEX_BACKGROUND_INSPECTION", True)
+CRITIQUE_POLL_SECONDS = _env_float("IMAGECODEX_CRITIQUE_POLL_SECONDS", 0.5)
+
+# ==============================================================================
+# == SPECULATIVE PREFETCH (src/core/speculation.py)
+# ==============================================================================
+# Opt-in: likely follow-up runs (a default-brief video prompt after Stage 1) start
+# while the user reads a result. SPECULATE_IMAGES also pre-renders the default
+# Stage 4 image and the Stage 3 scene images. These are full-price renders, not
+# previews: a hit is the user's actual result, so it costs nothing extra, while
+# a miss (e.g. the prompt was edited first) costs one unused image each.
+# Each session may spend SPECULATION_SESSION_BUDGET units (one per LLM run or
+# image) per SPECULATION_BUDGET_WINDOW_SECONDS.
+SPECULATION_ENABLED = _env_bool("IMAGECODEX_SPECULATION", False)
+SPECULATE_IMAGES = _env_bool("IMAGECODEX_SPECULATE_IMAGES", False)
+SPECULATION_SESSION_BUDGET = _env_int("IMAGECODEX_SPECULATION_SESSION_BUDGET", 10)
+SPECULATION_BUDGET_WINDOW_SECONDS = _env_float("IMAGECODEX_SPECULATION_BUDGET_WINDOW_SECONDS", 3600.0)
+SPECULATION_MAX_IN_FLIGHT = _env_int("IMAGECODEX_SPECULATION_MAX_IN_FLIGHT", 4)
+SPECULATION_TTL_SECONDS = _env_float("IMAGECODEX_SPECULATION_TTL_SECONDS", 600.0)
+
+# ==============================================================================
+# == HEADLESS BATCH RUNS (src/cli.py)
+# ==============================================================================
+# Images pushed through the Stage 1-2 workflow at once by `imagecodex-batch`.
+BATCH_CONCURRENCY = _env_int("IMAGECODEX_BATCH_CONCURRENCY", 8)
+
+# ==============================================================================
+# == HTTP API (src/api)
+# ==============================================================================
+# Workflow requests beyond API_MAX_CONCURRENT_REQUESTS wait up to
+# API_QUEUE_TIMEOUT_SECONDS for a slot and are then rejected with 429. Image
+# generation runs on the durable job queue (see JOB_* below).
+API_HOST = os.getenv("IMAGECODEX_API_HOST", "127.0.0.1")
+API_PORT = _env_int("IMAGECODEX_API_PORT", 8000)
+API_MAX_CONCURRENT_REQUESTS = _env_int("IMAGECODEX_API_MAX_CONCURRENT_REQUESTS", 16)
+API_QUEUE_TIMEOUT_SECONDS = _env_float("IMAGECODEX_API_QUEUE_TIMEOUT_SECONDS", 30.0)
+API_MAX_IMAGE_BYTES = _env_int("IMAGECODEX_API_MAX_IMAGE_BYTES", 20 * 1024 * 1024)
+
+# ==============================================================================
+# == IMAGE GENERATION (STAGE 4)
+# ==============================================================================
+# Batch requests (several candidates and/or models) run on a bounded worker pool.
+# Each backend additionally caps its in-flight requests and, when the RPM value
+# is > 0, spaces request starts so that at most that many begin per minute.
+IMAGE_GEN_MAX_WORKERS = _env_int("IMAGECODEX_IMAGE_GEN_MAX_WORKERS", 8)
+IMAGE_GEN_MAX_CANDIDATES = _env_int("IMAGECODEX_IMAGE_GEN_MAX_CANDIDATES", 4)
+IMAGE_GEN_OPENAI_CONCURRENCY = _env_int("IMAGECODEX_IMAGE_GEN_OPENAI_CONCURRENCY", 4)
+IMAGE_GEN_OPENAI_RPM = _env_int("IMAGECODEX_IMAGE_GEN_OPENAI_RPM", 0)
+IMAGE_GEN_REPLICATE_CONCURRENCY = _env_int("IMAGECODEX_IMAGE_GEN_REPLICATE_CONCURRENCY", 4)
+IMAGE_GEN_REPLICATE_RPM = _env_int("IMAGECODEX_IMAGE_GEN_REPLICATE_RPM", 0)
+
+# ==============================================================================
+# == VISION IMAGE PREPROCESSING
+# ==============================================================================
+# Uploads are downscaled so their longest edge fits VISION_MAX_EDGE and re-encoded
+# (JPEG for opaque images, WEBP when there is transparency) before vision calls.
+VISION_MAX_EDGE = _env_int("IMAGECODEX_VISION_MAX_EDGE", 1536)
+VISION_JPEG_QUALITY = _env_int("IMAGECODEX_VISION_JPEG_QUALITY", 85)
+VISION_CACHE_ENTRIES = _env_int("IMAGECODEX_VISION_CACHE_ENTRIES", 32)
+
+# ==============================================================================
+# == IMAGE BLOB STORE
+# ==============================================================================
+# Uploaded images are stored once by content hash; AppState only holds handles.
+# Blobs are written to BLOB_DIR and the most recently used ones are also kept in
+# memory, up to BLOB_MEMORY_MAX_BYTES. Files untouched for BLOB_TTL_SECONDS are
+# pruned when the store is first opened.
+BLOB_DIR = _env_path("IMAGECODEX_BLOB_DIR", Path(tempfile.gettempdir()) / "imagecodex-blobs")
+BLOB_MEMORY_MAX_BYTES = _env_int("IMAGECODEX_BLOB_MEMORY_MAX_BYTES", 256 * 1024 * 1024)
+BLOB_TTL_SECONDS = _env_float("IMAGECODEX_BLOB_TTL_SECONDS", 24 * 3600)
+
+# ==============================================================================
+# == PERSISTENT RESPONSE CACHES
+# ==============================================================================
+CACHE_DIR = _env_path("IMAGECODEX_CACHE_DIR", Path.home() / ".cache" / "imagecodex")
+
+# Vision analyses keyed by image content hash + model + prompt version.
+VISUAL_ANALYSIS_CACHE_ENABLED = _env_bool("IMAGECODEX_VISUAL_ANALYSIS_CACHE", True)
+VISUAL_ANALYSIS_CACHE_MAX_ENTRIES = _env_int("IMAGECODEX_VISUAL_ANALYSIS_CACHE_MAX_ENTRIES", 2000)
+VISUAL_ANALYSIS_CACHE_MAX_BYTES = _env_int("IMAGECODEX_VISUAL_ANALYSIS_CACHE_MAX_BYTES", 20 * 1024 * 1024)
+VISUAL_ANALYSIS_CACHE_TTL_SECONDS = _env_float("IMAGECODEX_VISUAL_ANALYSIS_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+
+# Critiques by analysis + normalised prompt (in memory), so unchanged prompts are not re-inspected.
+CRITIQUE_CACHE_ENTRIES = _env_int("IMAGECODEX_CRITIQUE_CACHE_ENTRIES", 512)
+
+# Story-reference lookups: raw Tavily results and the motifs/inspiration parsed from them.
+REFERENCE_CACHE_MEMORY_ENTRIES = _env_int("IMAGECODEX_REFERENCE_CACHE_MEMORY_ENTRIES", 256)
+REFERENCE_CACHE_DISK_ENABLED = _env_bool("IMAGECODEX_REFERENCE_CACHE_DISK", True)
+REFERENCE_CACHE_DISK_MAX_ENTRIES = _env_int("IMAGECODEX_REFERENCE_CACHE_DISK_MAX_ENTRIES", 5000)
+REFERENCE_CACHE_TTL_SECONDS = _env_float("IMAGECODEX_REFERENCE_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+
+# ==============================================================================
+# == STYLEBANK (src/core/style_bank.py)
+# ==============================================================================
+# Curated genre/mood phrases for Stage 3; reloaded when the file changes.
+STYLE_BANK_PATH = _env_path("IMAGECODEX_STYLE_BANK_PATH", Path(__file__).resolve().parent.parent / "data" / "style_bank.json")
+
+# ==============================================================================
+# == GENERATED IMAGE ARTIFACTS (src/core/artifacts.py)
+# ==============================================================================
+# Generated images are downloaded once into ARTIFACT_DIR with a thumbnail whose
+# longest edge is ARTIFACT_THUMBNAIL_EDGE. Least recently viewed artifacts are
+# deleted once the directory holds more than ARTIFACT_MAX_BYTES.
+ARTIFACT_DIR = _env_path("IMAGECODEX_ARTIFACT_DIR", CACHE_DIR / "artifacts")
+ARTIFACT_MAX_BYTES = _env_int("IMAGECODEX_ARTIFACT_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+ARTIFACT_THUMBNAIL_EDGE = _env_int("IMAGECODEX_ARTIFACT_THUMBNAIL_EDGE", 384)
+ARTIFACT_DOWNLOAD_POOL_SIZE = _env_int("IMAGECODEX_ARTIFACT_DOWNLOAD_POOL_SIZE", 8)
+ARTIFACT_DOWNLOAD_TIMEOUT_SECONDS = _env_float("IMAGECODEX_ARTIFACT_DOWNLOAD_TIMEOUT_SECONDS", 60.0)
+
+# Generation history (src/core/gallery.py): Stage 4 shows GALLERY_PAGE_SIZE images per page.
+GALLERY_DB_PATH = _env_path("IMAGECODEX_GALLERY_DB_PATH", CACHE_DIR / "gallery.sqlite3")
+GALLERY_PAGE_SIZE = _env_int("IMAGECODEX_GALLERY_PAGE_SIZE", 12)
+
+# ==============================================================================
+# == DURABLE JOB QUEUE (src/jobs)
+# ==============================================================================
+# Stage 4 image requests are queued in SQLite and run by a pool of worker
+# threads: embedded in the app / API process (JOB_EMBEDDED_WORKERS) and/or in
+# separate `imagecodex-worker` processes sharing the same JOB_DB_PATH. Failed
+# attempts are retried with exponential backoff; a job whose worker stops
+# renewing its lease for JOB_LEASE_SECONDS is handed to another worker.
+# Expanded and made absolute, so the app and the workers open the same file
+# whatever their working directories.
+JOB_DB_PATH = _env_path("IMAGECODEX_JOB_DB_PATH", CACHE_DIR / "jobs.sqlite3").resolve()
+JOB_WORKERS = _env_int("IMAGECODEX_JOB_WORKERS", 4)
+JOB_EMBEDDED_WORKERS = _env_bool("IMAGECODEX_JOB_EMBEDDED_WORKERS", True)
+JOB_MAX_ATTEMPTS = _env_int("IMAGECODEX_JOB_MAX_ATTEMPTS", 3)
+JOB_RETRY_BASE_SECONDS = _env_float("IMAGECODEX_JOB_RETRY_BASE_SECONDS", 2.0)
+JOB_RETRY_MAX_SECONDS = _env_float("IMAGECODEX_JOB_RETRY_MAX_SECONDS", 60.0)
+JOB_LEASE_SECONDS = _env_float("IMAGECODEX_JOB_LEASE_SECONDS", 120.0)
+JOB_POLL_SECONDS = _env_float("IMAGECODEX_JOB_POLL_SECONDS", 1.0)
+JOB_MAX_QUEUED = _env_int("IMAGECODEX_JOB_MAX_QUEUED", 500)
+JOB_RETENTION_SECONDS = _env_float("IMAGECODEX_JOB_RETENTION_SECONDS", 7 * 24 * 3600)
+
+# ==============================================================================
+# == TRACING AND LATENCY METRICS (src/core/tracing.py)
+# ==============================================================================
+# Every graph node, LLM call, web search and image request is timed into an
+# in-memory ring of TRACE_BUFFER_SPANS spans plus cumulative histograms.
+# TRACE_JSONL_PATH also appends each span as one JSON line; METRICS_PATH is
+# rewritten (Prometheus text format) at most every METRICS_WRITE_SECONDS.
+TRACING_ENABLED = _env_bool("IMAGECODEX_TRACING", True)
+TRACE_BUFFER_SPANS = _env_int("IMAGECODEX_TRACE_BUFFER_SPANS", 5000)
+TRACE_JSONL_PATH = _env_path("IMAGECODEX_TRACE_JSONL_PATH", None)
+METRICS_PATH = _env_path("IMAGECODEX_METRICS_PATH", None)
+METRICS_WRITE_SECONDS = _env_float("IMAGECODEX_METRICS_WRITE_SECONDS", 15.0)
@@ -0,0 +1,111 @@
+# src/core/gallery.py
+"""
+Indexed history of generated images.
+
+`AppState.generated_images` used to keep every image a session ever produced,
+so each rerun carried (and the gallery rendered) the whole history. Images are
+now filed here as soon as a run returns them, and the UI reads one page at a
+time, optionally filtered by model and aspect ratio.
+
+Each session files its images under its own `gallery_id`. The history lives in
+one SQLite file, so it survives a page reload.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from src.core import config
+from src.core.schemas import GeneratedImage
+
+
+class GalleryStore:
+    """Generated images by gallery, newest first, with model / aspect-ratio filters."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, gallery_id TEXT NOT NULL, created_at REAL NOT NULL,"
+                " model TEXT NOT NULL, aspect_ratio TEXT, image TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_images_gallery ON images (gallery_id, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_images_gallery_model ON images (gallery_id, model, aspect_ratio, id)")
+
+    def add(self, gallery_id: str, images: Iterable[GeneratedImage]) -> int:
+        """Files `images` (oldest first) in the gallery; returns how many were added."""
+        now = time.time()
+        rows = [
+            (gallery_id, now, image.model_used, image.metadata.get("aspect_ratio"), image.model_dump_json())
+            for image in images
+        ]
+        if rows:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO images (gallery_id, created_at, model, aspect_ratio, image) VALUES (?, ?, ?, ?, ?)", rows
+                )
+        return len(rows)
+
+    @staticmethod
+    def _where(gallery_id: str, models: Optional[Sequence[str]], aspect_ratios: Optional[Sequence[str]]) -> Tuple[str, list]:
+        clause, args = "gallery_id = ?", [gallery_id]
+        if models:
+            clause += f" AND model IN ({', '.join('?' * len(models))})"
+            args += list(models)
+        if aspect_ratios:
+            clause += f" AND aspect_ratio IN ({', '.join('?' * len(aspect_ratios))})"
+            args += list(aspect_ratios)
+        return clause, args
+
+    def count(self, gallery_id: str, models: Optional[Sequence[str]] = None, aspect_ratios: Optional[Sequence[str]] = None) -> int:
+        clause, args = self._where(gallery_id, models, aspect_ratios)
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM images WHERE {clause}", args).fetchone()
+        return count
+
+    def page(
+        self, gallery_id: str, offset: int = 0, limit: Optional[int] = None,
+        models: Optional[Sequence[str]] = None, aspect_ratios: Optional[Sequence[str]] = None,
+    ) -> List[GeneratedImage]:
+        """One page of the (filtered) gallery, newest first."""
+        clause, args = self._where(gallery_id, models, aspect_ratios)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT image FROM images WHERE {clause} ORDER BY id DESC LIMIT ? OFFSET ?",
+                [*args, limit or config.GALLERY_PAGE_SIZE, max(0, offset)],
+            ).fetchall()
+        return [GeneratedImage.model_validate(json.loads(row[0])) for row in rows]
+
+    def facets(self, gallery_id: str) -> Dict[str, List[str]]:
+        """The models and aspect ratios present in the gallery, for the filter widgets."""
+        with self._lock:
+            models = [row[0] for row in self._conn.execute("SELECT DISTINCT model FROM images WHERE gallery_id = ? ORDER BY model", (gallery_id,))]
+            ratios = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT aspect_ratio FROM images WHERE gallery_id = ? AND aspect_ratio IS NOT NULL ORDER BY aspect_ratio", (gallery_id,)
+            )]
+        return {"models": models, "aspect_ratios": ratios}
+
+    def clear(self, gallery_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM images WHERE gallery_id = ?", (gallery_id,))
+
+
+_gallery_store: Optional[GalleryStore] = None
+_gallery_store_lock = threading.Lock()
+
+
+def get_gallery_store() -> GalleryStore:
+    """Returns the process-wide gallery store on `config.GALLERY_DB_PATH`."""
+    global _gallery_store
+    if _gallery_store is None:
+        with _gallery_store_lock:
+            if _gallery_store is None:
+                _gallery_store = GalleryStore(config.GALLERY_DB_PATH)
+    return _gallery_store
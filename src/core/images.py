@@ -0,0 +1,116 @@
+# src/core/images.py
+"""
+Shared image preprocessing for vision calls.
+
+Raw uploads (often multi-megabyte phone photos) are normalised before they are
+sent to a vision model:
+
+1. The real format is detected, so the data URL carries the correct MIME type.
+2. EXIF orientation is applied and the image is downscaled so its longest edge
+   fits `config.VISION_MAX_EDGE`.
+3. The result is re-encoded (JPEG, or WEBP when the image has transparency),
+   unless the original is already smaller and needs no resizing.
+
+Encoded payloads are cached by content hash, so Stage 1, Stage 2 and Stage 3
+share the work when they see the same upload.
+"""
+import base64
+import io
+import logging
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pydantic import BaseModel, ConfigDict
+
+from src.core import config
+from src.core.cache import LRUCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+# Formats the OpenAI vision endpoint accepts as-is.
+VISION_SUPPORTED_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+_prepared_images = LRUCache(max_entries=config.VISION_CACHE_ENTRIES)
+
+
+class PreparedImage(BaseModel):
+    """An image payload that is ready to be embedded in a vision request."""
+    model_config = ConfigDict(frozen=True)
+
+    content_hash: str  # hash of the ORIGINAL upload, not of the re-encoded bytes
+    mime_type: str
+    data: bytes
+    width: Optional[int] = None
+    height: Optional[int] = None
+    original_size: int
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+
+def detect_mime_type(image_bytes: bytes) -> Optional[str]:
+    """Returns the MIME type Pillow detects for these bytes, or None if unreadable."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return Image.MIME.get(img.format)
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def _has_transparency(img: Image.Image) -> bool:
+    if img.mode in ("RGBA", "LA", "PA"):
+        return True
+    return img.mode == "P" and "transparency" in img.info
+
+
+def _encode(image_bytes: bytes, digest: str, max_edge: int) -> PreparedImage:
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            source_mime = Image.MIME.get(img.format)
+            is_animated = getattr(img, "is_animated", False)
+            img.seek(0)  # animated GIF/WEBP: use the first frame only
+            img = ImageOps.exif_transpose(img)
+            needs_resize = max(img.size) > max_edge
+            if needs_resize:
+                img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+            buffer = io.BytesIO()
+            if _has_transparency(img):
+                img.convert("RGBA").save(buffer, format="WEBP", quality=config.VISION_JPEG_QUALITY)
+                mime_type = "image/webp"
+            else:
+                img.convert("RGB").save(buffer, format="JPEG", quality=config.VISION_JPEG_QUALITY, optimize=True)
+                mime_type = "image/jpeg"
+            encoded = buffer.getvalue()
+            width, height = img.size
+    except (UnidentifiedImageError, OSError) as e:
+        # Not something Pillow can read; send it untouched and let the API decide.
+        logger.warning(f"Could not preprocess image {digest[:12]}: {e}. Sending original bytes.")
+        return PreparedImage(content_hash=digest, mime_type="image/jpeg", data=image_bytes, original_size=len(image_bytes))
+
+    # Re-encoding a small, already-efficient upload can make it bigger (and lossier).
+    if not needs_resize and not is_animated and source_mime in VISION_SUPPORTED_MIME_TYPES and len(image_bytes) <= len(encoded):
+        encoded, mime_type = image_bytes, source_mime
+
+    logger.info(f"Prepared image {digest[:12]} for vision: {len(image_bytes)} -> {len(encoded)} bytes ({width}x{height}, {mime_type}).")
+    return PreparedImage(
+        content_hash=digest, mime_type=mime_type, data=encoded,
+        width=width, height=height, original_size=len(image_bytes),
+    )
+
+
+def prepare_image_for_vision(image_bytes: bytes, max_edge: Optional[int] = None) -> PreparedImage:
+    """Downscales and re-encodes `image_bytes` for a vision call, using the shared cache."""
+    max_edge = max_edge or config.VISION_MAX_EDGE
+    digest = content_hash(image_bytes)
+    cache_key = (digest, max_edge, config.VISION_JPEG_QUALITY)
+    prepared = _prepared_images.get(cache_key)
+    if prepared is None:
+        prepared = _encode(image_bytes, digest, max_edge)
+        _prepared_images.set(cache_key, prepared)
+    return prepared
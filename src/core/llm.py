@@ -0,0 +1,107 @@
+# src/core/llm.py
+"""
+Central factory for the chat model clients used by every agent.
+
+Agents used to construct a fresh `ChatOpenAI` (and with it a fresh HTTP client)
+on every call, so no connection was ever reused. This module keeps:
+
+- one keep-alive `httpx` connection pool shared by all OpenAI chat clients
+  (plus an async twin used by `ainvoke`), and
+- one configured chat client per (model, temperature, output schema, options).
+
+Pool size and timeouts come from `src.core.config`. Async calls are expected to
+run on the process-wide I/O loop from `src.core.async_runtime`, so the async
+pool's connections always belong to the same event loop.
+"""
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Type
+
+import httpx
+from pydantic import BaseModel
+
+from src.core import config
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = threading.Lock()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.LLM_REQUEST_TIMEOUT_SECONDS, connect=config.LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide keep-alive HTTP client shared by all chat models."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(limits=_pool_limits(), timeout=_timeout())
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the process-wide keep-alive async HTTP client shared by all chat models."""
+    global _async_http_client
+    if _async_http_client is None:
+        with _http_client_lock:
+            if _async_http_client is None:
+                _async_http_client = httpx.AsyncClient(limits=_pool_limits(), timeout=_timeout())
+    return _async_http_client
+
+
+@lru_cache(maxsize=None)
+def _get_base_chat_model(model: str, temperature: Optional[float], max_tokens: Optional[int], json_mode: bool) -> "ChatOpenAI":
+    # Imported here so the UI can start without loading the OpenAI SDK.
+    from langchain_openai import ChatOpenAI
+
+    model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        model_kwargs=model_kwargs,
+        timeout=config.LLM_REQUEST_TIMEOUT_SECONDS,
+        max_retries=config.LLM_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(
+    model: str = "gpt-4o",
+    temperature: Optional[float] = None,
+    schema: Optional[Type[BaseModel]] = None,
+    max_tokens: Optional[int] = None,
+    json_mode: bool = False,
+):
+    """
+    Returns the shared chat client for this configuration.
+
+    When `schema` is given, the client is wrapped with `with_structured_output`
+    so the runnable returns validated `schema` instances. Both the raw client and
+    the structured wrapper are cached, so repeated calls are dictionary lookups.
+    """
+    llm = _get_base_chat_model(model, temperature, max_tokens, json_mode)
+    if schema is None:
+        return llm
+    return llm.with_structured_output(schema)
+
+
+def clear_chat_models() -> None:
+    """Drops every cached client (the shared HTTP pool is kept open)."""
+    get_chat_model.cache_clear()
+    _get_base_chat_model.cache_clear()
@@ -0,0 +1,94 @@
+# src/core/rate_limit.py
+"""
+Per-backend concurrency caps and request pacing for external image APIs.
+
+A `BackendLimiter` bounds how many requests to one backend are in flight and,
+optionally, how many may start per minute. The same limiter is shared by the
+thread-pool (sync) and event-loop (async) paths, so a batch in one session and
+a single request in another are counted against the same budget.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from src.core import config
+
+# How often an async waiter re-checks a full backend.
+_ASYNC_POLL_SECONDS = 0.05
+
+
+class BackendLimiter:
+    """Caps in-flight requests to `max_concurrency` and starts to `requests_per_minute` (0 = unlimited)."""
+
+    def __init__(self, name: str, max_concurrency: int, requests_per_minute: int = 0):
+        self.name = name
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._pace_lock = threading.Lock()
+
+    def _reserve_start(self) -> float:
+        """Books the next start time and returns how long the caller must wait for it."""
+        if not self._interval:
+            return 0.0
+        with self._pace_lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+            return start - now
+
+    @contextmanager
+    def slot(self):
+        self._slots.acquire()
+        try:
+            delay = self._reserve_start()
+            if delay:
+                time.sleep(delay)
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        # A threading semaphore is used so sync and async callers share one budget;
+        # the async side polls instead of blocking the event loop.
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(_ASYNC_POLL_SECONDS)
+        try:
+            delay = self._reserve_start()
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            self._slots.release()
+
+
+_limiters: Dict[str, BackendLimiter] = {}
+_limiters_lock = threading.Lock()
+
+_BACKEND_SETTINGS = {
+    "openai": lambda: (config.IMAGE_GEN_OPENAI_CONCURRENCY, config.IMAGE_GEN_OPENAI_RPM),
+    "replicate": lambda: (config.IMAGE_GEN_REPLICATE_CONCURRENCY, config.IMAGE_GEN_REPLICATE_RPM),
+}
+
+
+def backend_concurrency_caps() -> Dict[str, int]:
+    """The configured in-flight cap of every backend (also used by the job queue, across processes)."""
+    return {backend: max(1, settings()[0]) for backend, settings in _BACKEND_SETTINGS.items()}
+
+
+def get_backend_limiter(backend: str) -> BackendLimiter:
+    """Returns the process-wide limiter for `backend` ("openai" or "replicate")."""
+    limiter: Optional[BackendLimiter] = _limiters.get(backend)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(backend)
+            if limiter is None:
+                if backend not in _BACKEND_SETTINGS:
+                    raise KeyError(f"Unknown image backend '{backend}'. Available: {sorted(_BACKEND_SETTINGS)}")
+                concurrency, rpm = _BACKEND_SETTINGS[backend]()
+                limiter = BackendLimiter(backend, concurrency, rpm)
+                _limiters[backend] = limiter
+    return limiter
@@ -0,0 +1,215 @@
+# src/core/response_cache.py
+"""
+Content-addressed caches for expensive LLM and web-search responses.
+
+A `VisualAnalysis` depends only on the image, the model and the prompt, so it
+is cached on disk under `<image sha256>:<model>:<prompt version>`. The prompt
+version is derived from the prompt text itself, so editing a prompt naturally
+invalidates its old entries.
+
+Story references ("Mahabharata", "Narnia", ...) use two tiered caches: one for
+raw Tavily results keyed by the normalised query, and one for the motifs parsed
+from them keyed by reference and prompt version. A hit on the second skips both
+the search and the LLM call.
+
+Prompt critiques are kept in memory under the analysis and the normalised
+prompt, so a refinement that gives back the same prompt is not inspected again.
+"""
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from src.core import config
+from src.core.cache import DiskCache, LRUCache, TieredCache, content_hash
+from src.core.schemas import ImagePrompt, PromptCritique, VisualAnalysis
+from src.core.tracing import record_cache
+
+logger = logging.getLogger(__name__)
+
+_visual_analysis_cache: Optional[DiskCache] = None
+_visual_analysis_cache_lock = threading.Lock()
+
+
+def prompt_version(prompt_text: str) -> str:
+    """Short, stable fingerprint of a prompt, used to version cache keys."""
+    return content_hash(prompt_text.encode("utf-8"))[:12]
+
+
+def get_visual_analysis_cache() -> Optional[DiskCache]:
+    """Returns the shared on-disk `VisualAnalysis` cache, or None when disabled."""
+    global _visual_analysis_cache
+    if not config.VISUAL_ANALYSIS_CACHE_ENABLED:
+        return None
+    if _visual_analysis_cache is None:
+        with _visual_analysis_cache_lock:
+            if _visual_analysis_cache is None:
+                _visual_analysis_cache = DiskCache(
+                    config.CACHE_DIR / "visual_analysis.sqlite3",
+                    max_entries=config.VISUAL_ANALYSIS_CACHE_MAX_ENTRIES,
+                    max_bytes=config.VISUAL_ANALYSIS_CACHE_MAX_BYTES,
+                    ttl_seconds=config.VISUAL_ANALYSIS_CACHE_TTL_SECONDS,
+                )
+    return _visual_analysis_cache
+
+
+def visual_analysis_cache_key(image_hash: str, model: str, prompt_text: str) -> str:
+    return f"{image_hash}:{model}:{prompt_version(prompt_text)}"
+
+
+def get_cached_visual_analysis(cache_key: str) -> Optional[VisualAnalysis]:
+    cache = get_visual_analysis_cache()
+    if cache is None:
+        return None
+    try:
+        cached = cache.get(cache_key)
+        record_cache("visual_analysis", cached is not None)
+        return VisualAnalysis.model_validate(cached) if cached is not None else None
+    except Exception as e:
+        # A corrupt or outdated entry is just a miss.
+        logger.warning(f"Ignoring unreadable visual analysis cache entry {cache_key}: {e}")
+        cache.delete(cache_key)
+        return None
+
+
+def store_visual_analysis(cache_key: str, analysis: VisualAnalysis) -> None:
+    cache = get_visual_analysis_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(cache_key, analysis.model_dump())
+    except Exception as e:
+        logger.warning(f"Could not store visual analysis in cache: {e}")
+
+
+# ==============================================================================
+# == PROMPT CRITIQUES
+# ==============================================================================
+_critique_cache: Optional[LRUCache] = None
+_critique_cache_lock = threading.Lock()
+
+
+def get_critique_cache() -> LRUCache:
+    global _critique_cache
+    if _critique_cache is None:
+        with _critique_cache_lock:
+            if _critique_cache is None:
+                _critique_cache = LRUCache(config.CRITIQUE_CACHE_ENTRIES)
+    return _critique_cache
+
+
+def normalize_prompt(text: str) -> str:
+    """Case, whitespace and surrounding quotes/punctuation do not change what a prompt asks for."""
+    return " ".join(text.lower().split()).strip(" \"'.")
+
+
+def critique_cache_key(analysis: VisualAnalysis, prompt: ImagePrompt) -> str:
+    payload = "\n".join((analysis.model_dump_json(), normalize_prompt(prompt.prompt_body), normalize_prompt(prompt.technical_parameters)))
+    return content_hash(payload.encode("utf-8"))
+
+
+def get_cached_critique(cache_key: str) -> Optional[PromptCritique]:
+    critique = get_critique_cache().get(cache_key)
+    record_cache("critique", critique is not None)
+    return critique
+
+
+def store_critique(cache_key: str, critique: PromptCritique) -> None:
+    get_critique_cache().set(cache_key, critique)
+
+
+# ==============================================================================
+# == STORY REFERENCE CACHES (Tavily results + parsed motifs)
+# ==============================================================================
+_tiered_caches = {}
+_tiered_caches_lock = threading.Lock()
+
+
+def _get_reference_tier(name: str) -> TieredCache:
+    cache = _tiered_caches.get(name)
+    if cache is None:
+        with _tiered_caches_lock:
+            cache = _tiered_caches.get(name)
+            if cache is None:
+                disk = None
+                if config.REFERENCE_CACHE_DISK_ENABLED:
+                    disk = DiskCache(
+                        config.CACHE_DIR / f"{name}.sqlite3",
+                        max_entries=config.REFERENCE_CACHE_DISK_MAX_ENTRIES,
+                        ttl_seconds=config.REFERENCE_CACHE_TTL_SECONDS,
+                    )
+                memory = LRUCache(config.REFERENCE_CACHE_MEMORY_ENTRIES, ttl_seconds=config.REFERENCE_CACHE_TTL_SECONDS)
+                cache = TieredCache(memory, disk)
+                _tiered_caches[name] = cache
+    return cache
+
+
+def get_search_results_cache() -> TieredCache:
+    return _get_reference_tier("search_results")
+
+
+def get_story_reference_cache() -> TieredCache:
+    return _get_reference_tier("story_references")
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query or story reference."""
+    return " ".join(text.lower().split())
+
+
+def cached_web_search(tool, query: str) -> Any:
+    """Runs `tool.invoke(query)`, reusing results for the same normalised query."""
+    cache = get_search_results_cache()
+    cache_key = f"{tool.name}:{getattr(tool, 'max_results', '')}:{normalize_query(query)}"
+    results = cache.get(cache_key)
+    record_cache("search_results", results is not None)
+    if results is None:
+        results = tool.invoke(query)
+        cache.set(cache_key, results)
+    else:
+        print(f"   - Search results for '{query}' served from cache.")
+    return results
+
+
+def cached_story_reference(kind: str, reference: str, prompt_text: str, compute: Callable[[], Any]) -> Any:
+    """
+    Returns the parsed result of a story-reference lookup (`kind` is e.g.
+    "motifs" or "inspiration"), calling `compute` only on a cache miss.
+    """
+    cache = get_story_reference_cache()
+    cache_key = f"{kind}:{normalize_query(reference)}:{prompt_version(prompt_text)}"
+    result = cache.get(cache_key)
+    record_cache("story_references", result is not None)
+    if result is None:
+        result = compute()
+        cache.set(cache_key, result)
+    else:
+        print(f"   - {kind.capitalize()} for '{reference}' served from cache.")
+    return result
+
+
+async def acached_web_search(tool, query: str) -> Any:
+    """Async twin of `cached_web_search` (uses `tool.ainvoke`)."""
+    cache = get_search_results_cache()
+    cache_key = f"{tool.name}:{getattr(tool, 'max_results', '')}:{normalize_query(query)}"
+    results = cache.get(cache_key)
+    record_cache("search_results", results is not None)
+    if results is None:
+        results = await tool.ainvoke(query)
+        cache.set(cache_key, results)
+    else:
+        print(f"   - Search results for '{query}' served from cache.")
+    return results
+
+
+async def acached_story_reference(kind: str, reference: str, prompt_text: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Async twin of `cached_story_reference`; `compute` is a coroutine function."""
+    cache = get_story_reference_cache()
+    cache_key = f"{kind}:{normalize_query(reference)}:{prompt_version(prompt_text)}"
+    result = cache.get(cache_key)
+    record_cache("story_references", result is not None)
+    if result is None:
+        result = await compute()
+        cache.set(cache_key, result)
+    else:
+        print(f"   - {kind.capitalize()} for '{reference}' served from cache.")
+    return result
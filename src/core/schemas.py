@@ -4,8 +4,13 @@ This file contains the final, unified Pydantic schemas for the ImageCodeX applic
 This version restores all original schemas and integrates the new Stage 3 and Stage 4 components.
 """
 
+import operator
+import uuid
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Literal
+from typing import Annotated, List, Optional, Dict, Literal, TypedDict
+
+from src.core.artifacts import ImageArtifact
+from src.core.blobs import BlobRef
 
 # ==============================================================================
 # == STAGE 1 & 2 SCHEMAS (Visual Prompting)
@@ -29,6 +34,14 @@ class ImagePrompt(BaseModel):
     prompt_body: str
     technical_parameters: str = Field(default="--ar 16:9 --v 6.0 --style raw")
 
+class VisualPromptDraft(BaseModel):
+    """The fast pipeline's output: the analysis and the prompt from a single vision call."""
+    visual_analysis: VisualAnalysis
+    image_prompt: ImagePrompt
+
+# "quality": analyst, prompt engineer and inspector as three calls; "fast": one call.
+VisualPipelineMode = Literal["quality", "fast"]
+
 class PromptCritique(BaseModel):
     is_accurate: bool
     accuracy_score: int = Field(ge=1, le=10)
@@ -90,22 +103,34 @@ class CinematicNarrativeOutput(BaseModel):
 # == STAGE 4 SCHEMAS (Image Generation)
 # ==============================================================================
 
+ImageModelName = Literal["gpt-4o", "sdxl", "kandinsky-2.2"]
+
 class ImageGenerationParams(BaseModel):
-    model: Literal["gpt-4o", "sdxl", "kandinsky-2.2"] = Field("gpt-4o")
+    model: ImageModelName = Field("gpt-4o")
     prompt: str
     negative_prompt: Optional[str] = None
     aspect_ratio: Literal["1:1", "16:9", "9:16"] = Field("1:1")
-    reference_image: Optional[bytes] = Field(
-        None, 
-        description="Optional reference image for img2img or variation generation.",
-        exclude=True
+    reference_image_ref: Optional[BlobRef] = Field(
+        None,
+        description="Optional handle to a reference image (in the blob store) for img2img or variation generation."
+    )
+    # --- Batch mode ---
+    num_candidates: int = Field(1, ge=1, description="Number of images to generate per model.")
+    extra_models: List[ImageModelName] = Field(
+        default_factory=list,
+        description="Additional models to run side by side with `model`, using the same prompt."
     )
 
+    def target_models(self) -> List[str]:
+        """`model` followed by `extra_models`, without duplicates."""
+        return list(dict.fromkeys([self.model, *self.extra_models]))
+
 class GeneratedImage(BaseModel):
-    image_url: str
+    image_url: str  # the provider's URL; it expires, so prefer `artifact`
     model_used: str
     prompt_used: str
     metadata: dict = Field(default_factory=dict)
+    artifact: Optional[ImageArtifact] = None  # the local copy (src.core.artifacts), if it could be stored
 
 # ==============================================================================
 # == MASTER APPLICATION STATE OBJECT
@@ -113,7 +138,7 @@ class GeneratedImage(BaseModel):
 
 class NarrativeState(BaseModel):
     # --- V3 Cinematic Engine Inputs ---
-    input_image_bytes: Optional[bytes] = Field(None, exclude=True)
+    input_image_ref: Optional[BlobRef] = None  # Handle into the blob store, not the bytes
     initial_idea: Optional[str] = None
     genre: str = "Filmmaker's Choice"
     mood: str = "Filmmaker's Choice"
@@ -126,6 +151,11 @@ class NarrativeState(BaseModel):
     # --- V3 Internal Agent State (for dev view) ---
     context_summary: Optional[str] = None
     inspiration_phrases: Optional[List[str]] = None
+    image_analysis: Optional[str] = None  # Filled by the enriched (parallel) workflow
+
+    # --- V3 Scene Images (generated from the Before/After prompts) ---
+    before_scene_image: Optional[GeneratedImage] = None
+    after_scene_image: Optional[GeneratedImage] = None
     
     # --- V3 UI State ---
     is_locked: bool = False
@@ -136,9 +166,52 @@ class NarrativeState(BaseModel):
     storyboard: Optional[Storyboard] = None
     story_arc: Optional[StoryArc] = None
 
+class VisualWorkflowState(TypedDict, total=False):
+    """
+    Graph state for the Stage 1 & 2 visual workflow. Every key is its own
+    channel, so a node returns only the keys it changed.
+    """
+    original_image_ref: Optional[BlobRef]
+    visual_analysis: Optional[VisualAnalysis]
+    image_prompt: Optional[ImagePrompt]
+    prompt_critique: Optional[PromptCritique]
+    video_creative_brief: Optional[VideoCreativeBrief]
+    video_prompt: Optional[str]
+    user_feedback: Optional[str]
+    active_prompt_for_refinement: Optional[Literal["image", "video"]]
+    # Fast pipeline only: also run the inspector on the new prompt.
+    inspect_prompt: Optional[bool]
+    # The caller inspects the prompt off the critical path; the graph skips the inspector.
+    background_inspection: Optional[bool]
+    error_message: Optional[str]
+
+class EnrichedNarrativeGraphState(BaseModel):
+    """
+    Graph state for the enriched Stage 3 workflow. The parallel research branches
+    each append to `enrichment_phrases`; the reducer merges them before the
+    context engineer runs.
+    """
+    narrative_state: NarrativeState = Field(default_factory=NarrativeState)
+    enrichment_phrases: Annotated[List[str], operator.add] = Field(default_factory=list)
+    image_analysis: Optional[str] = None
+
+class SceneImageGraphState(BaseModel):
+    """
+    Graph state for generating the Before and After scene images in parallel.
+    Each branch writes only its own image field; failures are collected by the
+    `scene_image_errors` reducer.
+    """
+    narrative_state: NarrativeState = Field(default_factory=NarrativeState)
+    model: ImageModelName = "gpt-4o"
+    aspect_ratio: Literal["1:1", "16:9", "9:16"] = "16:9"
+    before_scene_image: Optional[GeneratedImage] = None
+    after_scene_image: Optional[GeneratedImage] = None
+    scene_image_errors: Annotated[List[str], operator.add] = Field(default_factory=list)
+    error_message: Optional[str] = None
+
 class AppState(BaseModel):
     # STAGES 1 & 2 STATE
-    original_image_bytes: Optional[bytes] = None
+    original_image_ref: Optional[BlobRef] = None  # Handle into the blob store, not the bytes
     visual_analysis: Optional[VisualAnalysis] = None
     image_prompt: Optional[ImagePrompt] = None
     prompt_critique: Optional[PromptCritique] = None
@@ -148,13 +221,21 @@ class AppState(BaseModel):
     # REFINEMENT STATE
     user_feedback: Optional[str] = None
     active_prompt_for_refinement: Optional[Literal["image", "video"]] = None
+    # Key of the background inspection of `image_prompt` (src.core.background_inspection), while it runs.
+    pending_critique: Optional[str] = None
 
     # STAGE 3 STATE
     narrative_state: NarrativeState = Field(default_factory=NarrativeState)
     
     # STAGE 4 STATE
     image_gen_params: Optional[ImageGenerationParams] = None
-    generated_images: List[GeneratedImage] = Field(default_factory=list)
+    # Images from the latest run: graph nodes (and `apply_graph_updates`) append
+    # to the list, and the controller files them in the gallery (src.core.gallery).
+    generated_images: Annotated[List[GeneratedImage], operator.add] = Field(default_factory=list)
+    # This session's history in the gallery store.
+    gallery_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    # Ids of queued batches (src.jobs) whose images have not been collected yet.
+    pending_image_batches: List[str] = Field(default_factory=list)
 
     # UTILITY STATE
     error_message: Optional[str] = None
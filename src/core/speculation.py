@@ -0,0 +1,162 @@
+# src/core/speculation.py
+"""
+Speculative prefetch of likely follow-up work (opt-in).
+
+After Stage 1 returns a prompt, users almost always ask for a video prompt or
+send the prompt to Stage 4; after Stage 3 they generate the Before/After
+images. With `SPECULATION_ENABLED`, the controller starts those runs on the
+shared I/O loop while the user is still reading the result:
+
+- every speculation is a graph run, keyed by the inputs it depends on. Its
+  node updates are used only when the user's real request has the same key;
+- each session has one speculation per slot (e.g. "video_prompt"). Starting
+  a new one in a slot cancels the old one, and `cancel` drops a session's;
+- spending is capped per session (`SPECULATION_SESSION_BUDGET` cost units per
+  `SPECULATION_BUDGET_WINDOW_SECONDS`, one unit per LLM run or image), and at
+  most `SPECULATION_MAX_IN_FLIGHT` run at once across the process;
+- unclaimed results are dropped after `SPECULATION_TTL_SECONDS`.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.core import config
+from src.core.async_runtime import get_io_loop
+from src.core.cache import content_hash
+from src.core.state import astream_node_updates
+
+logger = logging.getLogger(__name__)
+
+
+def speculation_key(kind: str, *parts: Any) -> str:
+    """A key for `kind` of work on these inputs (pydantic models, plain values or None)."""
+    encoded = [part.model_dump_json() if isinstance(part, BaseModel) else json.dumps(part, sort_keys=True, default=str) for part in parts]
+    return content_hash("\n".join([kind, *encoded]).encode("utf-8"))
+
+
+@dataclass
+class _Speculation:
+    key: str
+    future: concurrent.futures.Future
+    started_at: float
+
+
+class SpeculativeExecutor:
+    """Runs speculative graph runs per (session, slot); see the module docstring."""
+
+    def __init__(self, max_in_flight: int, session_budget: int, budget_window_seconds: float, ttl_seconds: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.session_budget = session_budget
+        self.budget_window_seconds = budget_window_seconds
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], _Speculation] = {}
+        self._spent: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._stats = {"started": 0, "hits": 0, "cancelled": 0, "expired": 0, "over_budget": 0}
+
+    def _prune_locked(self, now: float) -> None:
+        for entry_key, entry in list(self._entries.items()):
+            if entry.future.done() and now - entry.started_at > self.ttl_seconds:
+                del self._entries[entry_key]
+                self._stats["expired"] += 1
+        for session_id, spent in list(self._spent.items()):
+            while spent and now - spent[0][0] > self.budget_window_seconds:
+                spent.popleft()
+            if not spent:
+                del self._spent[session_id]
+
+    def speculate(
+        self, session_id: str, slot: str, key: str, graph_getter: Callable[[], Any], payload: Any, cost: int = 1,
+    ) -> bool:
+        """Starts a run of the graph for `key` unless it is already there; returns whether it is running or done."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune_locked(now)
+            current = self._entries.get((session_id, slot))
+            if current is not None and current.key == key and not current.future.cancelled():
+                return True
+            if current is not None:
+                self._cancel_locked(session_id, slot)
+            spent = self._spent.setdefault(session_id, deque())
+            in_flight = sum(1 for entry in self._entries.values() if not entry.future.done())
+            if in_flight >= self.max_in_flight or sum(units for _, units in spent) + cost > self.session_budget:
+                self._stats["over_budget"] += 1
+                return False
+            spent.append((now, cost))
+            # Graphs are compiled once per process, so this is a dictionary lookup after the first call.
+            coro = astream_node_updates(graph_getter(), payload)
+            future = asyncio.run_coroutine_threadsafe(coro, get_io_loop())
+            self._entries[(session_id, slot)] = _Speculation(key, future, now)
+            self._stats["started"] += 1
+        logger.info(f"Speculating '{slot}' for session {session_id[:8]}.")
+        return True
+
+    def claim(self, session_id: str, key: str, wait: bool = True) -> Optional[List[Mapping[str, Any]]]:
+        """
+        The node updates of the session's speculation for `key`, or None on a
+        miss. A run that is still going is awaited when `wait`, otherwise it is
+        cancelled (the real request will do the work). The speculation is
+        consumed either way.
+        """
+        with self._lock:
+            self._prune_locked(time.monotonic())
+            slot = next((slot for (owner, slot), entry in self._entries.items() if owner == session_id and entry.key == key), None)
+            if slot is None:
+                return None
+            entry = self._entries.pop((session_id, slot))
+            if not wait and not entry.future.done():
+                entry.future.cancel()
+                self._stats["cancelled"] += 1
+                return None
+        try:
+            updates = entry.future.result()
+        except (concurrent.futures.CancelledError, Exception) as e:
+            logger.warning(f"Speculative '{slot}' run failed, running it for real: {e!r}")
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return updates
+
+    def _cancel_locked(self, session_id: str, slot: str) -> None:
+        entry = self._entries.pop((session_id, slot), None)
+        if entry is not None and not entry.future.done():
+            entry.future.cancel()
+            self._stats["cancelled"] += 1
+
+    def cancel(self, session_id: str, slot: Optional[str] = None) -> None:
+        """Cancels the session's speculation in `slot`, or all of them."""
+        with self._lock:
+            slots = [slot] if slot else [owned for owner, owned in self._entries if owner == session_id]
+            for owned in slots:
+                self._cancel_locked(session_id, owned)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "held": len(self._entries)}
+
+
+_executor: Optional[SpeculativeExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_speculative_executor() -> SpeculativeExecutor:
+    """Returns the process-wide executor configured from `src.core.config`."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = SpeculativeExecutor(
+                    max_in_flight=config.SPECULATION_MAX_IN_FLIGHT,
+                    session_budget=config.SPECULATION_SESSION_BUDGET,
+                    budget_window_seconds=config.SPECULATION_BUDGET_WINDOW_SECONDS,
+                    ttl_seconds=config.SPECULATION_TTL_SECONDS,
+                )
+    return _executor
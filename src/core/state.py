@@ -0,0 +1,99 @@
+# src/core/state.py
+"""
+Incremental updates of the application state from graph runs.
+
+Graph nodes return only the keys they changed. The controller streams those
+per-node updates (`stream_mode="updates"`) and applies them to the session's
+`AppState` here, instead of validating the whole graph output into a new
+`AppState` and dumping it back. Unchanged sub-models are shared with the
+previous state, not copied or re-serialised.
+
+Fields declared as `Annotated[..., reducer]` on `AppState` (for example the
+append-only `generated_images`) are combined with the reducer, mirroring how
+LangGraph merges them inside the graph; every other field is replaced.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Type
+
+from pydantic import BaseModel
+
+from src.core.async_runtime import run_sync
+from src.core.schemas import AppState
+
+
+@lru_cache(maxsize=None)
+def field_reducers(model: Type[BaseModel]) -> Dict[str, Callable[[Any, Any], Any]]:
+    """Maps each field of `model` that declares a reducer (`Annotated[T, fn]`) to that reducer."""
+    reducers = {}
+    for name, field in model.model_fields.items():
+        for meta in field.metadata:
+            if callable(meta):
+                reducers[name] = meta
+    return reducers
+
+
+def graph_input(state: AppState, keys: Iterable[str], **overrides: Any) -> Dict[str, Any]:
+    """
+    Builds a graph payload from the given `AppState` fields, passing the
+    objects themselves (no dump), then applies `overrides`. Fields that are
+    None, and graph-only keys `AppState` does not have, are left out, so the
+    graph's channels stay unset.
+    """
+    payload = {key: getattr(state, key) for key in keys if getattr(state, key, None) is not None}
+    payload.update(overrides)
+    return payload
+
+
+def apply_graph_updates(state: AppState, updates: Iterable[Optional[Mapping[str, Any]]]) -> AppState:
+    """
+    Applies a sequence of node updates to `state` and returns the new state.
+    Keys that are not `AppState` fields (graph-internal channels) are ignored.
+    """
+    reducers = field_reducers(AppState)
+    changes: Dict[str, Any] = {}
+    for update in updates:
+        for key, value in (update or {}).items():
+            if key not in AppState.model_fields:
+                continue
+            reducer = reducers.get(key)
+            if reducer is not None:
+                current = changes[key] if key in changes else getattr(state, key)
+                value = reducer(current, value)
+            changes[key] = value
+    return state.model_copy(update=changes) if changes else state
+
+
+def iter_node_updates(chunks: Iterable[Mapping[str, Any]]):
+    """Flattens `stream_mode="updates"` chunks ({node_name: update}) into the updates themselves."""
+    for chunk in chunks:
+        for update in chunk.values():
+            if isinstance(update, Mapping):
+                yield update
+
+
+async def astream_node_updates(
+    graph, payload: Any, config: Optional[dict] = None,
+    on_update: Optional[Callable[[str, Mapping[str, Any]], None]] = None,
+) -> List[Mapping[str, Any]]:
+    """
+    Streams `graph` with `astream` and returns each node's update, in execution
+    order. `on_update(node_name, update)` is called as each one arrives.
+    """
+    updates = []
+    async for chunk in graph.astream(payload, config=config, stream_mode="updates"):
+        for node, update in chunk.items():
+            if isinstance(update, Mapping):
+                updates.append(update)
+                if on_update:
+                    on_update(node, update)
+    return updates
+
+
+def run_graph_for_updates(graph, payload: Any, config: Optional[dict] = None, use_async: bool = False) -> List[Mapping[str, Any]]:
+    """
+    Runs `graph` and returns the update each node returned, in execution order.
+    With `use_async`, the graph is streamed with `astream` on the shared I/O loop.
+    """
+    if use_async:
+        return run_sync(astream_node_updates(graph, payload, config=config))
+    return list(iter_node_updates(graph.stream(payload, config=config, stream_mode="updates")))
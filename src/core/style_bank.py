@@ -0,0 +1,158 @@
+# src/core/style_bank.py
+"""
+The StyleBank: curated inspiration phrases by genre and mood.
+
+The bank is a JSON file (`config.STYLE_BANK_PATH`, by default the bundled
+`src/data/style_bank.json`) shaped as `{genre: {mood: [phrases]}}`. A `"*"`
+genre or mood holds phrases for any genre or mood. The file is parsed once
+into an index keyed by (genre, mood), and it is reloaded only when its
+modification time changes. A lookup is a `stat` and a dict access.
+
+Lookups fall back step by step:
+1. the exact (genre, mood) entry;
+2. the genre's `"*"` phrases and the mood's `"*"` phrases. This is also how
+   "Filmmaker's Choice" on either side is served;
+3. for names the bank does not know (typos, API input), the closest known
+   genre or mood: one containing the name ("noir"), else the most similar
+   spelling (`difflib`).
+"""
+import difflib
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.core import config
+
+logger = logging.getLogger(__name__)
+
+ANY = "*"
+FILMMAKERS_CHOICE = "Filmmaker's Choice"
+_NEAREST_CUTOFF = 0.6
+
+
+def _normalize(name: Optional[str]) -> str:
+    return " ".join((name or "").lower().split())
+
+
+@lru_cache(maxsize=1024)
+def _closest(name: str, candidates: Tuple[str, ...]) -> Optional[str]:
+    # A partial name ("somber", "noir") is its own best hint; otherwise compare spellings.
+    partial = [candidate for candidate in candidates if name in candidate or candidate in name]
+    if partial:
+        return min(partial, key=len)
+    matches = difflib.get_close_matches(name, candidates, n=1, cutoff=_NEAREST_CUTOFF)
+    return matches[0] if matches else None
+
+
+class StyleBank:
+    """The indexed contents of one StyleBank file; see the module docstring."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._index: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._genres: Dict[str, str] = {}  # normalized -> display name
+        self._moods: Dict[str, str] = {}
+
+    # --- Loading ---
+    def _build_index(self, data: dict) -> None:
+        index: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        genres, moods = {}, {}
+        for genre, by_mood in data.items():
+            if genre.startswith("_") or not isinstance(by_mood, dict):
+                continue  # comments and metadata
+            if genre != ANY:
+                genres[_normalize(genre)] = genre
+            for mood, phrases in by_mood.items():
+                if isinstance(phrases, dict):  # older files: {mood: {"default": [...]}}
+                    phrases = phrases.get("default", [])
+                if mood != ANY:
+                    moods[_normalize(mood)] = mood
+                index[(_normalize(genre) if genre != ANY else ANY, _normalize(mood) if mood != ANY else ANY)] = tuple(phrases)
+        self._index, self._genres, self._moods = index, genres, moods
+
+    def _refresh(self) -> None:
+        """Reloads the file if it changed since the last load; keeps the last good index on errors."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            if mtime_ns is None:
+                logger.warning(f"StyleBank file {self.path} not found; StyleBank lookups return nothing.")
+                self._build_index({})
+            else:
+                try:
+                    self._build_index(json.loads(self.path.read_text(encoding="utf-8")))
+                    logger.info(f"Loaded StyleBank {self.path}: {len(self._genres)} genres, {len(self._moods)} moods.")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not load StyleBank {self.path}: {e}. Keeping the previous contents.")
+            self._mtime_ns = mtime_ns
+
+    # --- Lookups ---
+    @property
+    def genres(self) -> List[str]:
+        self._refresh()
+        return list(self._genres.values())
+
+    @property
+    def moods(self) -> List[str]:
+        self._refresh()
+        return list(self._moods.values())
+
+    def _resolve(self, name: Optional[str], known: Dict[str, str]) -> str:
+        """The index key for a genre or mood: itself, its nearest known match, or ANY."""
+        key = _normalize(name)
+        if not key or key == _normalize(FILMMAKERS_CHOICE):
+            return ANY
+        if key in known:
+            return key
+        return _closest(key, tuple(known)) or ANY
+
+    def nearest_genre(self, genre: Optional[str]) -> Optional[str]:
+        """The bank's name for `genre` or its closest match, or None (e.g. for "Filmmaker's Choice")."""
+        self._refresh()
+        return self._genres.get(self._resolve(genre, self._genres))
+
+    def nearest_mood(self, mood: Optional[str]) -> Optional[str]:
+        self._refresh()
+        return self._moods.get(self._resolve(mood, self._moods))
+
+    def phrases(self, genre: Optional[str], mood: Optional[str]) -> List[str]:
+        """Phrases for the pair, falling back as described in the module docstring."""
+        self._refresh()
+        index = self._index
+        genre_key, mood_key = self._resolve(genre, self._genres), self._resolve(mood, self._moods)
+        if genre_key == ANY and mood_key == ANY:
+            return []
+        exact = index.get((genre_key, mood_key))
+        if exact:
+            return list(exact)
+        combined: List[str] = []
+        for key in ((genre_key, ANY), (ANY, mood_key)):
+            if key != (ANY, ANY):
+                combined.extend(phrase for phrase in index.get(key, ()) if phrase not in combined)
+        return combined
+
+
+_style_bank: Optional[StyleBank] = None
+_style_bank_lock = threading.Lock()
+
+
+def get_style_bank() -> StyleBank:
+    """Returns the process-wide StyleBank on `config.STYLE_BANK_PATH`."""
+    global _style_bank
+    if _style_bank is None:
+        with _style_bank_lock:
+            if _style_bank is None:
+                _style_bank = StyleBank(config.STYLE_BANK_PATH)
+    return _style_bank
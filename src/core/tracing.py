@@ -0,0 +1,292 @@
+# src/core/tracing.py
+"""
+Structured tracing and latency metrics.
+
+Every compiled workflow graph carries a `TracingCallbackHandler` (see
+`src.graph.tracing`), so each graph run is recorded as a trace of spans
+without touching the agents:
+
+- "graph" spans for whole runs and "node" spans for each LangGraph node;
+- "llm" spans for chat-model calls, with the request size and the input and
+  output tokens from the model's usage metadata;
+- "tool" spans for tool calls (Tavily searches).
+
+Calls that do not go through LangChain (the image APIs, artifact downloads,
+queued jobs) are wrapped in `span(...)`, and the response caches count their
+hits with `record_cache`.
+
+Finished spans go to a ring buffer of the last `TRACE_BUFFER_SPANS` (for the
+latency panel and `/metrics`), into cumulative per-span histograms, and, when
+`TRACE_JSONL_PATH` is set, to a JSONL file. `render_prometheus` gives the
+histograms and counters in the Prometheus text format; with `METRICS_PATH` set
+they are also written there periodically (for a node-exporter textfile
+collector).
+"""
+import atexit
+import contextvars
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from src.core import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (kind, name, graph) - the identity a span's metrics are aggregated under.
+SpanKey = Tuple[str, str, str]
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values` (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1]
+
+
+@dataclass
+class _Histogram:
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    count: int = 0
+    total_seconds: float = 0.0
+    errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    payload_bytes: int = 0
+
+    def observe(self, span: Dict[str, Any]) -> None:
+        seconds = span["duration_ms"] / 1000
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.errors += span["status"] == "error"
+        self.input_tokens += span.get("input_tokens") or 0
+        self.output_tokens += span.get("output_tokens") or 0
+        self.payload_bytes += span.get("payload_bytes") or 0
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{name}="{_label(value)}"' for name, value in labels.items()) + "}"
+
+
+class Tracer:
+    """Collects finished spans; see the module docstring. Safe to use from any thread."""
+
+    def __init__(
+        self, buffer_spans: int, jsonl_path: Optional[Path] = None,
+        metrics_path: Optional[Path] = None, metrics_write_seconds: float = 15.0,
+    ):
+        self.jsonl_path = jsonl_path
+        self.metrics_path = metrics_path
+        self.metrics_write_seconds = metrics_write_seconds
+        self._lock = threading.Lock()
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=max(1, buffer_spans))
+        self._histograms: Dict[SpanKey, _Histogram] = {}
+        self._caches: Dict[Tuple[str, str], int] = {}
+        self._jsonl = None
+        self._metrics_written_at = 0.0
+
+    def record(self, span: Dict[str, Any]) -> None:
+        key = (span["kind"], span["name"], span.get("graph") or "")
+        with self._lock:
+            self._spans.append(span)
+            self._histograms.setdefault(key, _Histogram()).observe(span)
+            if self.jsonl_path is not None:
+                self._write_jsonl_locked(span)
+            now = time.monotonic()
+            write_metrics = self.metrics_path is not None and now - self._metrics_written_at >= self.metrics_write_seconds
+            if write_metrics:
+                self._metrics_written_at = now
+        if write_metrics:
+            self.write_prometheus()
+
+    def _write_jsonl_locked(self, span: Dict[str, Any]) -> None:
+        try:
+            if self._jsonl is None:
+                self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+                self._jsonl = open(self.jsonl_path, "a", encoding="utf-8")
+            self._jsonl.write(json.dumps(span, default=str) + "\n")
+            self._jsonl.flush()
+        except OSError as e:
+            # Tracing must never break a request; stop exporting instead.
+            logger.warning(f"Disabling JSONL trace export to {self.jsonl_path}: {e}")
+            self.jsonl_path = None
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        key = (cache, "hit" if hit else "miss")
+        with self._lock:
+            self._caches[key] = self._caches.get(key, 0) + 1
+
+    def recent_spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._spans)
+
+    def cache_counts(self) -> Dict[Tuple[str, str], int]:
+        with self._lock:
+            return dict(self._caches)
+
+    def summary(self, kinds: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """
+        Latency per span (kind, name) over the recent spans in the buffer:
+        count, p50/p95/max in ms, errors and tokens, slowest p95 first.
+        """
+        grouped: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for span in self.recent_spans():
+            if kinds is None or span["kind"] in kinds:
+                grouped.setdefault((span["kind"], span["name"]), []).append(span)
+        rows = []
+        for (kind, name), spans in grouped.items():
+            durations = [span["duration_ms"] for span in spans]
+            rows.append({
+                "kind": kind,
+                "name": name,
+                "count": len(spans),
+                "p50_ms": round(percentile(durations, 0.50), 1),
+                "p95_ms": round(percentile(durations, 0.95), 1),
+                "max_ms": round(max(durations), 1),
+                "errors": sum(span["status"] == "error" for span in spans),
+                "input_tokens": sum(span.get("input_tokens") or 0 for span in spans),
+                "output_tokens": sum(span.get("output_tokens") or 0 for span in spans),
+            })
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """The cumulative histograms and counters in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: _Histogram(list(h.buckets), h.count, h.total_seconds, h.errors, h.input_tokens, h.output_tokens, h.payload_bytes)
+                          for key, h in self._histograms.items()}
+            caches = dict(self._caches)
+        lines = [
+            "# HELP imagecodex_span_duration_seconds Duration of traced graph runs, nodes, model calls and API requests.",
+            "# TYPE imagecodex_span_duration_seconds histogram",
+        ]
+        for (kind, name, graph), histogram in sorted(histograms.items()):
+            for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                lines.append(f"imagecodex_span_duration_seconds_bucket{_labels(kind=kind, name=name, graph=graph, le=str(bound))} {count}")
+            lines.append(f"imagecodex_span_duration_seconds_bucket{_labels(kind=kind, name=name, graph=graph, le='+Inf')} {histogram.count}")
+            lines.append(f"imagecodex_span_duration_seconds_sum{_labels(kind=kind, name=name, graph=graph)} {histogram.total_seconds:.6f}")
+            lines.append(f"imagecodex_span_duration_seconds_count{_labels(kind=kind, name=name, graph=graph)} {histogram.count}")
+        counters = (
+            ("imagecodex_span_errors_total", "Spans that ended with an exception.", "errors"),
+            ("imagecodex_span_input_tokens_total", "Model input tokens reported by usage metadata.", "input_tokens"),
+            ("imagecodex_span_output_tokens_total", "Model output tokens reported by usage metadata.", "output_tokens"),
+            ("imagecodex_span_payload_bytes_total", "Request payload bytes sent to models, tools and APIs.", "payload_bytes"),
+        )
+        for metric, description, attribute in counters:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for (kind, name, graph), histogram in sorted(histograms.items()):
+                lines.append(f"{metric}{_labels(kind=kind, name=name, graph=graph)} {getattr(histogram, attribute)}")
+        lines += ["# HELP imagecodex_cache_requests_total Response cache lookups by result.", "# TYPE imagecodex_cache_requests_total counter"]
+        for (cache, result), count in sorted(caches.items()):
+            lines.append(f"imagecodex_cache_requests_total{_labels(cache=cache, result=result)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self) -> str:
+        """The buffered spans as JSON lines."""
+        return "".join(json.dumps(span, default=str) + "\n" for span in self.recent_spans())
+
+    def write_prometheus(self) -> None:
+        """Atomically rewrites `metrics_path`, so a collector never reads half a file."""
+        if self.metrics_path is None:
+            return
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.metrics_path.with_name(f".{self.metrics_path.name}.{os.getpid()}.tmp")
+            temporary.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(temporary, self.metrics_path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.metrics_path}: {e}")
+
+    def close(self) -> None:
+        self.write_prometheus()
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer configured from `src.core.config`."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(
+                    buffer_spans=config.TRACE_BUFFER_SPANS,
+                    jsonl_path=config.TRACE_JSONL_PATH,
+                    metrics_path=config.METRICS_PATH,
+                    metrics_write_seconds=config.METRICS_WRITE_SECONDS,
+                )
+                atexit.register(_tracer.close)
+    return _tracer
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Counts a lookup in the response cache `cache`."""
+    if config.TRACING_ENABLED:
+        get_tracer().record_cache(cache, hit)
+
+
+# ==============================================================================
+# == EXPLICIT SPANS (calls outside LangChain)
+# ==============================================================================
+# (trace_id, span_id) of the innermost open explicit span in this context.
+_current_span: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("imagecodex_current_span", default=None)
+
+
+@contextmanager
+def span(name: str, kind: str = "http", **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Times the block as a span nested in the enclosing `span` (if any). The
+    yielded dict holds the span's attributes; the block may add to it (e.g.
+    "response_bytes"). An exception marks the span as failed and propagates.
+    """
+    if not config.TRACING_ENABLED:
+        yield dict(attributes)
+        return
+    parent = _current_span.get()
+    trace_id = parent[0] if parent else _new_id()
+    span_id = _new_id()
+    token = _current_span.set((trace_id, span_id))
+    started_at, started = time.time(), time.perf_counter()
+    status, error = "ok", None
+    try:
+        yield attributes
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        _current_span.reset(token)
+        get_tracer().record({
+            "trace_id": trace_id, "span_id": span_id, "parent_id": parent[1] if parent else None,
+            "kind": kind, "name": name, "start": started_at,
+            "duration_ms": (time.perf_counter() - started) * 1000, "status": status, "error": error, **attributes,
+        })
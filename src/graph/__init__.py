@@ -5,13 +5,42 @@
 # instead of the old, non-existent one.
 from .graphs import (
     build_visual_workflow_graph,
+    build_fast_visual_workflow_graph,
+    build_prompt_inspection_graph,
     build_cinematic_narrative_graph, # This replaces the old name
-    build_image_generation_graph
+    build_enriched_cinematic_narrative_graph,
+    build_image_generation_graph,
+    build_scene_image_graph,
+    get_compiled_graph,
+    get_visual_workflow_graph,
+    get_fast_visual_workflow_graph,
+    get_visual_workflow_graph_for_mode,
+    get_prompt_inspection_graph,
+    get_cinematic_narrative_graph,
+    get_enriched_cinematic_narrative_graph,
+    get_image_generation_graph,
+    get_scene_image_graph,
+    clear_compiled_graphs,
 )
 
 # This makes the functions directly importable from src.graph
 __all__ = [
     "build_visual_workflow_graph",
+    "build_fast_visual_workflow_graph",
+    "build_prompt_inspection_graph",
     "build_cinematic_narrative_graph", # And we expose the new name here
-    "build_image_generation_graph"
+    "build_enriched_cinematic_narrative_graph",
+    "build_image_generation_graph",
+    "build_scene_image_graph",
+    # Cached, process-wide compiled graphs (preferred at runtime)
+    "get_compiled_graph",
+    "get_visual_workflow_graph",
+    "get_fast_visual_workflow_graph",
+    "get_visual_workflow_graph_for_mode",
+    "get_prompt_inspection_graph",
+    "get_cinematic_narrative_graph",
+    "get_enriched_cinematic_narrative_graph",
+    "get_image_generation_graph",
+    "get_scene_image_graph",
+    "clear_compiled_graphs",
 ]
\ No newline at end of file
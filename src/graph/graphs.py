@@ -1,57 +1,129 @@
 # src/graph/graphs.py
 # FINAL, VERIFIED VERSION - This file contains the complete and correct agentic workflow.
 
-from langgraph.graph import StateGraph, END
-from typing import Literal, Dict, Any
+import threading
+from typing import Literal, Dict, Any, Callable
 
 # --- Import Core Schema ---
-from src.core.schemas import AppState 
-
-# --- Import All Agent Nodes ---
-# Original agents needed for legacy workflows
-from src.agents.visual_analyst import run_visual_analyst
-from src.agents.prompt_engineer import run_prompt_engineer
-from src.agents.inspector import run_inspector
-from src.agents.refiner import run_refiner
-from src.agents.video_director import run_video_director
-from src.agents.image_generator import generate_image_node
-from src.agents.film_story_writer import story_concept_generator_node # Kept for compatibility
-
-# NEW: Imports for the Stage 3 Cinematic agents
-from src.agents.context_engineer import run_context_engineer
-from src.agents.inspiration_agent import run_inspiration_agent
-from src.agents.reference_agent import run_reference_agent
-from src.agents.storytelling_agent import run_cinematic_prompt_engineer
+from src.core.schemas import AppState, EnrichedNarrativeGraphState, SceneImageGraphState, VisualWorkflowState
+
+# LangGraph and the agent modules (and the LLM / image SDKs behind them) are
+# imported inside each builder, so importing this module - and starting the
+# UI - does not pay for them. They load when a workflow is first compiled.
+
+def _node(func: Callable, afunc: Callable):
+    """
+    Wraps an agent with its async twin. `graph.invoke` calls `func`, while
+    `graph.ainvoke` awaits `afunc`, so network-bound nodes don't hold a thread.
+    CPU-only nodes are registered as plain functions; under `ainvoke` LangGraph
+    runs those in its executor.
+    """
+    from langchain_core.runnables import RunnableLambda
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
 
 # ==============================================================================
 # == VISUAL PROMPTING WORKFLOW (STAGES 1 & 2) - UNCHANGED
 # ==============================================================================
-def visual_entry_point_router(state: Dict[str, Any]) -> Literal["visual_analyst", "video_director"]:
+def refines_existing_prompt(state: VisualWorkflowState) -> bool:
+    """Feedback on a prompt the state already holds goes straight to the refiner."""
+    target = state.get("active_prompt_for_refinement")
+    if not state.get("user_feedback"): return False
+    return bool(state.get("image_prompt") if target == "image" else state.get("video_prompt") if target == "video" else False)
+
+def visual_entry_point_router(state: VisualWorkflowState) -> Literal["refiner", "visual_analyst", "video_director"]:
+    # Refinement used to re-run the analysis, the prompt engineer and the
+    # inspector before the refiner, only for the refiner to replace the new prompt.
+    if refines_existing_prompt(state): return "refiner"
     if state.get("video_creative_brief"): return "video_director"
     return "visual_analyst"
 
-def visual_workflow_router(state: Dict[str, Any]) -> Literal["refine", "end"]:
+def visual_workflow_router(state: VisualWorkflowState) -> Literal["refine", "end"]:
     if state.get("user_feedback"): return "refine"
     return "end"
 
+def prompt_router(state: VisualWorkflowState) -> Literal["inspect", "refine", "end"]:
+    # With `background_inspection` the caller critiques the prompt itself
+    # (src.core.background_inspection), so the graph returns it right away.
+    if state.get("background_inspection"): return visual_workflow_router(state)
+    return "inspect"
+
 def build_visual_workflow_graph():
-    workflow = StateGraph(Dict[str, Any])
-    workflow.add_node("visual_analyst", run_visual_analyst)
-    workflow.add_node("prompt_engineer", run_prompt_engineer)
-    workflow.add_node("inspector", run_inspector)
-    workflow.add_node("refiner", run_refiner)
-    workflow.add_node("video_director", run_video_director)
+    from langgraph.graph import StateGraph, END
+    from src.agents.visual_analyst import run_visual_analyst, arun_visual_analyst
+    from src.agents.prompt_engineer import run_prompt_engineer, arun_prompt_engineer
+    from src.agents.inspector import run_inspector, arun_inspector
+    from src.agents.refiner import run_refiner, arun_refiner
+    from src.agents.video_director import run_video_director, arun_video_director
+
+    # One channel per key, so each node's partial update is merged, not swapped in.
+    workflow = StateGraph(VisualWorkflowState)
+    workflow.add_node("visual_analyst", _node(run_visual_analyst, arun_visual_analyst))
+    workflow.add_node("prompt_engineer", _node(run_prompt_engineer, arun_prompt_engineer))
+    workflow.add_node("inspector", _node(run_inspector, arun_inspector))
+    workflow.add_node("refiner", _node(run_refiner, arun_refiner))
+    workflow.add_node("video_director", _node(run_video_director, arun_video_director))
     workflow.set_conditional_entry_point(
         visual_entry_point_router,
-        {"visual_analyst": "visual_analyst", "video_director": "video_director"}
+        {"refiner": "refiner", "visual_analyst": "visual_analyst", "video_director": "video_director"}
     )
     workflow.add_edge("visual_analyst", "prompt_engineer")
-    workflow.add_edge("prompt_engineer", "inspector")
-    workflow.add_edge("refiner", "inspector")
+    prompt_routes = {"inspect": "inspector", "refine": "refiner", "end": END}
+    workflow.add_conditional_edges("prompt_engineer", prompt_router, prompt_routes)
+    workflow.add_conditional_edges("refiner", prompt_router, prompt_routes)
     workflow.add_conditional_edges("inspector", visual_workflow_router, {"refine": "refiner", "end": END})
     workflow.add_conditional_edges("video_director", visual_workflow_router, {"refine": "refiner", "end": END})
     return workflow.compile()
 
+# ==============================================================================
+# == FAST VISUAL PROMPTING WORKFLOW (STAGES 1 & 2, ONE VISION CALL)
+# ==============================================================================
+# The analysis and the prompt come from one structured-output call, so Stage 1
+# is a single round trip. The inspector only runs when the caller sets
+# `inspect_prompt` (and not in the background); video prompts and refinement
+# work as in the quality graph.
+def fast_visual_entry_point_router(state: VisualWorkflowState) -> Literal["refiner", "fast_visual_prompt", "video_director"]:
+    if refines_existing_prompt(state): return "refiner"
+    if state.get("video_creative_brief"): return "video_director"
+    return "fast_visual_prompt"
+
+def fast_prompt_router(state: VisualWorkflowState) -> Literal["inspect", "refine", "end"]:
+    if state.get("inspect_prompt"): return prompt_router(state)
+    return visual_workflow_router(state)
+
+def build_fast_visual_workflow_graph():
+    from langgraph.graph import StateGraph, END
+    from src.agents.fast_visual_prompt import run_fast_visual_prompt, arun_fast_visual_prompt
+    from src.agents.inspector import run_inspector, arun_inspector
+    from src.agents.refiner import run_refiner, arun_refiner
+    from src.agents.video_director import run_video_director, arun_video_director
+
+    workflow = StateGraph(VisualWorkflowState)
+    workflow.add_node("fast_visual_prompt", _node(run_fast_visual_prompt, arun_fast_visual_prompt))
+    workflow.add_node("inspector", _node(run_inspector, arun_inspector))
+    workflow.add_node("refiner", _node(run_refiner, arun_refiner))
+    workflow.add_node("video_director", _node(run_video_director, arun_video_director))
+    workflow.set_conditional_entry_point(
+        fast_visual_entry_point_router,
+        {"refiner": "refiner", "fast_visual_prompt": "fast_visual_prompt", "video_director": "video_director"}
+    )
+    prompt_routes = {"inspect": "inspector", "refine": "refiner", "end": END}
+    workflow.add_conditional_edges("fast_visual_prompt", fast_prompt_router, prompt_routes)
+    workflow.add_conditional_edges("refiner", fast_prompt_router, prompt_routes)
+    workflow.add_conditional_edges("inspector", visual_workflow_router, {"refine": "refiner", "end": END})
+    workflow.add_conditional_edges("video_director", visual_workflow_router, {"refine": "refiner", "end": END})
+    return workflow.compile()
+
+def build_prompt_inspection_graph():
+    """Just the inspector, for critiquing a fast-pipeline prompt on request."""
+    from langgraph.graph import StateGraph, END
+    from src.agents.inspector import run_inspector, arun_inspector
+
+    workflow = StateGraph(VisualWorkflowState)
+    workflow.add_node("inspector", _node(run_inspector, arun_inspector))
+    workflow.set_entry_point("inspector")
+    workflow.add_edge("inspector", END)
+    return workflow.compile()
+
 # ==============================================================================
 # == V3 CINEMATIC NARRATIVE WORKFLOW (STAGE 3) - NEW
 # ==============================================================================
@@ -62,11 +134,17 @@ def inspiration_router(state: AppState) -> Literal["reference_agent", "inspirati
     return "context_engineer"
 
 def build_cinematic_narrative_graph():
+    from langgraph.graph import StateGraph, END
+    from src.agents.context_engineer import run_context_engineer
+    from src.agents.inspiration_agent import run_inspiration_agent, arun_inspiration_agent
+    from src.agents.reference_agent import run_reference_agent, arun_reference_agent
+    from src.agents.storytelling_agent import run_cinematic_prompt_engineer, arun_cinematic_prompt_engineer
+
     workflow = StateGraph(AppState)
-    workflow.add_node("reference_agent", run_reference_agent)
-    workflow.add_node("inspiration_agent", run_inspiration_agent)
+    workflow.add_node("reference_agent", _node(run_reference_agent, arun_reference_agent))
+    workflow.add_node("inspiration_agent", _node(run_inspiration_agent, arun_inspiration_agent))
     workflow.add_node("context_engineer", run_context_engineer)
-    workflow.add_node("cinematic_prompt_engineer", run_cinematic_prompt_engineer)
+    workflow.add_node("cinematic_prompt_engineer", _node(run_cinematic_prompt_engineer, arun_cinematic_prompt_engineer))
     workflow.set_conditional_entry_point(
         inspiration_router,
         {
@@ -86,12 +164,155 @@ def build_cinematic_narrative_graph():
     print("V3 Cinematic Narrative Workflow graph compiled successfully.")
     return graph
 
+# ==============================================================================
+# == ENRICHED CINEMATIC NARRATIVE WORKFLOW (STAGE 3, PARALLEL FAN-OUT)
+# ==============================================================================
+# Every research branch starts at START and runs in the same superstep, so the
+# wall-clock cost is that of the slowest branch. Branches that do not apply to
+# the current inputs return no update. The context engineer waits for all of them.
+def enrichment_branches() -> Dict[str, Any]:
+    """The research branches of the enriched graph, by node name."""
+    from src.agents.narrative_enrichment import (
+        run_reference_branch, arun_reference_branch,
+        run_inspiration_branch, arun_inspiration_branch,
+        run_style_bank_branch,
+        run_image_analysis_branch, arun_image_analysis_branch,
+    )
+    return {
+        "reference_branch": _node(run_reference_branch, arun_reference_branch),
+        "inspiration_branch": _node(run_inspiration_branch, arun_inspiration_branch),
+        "style_bank_branch": run_style_bank_branch,
+        "image_analysis_branch": _node(run_image_analysis_branch, arun_image_analysis_branch),
+    }
+
+def build_enriched_cinematic_narrative_graph():
+    from langgraph.graph import StateGraph, START, END
+    from src.agents.narrative_enrichment import merge_enrichment_into_context, run_enriched_storyteller, arun_enriched_storyteller
+
+    branches = enrichment_branches()
+    workflow = StateGraph(EnrichedNarrativeGraphState)
+    for name, node in branches.items():
+        workflow.add_node(name, node)
+        workflow.add_edge(START, name)
+    workflow.add_node("context_engineer", merge_enrichment_into_context)
+    workflow.add_node("cinematic_prompt_engineer", _node(run_enriched_storyteller, arun_enriched_storyteller))
+    workflow.add_edge(list(branches), "context_engineer")
+    workflow.add_edge("context_engineer", "cinematic_prompt_engineer")
+    workflow.add_edge("cinematic_prompt_engineer", END)
+    return workflow.compile()
+
 # ==============================================================================
 # == IMAGE GENERATION WORKFLOW (STAGE 4) - UNCHANGED
 # ==============================================================================
 def build_image_generation_graph():
+    from langgraph.graph import StateGraph, END
+    from src.agents.image_generator import generate_image_node, agenerate_image_node
+
     workflow = StateGraph(AppState)
-    workflow.add_node("image_generator", generate_image_node)
+    workflow.add_node("image_generator", _node(generate_image_node, agenerate_image_node))
     workflow.set_entry_point("image_generator")
     workflow.add_edge("image_generator", END)
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile()
+
+# ==============================================================================
+# == SCENE IMAGE WORKFLOW (STAGE 3 -> 4, PARALLEL BEFORE/AFTER)
+# ==============================================================================
+# Both scene images are generated in the same superstep, so the wall-clock cost
+# is one generation round-trip. The link node stores them on the narrative.
+def build_scene_image_graph():
+    from langgraph.graph import StateGraph, START, END
+    from src.agents.scene_image_agent import (
+        run_before_scene_image, arun_before_scene_image,
+        run_after_scene_image, arun_after_scene_image,
+        link_scene_images,
+    )
+
+    workflow = StateGraph(SceneImageGraphState)
+    workflow.add_node("before_scene_image", _node(run_before_scene_image, arun_before_scene_image))
+    workflow.add_node("after_scene_image", _node(run_after_scene_image, arun_after_scene_image))
+    workflow.add_node("link_scene_images", link_scene_images)
+    workflow.add_edge(START, "before_scene_image")
+    workflow.add_edge(START, "after_scene_image")
+    workflow.add_edge(["before_scene_image", "after_scene_image"], "link_scene_images")
+    workflow.add_edge("link_scene_images", END)
+    return workflow.compile()
+
+# ==============================================================================
+# == COMPILED GRAPH REGISTRY
+# ==============================================================================
+# Building and compiling a graph is pure overhead once the topology is known, so
+# each workflow is compiled lazily on first use and shared by every session in
+# the process. Compiled graphs hold no per-run state and are safe to invoke
+# concurrently.
+GRAPH_BUILDERS: Dict[str, Callable[[], Any]] = {
+    "visual_workflow": build_visual_workflow_graph,
+    "visual_workflow_fast": build_fast_visual_workflow_graph,
+    "prompt_inspection": build_prompt_inspection_graph,
+    "cinematic_narrative": build_cinematic_narrative_graph,
+    "cinematic_narrative_enriched": build_enriched_cinematic_narrative_graph,
+    "image_generation": build_image_generation_graph,
+    "scene_images": build_scene_image_graph,
+}
+
+_compiled_graphs: Dict[str, Any] = {}
+_compiled_graphs_lock = threading.Lock()
+
+def _traced(name: str, graph):
+    """
+    Binds the shared tracing handler (src.graph.tracing) and names the root run
+    after the registry entry, so every run records graph, node, model and tool
+    spans. Callbacks passed by callers are added to it, not replacing it.
+    """
+    from src.core import config
+    if not config.TRACING_ENABLED:
+        return graph
+    from langchain_core.runnables import RunnableBinding
+    from src.graph.tracing import get_tracing_handler
+    # Not `graph.with_config`: a compiled graph's own config is replaced by the
+    # caller's callbacks, while a binding merges the two lists.
+    return RunnableBinding(bound=graph, config={"callbacks": [get_tracing_handler()], "run_name": name})
+
+def get_compiled_graph(name: str):
+    """Returns the process-wide compiled graph for `name`, building it on first use."""
+    graph = _compiled_graphs.get(name)
+    if graph is not None:
+        return graph
+    if name not in GRAPH_BUILDERS:
+        raise KeyError(f"Unknown workflow graph '{name}'. Available: {sorted(GRAPH_BUILDERS)}")
+    with _compiled_graphs_lock:
+        # Double-checked so concurrent first requests compile the graph only once.
+        graph = _compiled_graphs.get(name)
+        if graph is None:
+            graph = _traced(name, GRAPH_BUILDERS[name]())
+            _compiled_graphs[name] = graph
+    return graph
+
+def get_visual_workflow_graph():
+    return get_compiled_graph("visual_workflow")
+
+def get_fast_visual_workflow_graph():
+    return get_compiled_graph("visual_workflow_fast")
+
+def get_visual_workflow_graph_for_mode(mode: str):
+    """The compiled visual workflow for a pipeline mode ("quality" or "fast")."""
+    return get_fast_visual_workflow_graph() if mode == "fast" else get_visual_workflow_graph()
+
+def get_prompt_inspection_graph():
+    return get_compiled_graph("prompt_inspection")
+
+def get_cinematic_narrative_graph():
+    return get_compiled_graph("cinematic_narrative")
+
+def get_enriched_cinematic_narrative_graph():
+    return get_compiled_graph("cinematic_narrative_enriched")
+
+def get_image_generation_graph():
+    return get_compiled_graph("image_generation")
+
+def get_scene_image_graph():
+    return get_compiled_graph("scene_images")
+
+def clear_compiled_graphs() -> None:
+    """Drops every cached graph so the next request recompiles (e.g. after a code reload)."""
+    with _compiled_graphs_lock:
+        _compiled_graphs.clear()
@@ -0,0 +1,169 @@
+# src/graph/tracing.py
+"""
+LangChain callbacks that record graph runs as spans in the process-wide
+tracer (src.core.tracing). `get_compiled_graph` binds the shared handler to
+every compiled graph. It lives here rather than in `src.core.tracing` so the
+UI can record cache hits and API spans without importing LangChain.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.core.tracing import Tracer, get_tracer
+
+
+@dataclass
+class _Run:
+    trace_id: str
+    graph: str
+    # The nearest enclosing run that is recorded as a span (None at the root).
+    span_parent: Optional[UUID]
+    span: Optional[Dict[str, Any]] = None
+    started: float = 0.0
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _message_bytes(messages: Any) -> int:
+    total = 0
+    for batch in messages:
+        for message in batch:
+            content = getattr(message, "content", message)
+            total += _utf8_len(content if isinstance(content, str) else json.dumps(content, default=str))
+    return total
+
+
+def _usage(response: Any) -> Tuple[int, int]:
+    input_tokens = output_tokens = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callback events into spans. One instance is shared by all
+    graphs; runs are tracked by `run_id` and linked through `parent_run_id`.
+    Runs that are neither graphs, nodes, model calls nor tools (routers,
+    prompt templates, parsers) are tracked only to link their children.
+    """
+
+    # Record on the calling thread: timings stay exact and async runs do not
+    # hop to an executor for every event.
+    run_inline = True
+
+    # Runs abandoned without an end event (e.g. a stream that was not drained)
+    # are dropped, least recently used first, once this many are open. A run
+    # counts as used when it starts and whenever one of its children starts.
+    MAX_OPEN_RUNS = 10_000
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self._tracer = tracer
+        self._lock = threading.Lock()
+        self._runs: "OrderedDict[UUID, _Run]" = OrderedDict()
+
+    @property
+    def tracer(self) -> Tracer:
+        return self._tracer or get_tracer()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind: Optional[str], name: str, **attributes: Any) -> None:
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id else None
+            if parent is not None:
+                self._runs.move_to_end(parent_run_id)
+            while len(self._runs) >= self.MAX_OPEN_RUNS:
+                self._runs.popitem(last=False)
+            run = _Run(
+                trace_id=parent.trace_id if parent else run_id.hex[:16],
+                graph=parent.graph if parent else name,
+                span_parent=(parent_run_id if parent.span is not None else parent.span_parent) if parent else None,
+            )
+            if kind is not None:
+                run.span = {
+                    "trace_id": run.trace_id, "span_id": run_id.hex[:16],
+                    "parent_id": run.span_parent.hex[:16] if run.span_parent else None,
+                    "kind": kind, "name": name, "graph": run.graph, "start": time.time(), **attributes,
+                }
+                run.started = time.perf_counter()
+            self._runs[run_id] = run
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None or run.span is None:
+            return
+        span = {**run.span, **attributes, "duration_ms": (time.perf_counter() - run.started) * 1000}
+        span["status"], span["error"] = ("error", f"{type(error).__name__}: {error}"[:500]) if error is not None else ("ok", None)
+        self.tracer.record(span)
+
+    # --- Graphs and nodes ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        if parent_run_id is None:
+            kind = "graph"
+        elif name != "__start__" and name == (metadata or {}).get("langgraph_node"):
+            kind = "node"
+        else:
+            kind = None
+        self._start(run_id, parent_run_id, kind, name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- Model calls ---
+    def _start_llm(self, serialized, run_id, parent_run_id, metadata, payload_bytes: int, **kwargs) -> None:
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or kwargs.get("name") or (serialized or {}).get("name") or "llm"
+        self._start(run_id, parent_run_id, "llm", model, node=metadata.get("langgraph_node"), payload_bytes=payload_bytes)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, _message_bytes(messages), **kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, sum(map(_utf8_len, prompts)), **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = _usage(response)
+        self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- Tools (web search) ---
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, "tool", name, node=(metadata or {}).get("langgraph_node"), payload_bytes=_utf8_len(input_str or ""))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+_handler: Optional[TracingCallbackHandler] = None
+_handler_lock = threading.Lock()
+
+
+def get_tracing_handler() -> TracingCallbackHandler:
+    """Returns the process-wide callback handler attached to every compiled graph."""
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = TracingCallbackHandler()
+    return _handler
@@ -0,0 +1,73 @@
+# src/jobs/__init__.py
+"""
+Durable background jobs: a SQLite queue (`queue`), worker threads (`worker`)
+and the Stage 4 image-generation jobs that run on them (`image_jobs`).
+"""
+import threading
+from typing import List, Optional
+
+# `worker` loads the .env file before src.core.config is imported; keep it first.
+from src.jobs.worker import PermanentJobError, WorkerPool, retry_delay
+from src.jobs.queue import BatchStatus, JobQueue, QueuedJob, QueueFullError
+from src.jobs.image_jobs import (
+    IMAGE_JOB_KIND, batch_error_message, batch_images, plan_image_jobs, run_image_job,
+)
+from src.core import config
+from src.core.schemas import ImageGenerationParams
+
+JOB_HANDLERS = {IMAGE_JOB_KIND: run_image_job}
+
+_queue: Optional[JobQueue] = None
+_pool: Optional[WorkerPool] = None
+_queue_lock = threading.Lock()
+_pool_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide queue on `config.JOB_DB_PATH`, pruning old finished jobs on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                queue = JobQueue(config.JOB_DB_PATH, lease_seconds=config.JOB_LEASE_SECONDS, max_queued=config.JOB_MAX_QUEUED)
+                queue.purge_finished(config.JOB_RETENTION_SECONDS)
+                _queue = queue
+    return _queue
+
+
+def create_worker_pool(num_workers: Optional[int] = None) -> WorkerPool:
+    """A new (not yet started) pool on the process-wide queue."""
+    return WorkerPool(get_job_queue(), JOB_HANDLERS, num_workers or config.JOB_WORKERS, config.JOB_POLL_SECONDS)
+
+
+def ensure_embedded_workers() -> Optional[WorkerPool]:
+    """Starts this process's worker pool once, if `config.JOB_EMBEDDED_WORKERS` is on."""
+    global _pool
+    if not config.JOB_EMBEDDED_WORKERS:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_worker_pool().start()
+    return _pool
+
+
+def submit_image_generation(params: ImageGenerationParams) -> str:
+    """Queues every image of `params` as one batch and returns its id. Raises `QueueFullError`."""
+    batch_id = get_job_queue().submit(IMAGE_JOB_KIND, plan_image_jobs(params), max_attempts=config.JOB_MAX_ATTEMPTS)
+    pool = ensure_embedded_workers()
+    if pool is not None:
+        pool.wake()
+    return batch_id
+
+
+def get_image_batches(batch_ids: List[str]) -> dict:
+    """Current status of the given batches, by id (unknown or purged ids are left out)."""
+    return get_job_queue().get_batches(batch_ids)
+
+
+__all__ = [
+    "BatchStatus", "JobQueue", "QueuedJob", "QueueFullError", "PermanentJobError", "WorkerPool", "retry_delay",
+    "IMAGE_JOB_KIND", "JOB_HANDLERS", "batch_error_message", "batch_images", "plan_image_jobs", "run_image_job",
+    "get_job_queue", "create_worker_pool", "ensure_embedded_workers", "submit_image_generation", "get_image_batches",
+]
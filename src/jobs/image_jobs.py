@@ -0,0 +1,53 @@
+# src/jobs/image_jobs.py
+"""
+Stage 4 image generation as queued jobs.
+
+A request becomes one job per image (each candidate of each model), so every
+image is retried, capped by its backend and reported on its own. The batch id
+is what the UI and the API hand back to the caller.
+"""
+from typing import Any, Dict, List, Mapping, Optional
+
+from src.core.schemas import GeneratedImage, ImageGenerationParams
+from src.jobs.queue import BatchStatus
+
+IMAGE_JOB_KIND = "image_generation"
+
+
+def plan_image_jobs(params: ImageGenerationParams) -> List[tuple]:
+    """(backend, payload) for every image of the request, in `ImageGenerator.plan_batch` order."""
+    from src.agents.image_generator import ImageGenerator
+
+    plan = ImageGenerator.plan_batch(params)
+    request = params.model_dump(mode="json")
+    return [
+        (ImageGenerator.backend_for(model), {"params": request, "model": model, "candidate": candidate, "batch_size": len(plan)})
+        for model, candidate in plan
+    ]
+
+
+def run_image_job(payload: Mapping[str, Any]) -> Dict[str, Any]:
+    """Job handler: generates one image and returns it as a dict. Raises on failure."""
+    from src.agents.image_generator import get_image_generator
+    from src.core.tracing import span
+
+    params = ImageGenerationParams.model_validate(payload["params"])
+    # The API request and the download are traced as child spans of this one.
+    with span("image_job", kind="job", model=payload["model"]):
+        image = get_image_generator().generate_candidate(params, payload["model"], payload["candidate"], payload["batch_size"])
+    return image.model_dump()
+
+
+def batch_images(batch: BatchStatus) -> List[GeneratedImage]:
+    """The batch's finished images, in plan order."""
+    return [GeneratedImage.model_validate(job.result) for job in batch.jobs if job.status == "succeeded" and job.result]
+
+
+def batch_error_message(batch: BatchStatus) -> Optional[str]:
+    """A summary of the batch's failed images (like `ImageGenerator.run` reports them), or None."""
+    failures = [f"Failed to generate image with {job.payload.get('model')}: {job.error}" for job in batch.jobs if job.status == "failed"]
+    if not failures:
+        return None
+    if len(batch.jobs) == 1:
+        return failures[0]
+    return f"{len(failures)} of {len(batch.jobs)} images failed. " + " | ".join(failures)
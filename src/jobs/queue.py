@@ -0,0 +1,269 @@
+# src/jobs/queue.py
+"""
+A durable job queue in a single SQLite file.
+
+Jobs are rows; a batch is the set of jobs submitted together (for example the
+candidates of one Stage 4 request). Any number of worker threads, in any number
+of processes, can share the file:
+
+- `claim` atomically moves the oldest runnable job to "running" under a lease.
+  It skips backends that already have their concurrency cap of running jobs,
+  counted across every process.
+- A worker that finishes calls `complete`, or `fail` with a retry delay. A
+  failed job goes back to "queued" until it has used `max_attempts`.
+- A worker that dies stops renewing its leases. Once a lease expires, the job
+  is handed to the next claimant (crash recovery).
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Mapping, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+JobStatusName = Literal["queued", "running", "succeeded", "failed"]
+_FINISHED = ("succeeded", "failed")
+
+_COLUMNS = (
+    "id, batch_id, kind, backend, status, payload, result, error, attempts, max_attempts,"
+    " created_at, available_at, started_at, finished_at"
+)
+
+
+class QueueFullError(RuntimeError):
+    """Raised by `submit` when too many jobs are already waiting."""
+
+
+class QueuedJob(BaseModel):
+    id: str
+    batch_id: str
+    kind: str
+    backend: str
+    status: JobStatusName
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 1
+    created_at: float
+    available_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED
+
+
+class BatchStatus(BaseModel):
+    """Every job of one batch, in submission order."""
+    batch_id: str
+    jobs: List[QueuedJob] = Field(default_factory=list)
+
+    def count(self, status: JobStatusName) -> int:
+        return sum(1 for job in self.jobs if job.status == status)
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.jobs) and all(job.finished for job in self.jobs)
+
+    @property
+    def status(self) -> JobStatusName:
+        if not self.finished:
+            return "queued" if all(job.status == "queued" for job in self.jobs) else "running"
+        return "succeeded" if self.count("succeeded") else "failed"
+
+
+def _row_to_job(row: Sequence[Any]) -> QueuedJob:
+    return QueuedJob(
+        id=row[0], batch_id=row[1], kind=row[2], backend=row[3], status=row[4],
+        payload=json.loads(row[5]), result=json.loads(row[6]) if row[6] else None, error=row[7],
+        attempts=row[8], max_attempts=row[9], created_at=row[10], available_at=row[11],
+        started_at=row[12], finished_at=row[13],
+    )
+
+
+class JobQueue:
+    """See the module docstring. Thread-safe; one connection per instance."""
+
+    def __init__(self, path: Union[str, Path], lease_seconds: float = 120.0, max_queued: Optional[int] = None):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE,
+        # so a claim's read and write happen under one write lock.
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, batch_id TEXT NOT NULL, kind TEXT NOT NULL, backend TEXT NOT NULL,"
+                " status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, available_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " lease_expires_at REAL, worker_id TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_runnable ON jobs (status, available_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # --- Producers ---
+    def submit(self, kind: str, jobs: Sequence[Tuple[str, Mapping[str, Any]]], max_attempts: int = 3) -> str:
+        """Enqueues one job per (backend, payload) as a single batch and returns the batch id."""
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction():
+            if self.max_queued is not None:
+                (queued,) = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+                if queued + len(jobs) > self.max_queued:
+                    raise QueueFullError(f"{queued} jobs are already waiting (limit {self.max_queued}).")
+            self._conn.executemany(
+                "INSERT INTO jobs (id, batch_id, kind, backend, status, payload, max_attempts, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                [
+                    (uuid.uuid4().hex, batch_id, kind, backend, json.dumps(payload), max(1, max_attempts), now, now)
+                    for backend, payload in jobs
+                ],
+            )
+        return batch_id
+
+    # --- Workers ---
+    def _requeue_expired_locked(self, now: float) -> None:
+        # Jobs whose worker stopped renewing the lease: retry them, or give up
+        # if that was their last attempt.
+        self._conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, worker_id = NULL,"
+            " error = COALESCE(error, 'The worker running this job stopped responding.')"
+            " WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts",
+            (now, now),
+        )
+        self._conn.execute(
+            "UPDATE jobs SET status = 'queued', available_at = ?, worker_id = NULL"
+            " WHERE status = 'running' AND lease_expires_at < ?",
+            (now, now),
+        )
+
+    def claim(self, worker_id: str, backend_caps: Optional[Mapping[str, int]] = None, kinds: Optional[Sequence[str]] = None) -> Optional[QueuedJob]:
+        """
+        Leases the oldest runnable job to `worker_id`, or returns None. Backends
+        with `backend_caps[backend]` running jobs are skipped; only `kinds` are
+        considered when given.
+        """
+        now = time.time()
+        with self._transaction():
+            self._requeue_expired_locked(now)
+            running = dict(self._conn.execute("SELECT backend, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY backend").fetchall())
+            full = [backend for backend, cap in (backend_caps or {}).items() if running.get(backend, 0) >= cap]
+            query = f"SELECT {_COLUMNS} FROM jobs WHERE status = 'queued' AND available_at <= ?"
+            args: List[Any] = [now]
+            if full:
+                query += f" AND backend NOT IN ({', '.join('?' * len(full))})"
+                args += full
+            if kinds:
+                query += f" AND kind IN ({', '.join('?' * len(kinds))})"
+                args += list(kinds)
+            row = self._conn.execute(query + " ORDER BY available_at, rowid LIMIT 1", args).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?,"
+                " lease_expires_at = ?, worker_id = ? WHERE id = ?",
+                (now, now + self.lease_seconds, worker_id, row[0]),
+            )
+        return _row_to_job(row).model_copy(update={"status": "running", "attempts": row[8] + 1, "started_at": now})
+
+    def renew_leases(self, worker_id: str, job_ids: Sequence[str]) -> None:
+        """Extends the leases of jobs `worker_id` is still running."""
+        if not job_ids:
+            return
+        with self._transaction():
+            self._conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE worker_id = ? AND status = 'running'"
+                f" AND id IN ({', '.join('?' * len(job_ids))})",
+                [time.time() + self.lease_seconds, worker_id, *job_ids],
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: Mapping[str, Any]) -> None:
+        with self._transaction():
+            self._conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, finished_at = ?, worker_id = NULL"
+                " WHERE id = ? AND worker_id = ?",
+                (json.dumps(result), time.time(), job_id, worker_id),
+            )
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_in: Optional[float] = None) -> bool:
+        """
+        Records a failed attempt. With `retry_in` (seconds), the job is queued
+        again unless it has no attempts left. Returns True if it will be retried.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker_id = ?", (job_id, worker_id)).fetchone()
+            if row is None:
+                return False  # the lease was lost and the job handed to another worker
+            retry = retry_in is not None and row[0] < row[1]
+            if retry:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, worker_id = NULL WHERE id = ?",
+                    (error, now + retry_in, job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, worker_id = NULL WHERE id = ?",
+                    (error, now, job_id),
+                )
+        return retry
+
+    # --- Readers ---
+    def get_batch(self, batch_id: str) -> Optional[BatchStatus]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE batch_id = ? ORDER BY rowid", (batch_id,)).fetchall()
+        return BatchStatus(batch_id=batch_id, jobs=[_row_to_job(row) for row in rows]) if rows else None
+
+    def get_batches(self, batch_ids: Sequence[str]) -> Dict[str, BatchStatus]:
+        """The batches that still exist, by id, read in one query."""
+        if not batch_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE batch_id IN ({', '.join('?' * len(batch_ids))}) ORDER BY rowid",
+                list(batch_ids),
+            ).fetchall()
+        batches: Dict[str, BatchStatus] = {}
+        for row in rows:
+            batches.setdefault(row[1], BatchStatus(batch_id=row[1])).jobs.append(_row_to_job(row))
+        return batches
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        """Deletes finished jobs older than the cutoff; returns how many were removed."""
+        with self._transaction():
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (time.time() - older_than_seconds,),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,161 @@
+# src/jobs/worker.py
+"""
+Worker threads that execute queued jobs.
+
+Each worker loops: claim a job, run the handler registered for its kind, then
+record the result. A failure is retried after an exponential backoff with
+jitter, unless the handler raised `PermanentJobError` or the backend rejected
+the request itself (a 4xx other than 408/409/429). A heartbeat thread renews
+the leases of the pool's running jobs, so only a dead process loses them.
+
+The pool runs inside the Streamlit app and the API process by default. It can
+also run on its own, any number of times, against the same queue file:
+
+    poetry run imagecodex-worker [--workers 8]
+"""
+import argparse
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Set
+
+from dotenv import load_dotenv
+
+# --- Load environment variables FIRST (as run_app.py does) ---
+# src.core.config reads its settings when it is imported.
+load_dotenv()
+
+from src.core import config  # noqa: E402
+from src.core.rate_limit import backend_concurrency_caps  # noqa: E402
+from src.jobs.queue import JobQueue, QueuedJob  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Mapping[str, Any]], Mapping[str, Any]]
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix."""
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, PermanentJobError):
+        return False
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 409, 429):
+        return False
+    return True
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff for the given (1-based) attempt, with jitter so retries spread out."""
+    delay = min(config.JOB_RETRY_MAX_SECONDS, config.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WorkerPool:
+    """`num_workers` daemon threads running the `handlers` (by job kind) for jobs from `queue`."""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler], num_workers: int, poll_seconds: float):
+        self.queue = queue
+        self.handlers = handlers
+        self.num_workers = max(1, num_workers)
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> "WorkerPool":
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logger.info(f"Started {self.num_workers} job workers ({self.worker_id}) on {self.queue.path}.")
+        return self
+
+    def wake(self) -> None:
+        """Makes idle workers poll now (e.g. right after a submit in this process)."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                self.queue.renew_leases(self.worker_id, running)
+            except Exception as e:
+                logger.error(f"Could not renew job leases: {e}", exc_info=e)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, backend_concurrency_caps(), kinds=list(self.handlers))
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}", exc_info=e)
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                # E.g. the queue file was locked while recording the outcome. The
+                # worker lives on; the job is retried once its lease expires.
+                logger.error(f"Could not record the outcome of job {job.id[:8]}: {e}", exc_info=e)
+
+    def _run(self, job: QueuedJob) -> None:
+        with self._running_lock:
+            self._running.add(job.id)
+        try:
+            result = self.handlers[job.kind](job.payload)
+        except Exception as e:
+            retryable = _is_retryable(e)
+            delay = retry_delay(job.attempts) if retryable else None
+            retried = self.queue.fail(job.id, self.worker_id, f"{type(e).__name__}: {e}", retry_in=delay)
+            if retried:
+                logger.warning(f"Job {job.id[:8]} ({job.kind}, attempt {job.attempts}/{job.max_attempts}) failed: {e}; retrying in {delay:.1f}s.")
+            else:
+                logger.error(f"Job {job.id[:8]} ({job.kind}) failed after {job.attempts} attempt(s): {e}", exc_info=e)
+        else:
+            self.queue.complete(job.id, self.worker_id, result)
+        finally:
+            with self._running_lock:
+                self._running.discard(job.id)
+
+
+def main(argv=None) -> None:
+    """Runs a standalone worker pool until interrupted."""
+    parser = argparse.ArgumentParser(prog="imagecodex-worker", description="Run ImageCodeX job workers.")
+    parser.add_argument("-w", "--workers", type=int, default=config.JOB_WORKERS, help="Worker threads in this process.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from src.jobs import create_worker_pool
+
+    pool = create_worker_pool(args.workers).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Stopping; running jobs finish or are retried by another worker.")
+        pool.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 # src/ui/__init__.py
-from .visual_prompting_ui import show_visual_prompting_ui
+from .visual_prompting_ui import DEFAULT_VIDEO_BRIEF, show_visual_prompting_ui
 from .stage3_ui import show_stage3_ui
-from .stage4_ui import show_stage4_ui
\ No newline at end of file
+from .stage4_ui import default_generation_params, show_stage4_ui
+from .state_inspector import show_state_inspector
+from .latency_panel import show_latency_panel
\ No newline at end of file
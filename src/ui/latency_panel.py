@@ -0,0 +1,62 @@
+# src/ui/latency_panel.py
+"""
+Sidebar latency panel (a development aid).
+
+Reads the spans the process-wide tracer (src.core.tracing) keeps in memory:
+which Stage 1 node dominates p95, a per-span latency table and the response
+cache hit rates, plus the raw spans and metrics as downloads. Nothing is
+computed until the panel is switched on.
+"""
+from typing import Any, Dict, List
+
+import streamlit as st
+
+from src.core import config
+from src.core.tracing import get_tracer
+
+# The Stage 1 nodes whose p95 the panel compares.
+STAGE1_NODES = ("visual_analyst", "prompt_engineer", "inspector", "fast_visual_prompt")
+
+
+def cache_hit_rates(counts: Dict[tuple, int]) -> List[Dict[str, Any]]:
+    """One row per response cache: lookups and hit rate."""
+    caches = sorted({cache for cache, _ in counts})
+    rows = []
+    for cache in caches:
+        hits, misses = counts.get((cache, "hit"), 0), counts.get((cache, "miss"), 0)
+        rows.append({"cache": cache, "lookups": hits + misses, "hit rate": f"{hits / (hits + misses):.0%}" if hits + misses else "-"})
+    return rows
+
+
+@st.fragment
+def show_latency_panel():
+    """Renders the panel; switching it on or refreshing reruns only this fragment."""
+    if not st.toggle("Show latency panel", key="latency_panel_open"):
+        return
+    if not config.TRACING_ENABLED:
+        st.caption("Tracing is off (IMAGECODEX_TRACING=0).")
+        return
+    tracer = get_tracer()
+    st.button("Refresh", key="latency_panel_refresh")
+    rows = tracer.summary()
+    if not rows:
+        st.caption("No spans recorded yet. Run a stage to collect some.")
+        return
+
+    stage1 = [row for row in rows if row["kind"] == "node" and row["name"] in STAGE1_NODES]
+    if stage1:
+        slowest = max(stage1, key=lambda row: row["p95_ms"])
+        st.metric("Slowest Stage 1 node (p95)", slowest["name"], f"{slowest['p95_ms']:.0f} ms", delta_color="off")
+        st.bar_chart(stage1, x="name", y="p95_ms", horizontal=True, x_label="p95 (ms)", y_label="")
+
+    st.dataframe(
+        rows, hide_index=True, use_container_width=True,
+        column_order=("kind", "name", "count", "p50_ms", "p95_ms", "max_ms", "errors", "input_tokens", "output_tokens"),
+    )
+    cache_rows = cache_hit_rates(tracer.cache_counts())
+    if cache_rows:
+        st.dataframe(cache_rows, hide_index=True, use_container_width=True)
+
+    jsonl_col, prometheus_col = st.columns(2)
+    jsonl_col.download_button("Spans (JSONL)", tracer.export_jsonl(), file_name="imagecodex-spans.jsonl", mime="application/x-ndjson")
+    prometheus_col.download_button("Metrics", tracer.render_prometheus(), file_name="imagecodex-metrics.prom", mime="text/plain")
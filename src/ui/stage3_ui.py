@@ -4,7 +4,9 @@ This file renders the UI for the Stage 3 Cinematic Narrative Engine,
 based on the 2025 Product Development Document.
 """
 import streamlit as st
+from src.core.artifacts import display_source
 from src.core.schemas import NarrativeState
+from src.ui.stage4_ui import MODEL_OPTIONS
 
 def show_stage3_ui(controller):
     """
@@ -74,6 +76,13 @@ def show_stage3_ui(controller):
                 help="Provide a well-known story for thematic or narrative inspiration."
             )
 
+        enriched = st.checkbox(
+            "⚡ Enriched mode",
+            key="stage3_enriched",
+            disabled=is_locked,
+            help="Runs the reference/inspiration search, the StyleBank lookup and a vision analysis of your image in parallel, and feeds all of it to the storyteller."
+        )
+
         submitted = st.form_submit_button("🎬 Generate Cinematic Scene", type="primary", disabled=is_locked)
 
         if submitted:
@@ -81,6 +90,16 @@ def show_stage3_ui(controller):
                 st.warning("Please provide either a text idea or an image to begin.")
             else:
                 image_data = input_image.getvalue() if input_image else None
+
+                # --- LIVE PREVIEW: the scenes render token-by-token while they are written ---
+                col_live_before, col_live_after = st.columns(2)
+                before_placeholder = col_live_before.empty()
+                after_placeholder = col_live_after.empty()
+
+                def render_partial_scenes(partial: dict):
+                    before_placeholder.markdown(f"#### ✨ Before Scene\n{partial.get('before_scene_cinematic') or ''}")
+                    after_placeholder.markdown(f"#### 🔮 After Scene\n{partial.get('after_scene_cinematic') or ''}")
+
                 # This will be passed to a new, updated controller method
                 controller.run_cinematic_narrative_workflow(
                     image_bytes=image_data,
@@ -88,7 +107,9 @@ def show_stage3_ui(controller):
                     genre=genre,
                     mood=mood,
                     inspiration_mode=inspiration_mode,
-                    story_reference=story_reference
+                    story_reference=story_reference,
+                    on_scene_update=render_partial_scenes,
+                    enriched=enriched
                 )
 
     # --- RESET BUTTON (appears outside the form) ---
@@ -111,6 +132,8 @@ def show_stage3_ui(controller):
         with col_before:
             with st.container(border=True):
                 st.markdown("#### ✨ Before Scene")
+                if narrative_state.before_scene_image:
+                    st.image(display_source(narrative_state.before_scene_image.artifact, narrative_state.before_scene_image.image_url, thumbnail=False))
                 st.write(narrative_state.cinematic_output.before_scene_cinematic)
                 with st.expander("🧠 View Image Prompt"):
                     st.code(narrative_state.cinematic_output.before_scene_prompt, language="text")
@@ -118,6 +141,24 @@ def show_stage3_ui(controller):
         with col_after:
             with st.container(border=True):
                 st.markdown("#### 🔮 After Scene")
+                if narrative_state.after_scene_image:
+                    st.image(display_source(narrative_state.after_scene_image.artifact, narrative_state.after_scene_image.image_url, thumbnail=False))
                 st.write(narrative_state.cinematic_output.after_scene_cinematic)
                 with st.expander("🎞️ View Image Prompt"):
-                    st.code(narrative_state.cinematic_output.after_scene_prompt, language="text")
\ No newline at end of file
+                    st.code(narrative_state.cinematic_output.after_scene_prompt, language="text")
+
+        # --- SCENE IMAGES: both prompts are rendered in one parallel step ---
+        with st.container(border=True):
+            st.markdown("#### 🖼️ Visualize Both Scenes")
+            col_model, col_ratio, col_button = st.columns([2, 1, 2])
+            with col_model:
+                scene_model_display = st.selectbox("Model", options=MODEL_OPTIONS.keys(), key="scene_image_model")
+            with col_ratio:
+                scene_aspect_ratio = st.selectbox("Aspect Ratio", options=["16:9", "1:1", "9:16"], key="scene_image_aspect_ratio")
+            with col_button:
+                st.write("")
+                label = "🔁 Regenerate Scene Images" if narrative_state.before_scene_image or narrative_state.after_scene_image else "🎨 Generate Before & After Images"
+                if st.button(label, use_container_width=True):
+                    controller.run_scene_image_workflow(model=MODEL_OPTIONS[scene_model_display], aspect_ratio=scene_aspect_ratio)
+            if controller.state.error_message:
+                st.error(f"An error occurred: {controller.state.error_message}")
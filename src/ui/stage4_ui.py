@@ -1,21 +1,27 @@
 # src/ui/stage4_ui.py
+from typing import Optional
 
 import streamlit as st
-import requests
-import time
-from src.core.schemas import AppState, ImageGenerationParams
-
-# --- Helper function to get image data from a URL (Unchanged) ---
-@st.cache_data(show_spinner=False)
-def get_image_bytes(url: str) -> bytes:
-    """Fetches an image from a URL and returns its content as bytes."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.content
-    except requests.RequestException as e:
-        st.error(f"Failed to download image from URL: {e}")
-        return b""
+from src.core import config
+from src.core.artifacts import display_source, get_artifact_store
+from src.core.blobs import put_blob
+from src.core.gallery import get_gallery_store
+from src.core.schemas import AppState, GeneratedImage, ImageGenerationParams
+from src.jobs import batch_images
+
+def _download_button(img: GeneratedImage, key: str):
+    """Download from the local artifact; images stored before it existed only link to the provider URL."""
+    image_bytes = get_artifact_store().read(img.artifact) if img.artifact else None
+    if image_bytes:
+        st.download_button(
+            label="Download Image 📥",
+            data=image_bytes,
+            file_name=f"imagecodex_{img.model_used}_{img.artifact.digest[:12]}{img.artifact.extension}",
+            mime=img.artifact.mime_type,
+            key=key
+        )
+    else:
+        st.link_button("Open Original 🔗", img.image_url)
 
 # --- Model options dictionary (Unchanged) ---
 MODEL_OPTIONS = {
@@ -24,6 +30,97 @@ MODEL_OPTIONS = {
     "Kandinsky 2.2": "kandinsky-2.2",
 }
 
+def _stage1_prompt(app_state: AppState) -> str:
+    if app_state.image_prompt and app_state.image_prompt.prompt_body:
+        return f"{app_state.image_prompt.prompt_body} {app_state.image_prompt.technical_parameters}"
+    return ""
+
+def default_generation_params(app_state: AppState) -> Optional[ImageGenerationParams]:
+    """What "Generate Image" submits if only the prefilled prompt is used (for speculative prefetch)."""
+    stage1_prompt = _stage1_prompt(app_state)
+    if st.session_state.get("stage4_prompt_source") == stage1_prompt:
+        prompt = st.session_state.get("stage4_prompt", stage1_prompt)
+    else:
+        prompt = stage1_prompt
+    if not prompt:
+        return None
+    return ImageGenerationParams(prompt=prompt, model=next(iter(MODEL_OPTIONS.values())), aspect_ratio="1:1")
+
+def _display_name(model: str) -> str:
+    return next((name for name, backend_name in MODEL_OPTIONS.items() if backend_name == model), model)
+
+@st.fragment(run_every=config.JOB_POLL_SECONDS)
+def _show_pending_batches(controller):
+    """
+    Follows the queued batches: only this fragment reruns on the poll interval.
+    Finished images move into the state, and the full page reruns to show them.
+    """
+    before = len(controller.state.pending_image_batches)
+    running = controller.poll_image_batches()
+    if len(running) < before:
+        st.rerun()
+    for batch in running.values():
+        with st.container(border=True):
+            done = batch.count("succeeded") + batch.count("failed")
+            st.progress(done / len(batch.jobs), text=f"Generating images: {done} of {len(batch.jobs)} done ({batch.count('running')} running)")
+            ready = batch_images(batch)
+            if ready:
+                grid = st.columns(min(len(ready), 4))
+                for index, image in enumerate(ready):
+                    with grid[index % len(grid)]:
+                        st.image(display_source(image.artifact, image.image_url), caption=f"{_display_name(image.model_used)} #{image.metadata.get('candidate', 1)}")
+
+def _go_to_page(page: int):
+    st.session_state.gallery_page = page
+
+@st.fragment
+def _show_gallery(gallery_id: str):
+    """
+    The generation history, one page at a time. Paging and filtering rerun only
+    this fragment, and only the visible page is read from the gallery store.
+    """
+    gallery = get_gallery_store()
+    total = gallery.count(gallery_id)
+    if not total:
+        return
+    st.subheader(f"Generated Images ({total})")
+    facets = gallery.facets(gallery_id)
+    col_models, col_ratios = st.columns(2)
+    with col_models:
+        models = st.multiselect("Model", options=facets["models"], format_func=_display_name, key="gallery_models")
+    with col_ratios:
+        aspect_ratios = st.multiselect("Aspect ratio", options=facets["aspect_ratios"], key="gallery_aspect_ratios")
+
+    count = gallery.count(gallery_id, models, aspect_ratios) if models or aspect_ratios else total
+    page_size = config.GALLERY_PAGE_SIZE
+    pages = max(1, -(-count // page_size))
+    # Back to the first page whenever the filters change.
+    filters = (tuple(models), tuple(aspect_ratios))
+    if st.session_state.get("gallery_filters") != filters:
+        st.session_state.gallery_filters = filters
+        st.session_state.gallery_page = 1
+    page = min(st.session_state.get("gallery_page", 1), pages)
+
+    images = gallery.page(gallery_id, offset=(page - 1) * page_size, limit=page_size, models=models, aspect_ratios=aspect_ratios)
+    grid = st.columns(3)
+    for i, img in enumerate(images):
+        with grid[i % len(grid)], st.container(border=True):
+            display_name = _display_name(img.model_used)
+            # The gallery shows the local thumbnail; the full image is only read for the download.
+            st.image(display_source(img.artifact, img.image_url), caption=f"Generated with {display_name} ({img.metadata.get('aspect_ratio', 'N/A')})")
+            _download_button(img, key=f"download_btn_{(page - 1) * page_size + i}")
+            with st.expander("View Prompt Used"):
+                st.code(img.prompt_used, language='text')
+
+    if pages > 1:
+        col_prev, col_label, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("← Newer", disabled=page <= 1, use_container_width=True, key="gallery_prev", on_click=_go_to_page, args=(page - 1,))
+        with col_label:
+            st.markdown(f"<div style='text-align: center'>Page {page} of {pages}</div>", unsafe_allow_html=True)
+        with col_next:
+            st.button("Older →", disabled=page >= pages, use_container_width=True, key="gallery_next", on_click=_go_to_page, args=(page + 1,))
+
 def show_stage4_ui(app_state: AppState, controller):
     """
     Renders the UI for Stage 4, now with an optional image-to-image feature.
@@ -32,10 +129,10 @@ def show_stage4_ui(app_state: AppState, controller):
     st.markdown("Bring your prompt to life. Select a model and generate a visual representation of your idea.")
 
     # --- Prompt Input (Unchanged) ---
-    stage1_prompt = ""
-    if app_state.image_prompt and app_state.image_prompt.prompt_body:
-        stage1_prompt = f"{app_state.image_prompt.prompt_body} {app_state.image_prompt.technical_parameters}"
-    if 'stage4_prompt' not in st.session_state:
+    stage1_prompt = _stage1_prompt(app_state)
+    # Refill the box whenever Stage 1 writes (or refines) a prompt; edits stick until then.
+    if st.session_state.get("stage4_prompt_source") != stage1_prompt:
+        st.session_state.stage4_prompt_source = stage1_prompt
         st.session_state.stage4_prompt = stage1_prompt
     prompt = st.text_area(
         "📝 **Prompt for Image Generation**",
@@ -73,6 +170,23 @@ def show_stage4_ui(app_state: AppState, controller):
         aspect_ratio = st.selectbox("🖼️ **Aspect Ratio**", options=["1:1", "16:9", "9:16"], help="Select the desired aspect ratio.")
     negative_prompt = st.text_input("🚫 **Negative Prompt (Optional)**", placeholder="e.g., blurry, low quality, text, watermark")
 
+    # --- Batch Mode: several candidates and/or models side by side ---
+    with st.expander("🧪 Batch & Comparison"):
+        col_a, col_b = st.columns(2)
+        with col_a:
+            num_candidates = st.number_input(
+                "Candidates per model", min_value=1, max_value=config.IMAGE_GEN_MAX_CANDIDATES, value=1,
+                help="Generate several images from the same prompt and pick the best one."
+            )
+        with col_b:
+            compare_with = st.multiselect(
+                "Also generate with",
+                options=[name for name in MODEL_OPTIONS if name != selected_model_display],
+                help="Run the same prompt through other models for a side-by-side comparison."
+            )
+        extra_models = [MODEL_OPTIONS[name] for name in compare_with]
+        st.caption("Every image is queued as its own background job: they run concurrently, are retried on failure, and keep running if you leave the page.")
+
     # --- Generate Button (Logic Updated) ---
     if st.button("Generate Image ✨", type="primary", use_container_width=True):
         if not prompt:
@@ -85,12 +199,16 @@ def show_stage4_ui(app_state: AppState, controller):
                 model=model_backend,
                 aspect_ratio=aspect_ratio,
                 negative_prompt=negative_prompt if negative_prompt else None,
-                # NEW: Pass the image bytes to the backend
-                reference_image=reference_image_bytes
+                # The bytes go to the blob store; the params only carry a handle
+                reference_image_ref=put_blob(reference_image_bytes),
+                num_candidates=int(num_candidates),
+                extra_models=extra_models
             )
-            # This part is now an attribute assignment, not a direct state modification
-            controller.state.image_gen_params = params
-            controller.run_image_generation_workflow()
+            # Generation runs on the background job workers; the panel below follows it.
+            controller.submit_image_generation(params)
+
+    if controller.state.pending_image_batches:
+        _show_pending_batches(controller)
 
     st.divider()
 
@@ -98,23 +216,4 @@ def show_stage4_ui(app_state: AppState, controller):
     if app_state.error_message:
         st.error(f"An error occurred: {app_state.error_message}")
 
-    if app_state.generated_images:
-        st.subheader("Generated Images")
-        for i, img in enumerate(reversed(app_state.generated_images)):
-            with st.container(border=True):
-                display_name = next((name for name, backend_name in MODEL_OPTIONS.items() if backend_name == img.model_used), img.model_used)
-                st.image(img.image_url, caption=f"Generated with {display_name} ({img.metadata.get('aspect_ratio', 'N/A')})")
-                
-                image_bytes = get_image_bytes(img.image_url)
-                if image_bytes:
-                    filename = f"imagecodex_{img.model_used}_{int(time.time())}.png"
-                    st.download_button(
-                        label="Download Image 📥",
-                        data=image_bytes,
-                        file_name=filename,
-                        mime="image/png",
-                        key=f"download_btn_{i}"
-                    )
-                
-                with st.expander("View Prompt Used"):
-                    st.code(img.prompt_used, language='text')
\ No newline at end of file
+    _show_gallery(app_state.gallery_id)
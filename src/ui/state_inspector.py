@@ -0,0 +1,70 @@
+# src/ui/state_inspector.py
+"""
+Sidebar inspector for the application state (a development aid).
+
+Dumping the whole `AppState` into `st.json` on every rerun cost as much as
+the rest of the page for large sessions, only to fill a collapsed widget.
+Here nothing is serialised until the inspector is switched on, and even then:
+
+- bytes and blob handles are shown as a size and a short hash;
+- lists are cut to their first few items and long strings are truncated;
+- a table lists each top-level field's JSON size, largest first.
+"""
+from typing import Any, Dict, List
+
+import streamlit as st
+from pydantic import BaseModel
+
+from src.core.blobs import BlobRef
+from src.core.cache import content_hash
+
+MAX_LIST_ITEMS = 5
+MAX_STRING_CHARS = 300
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def summarize(value: Any) -> Any:
+    """A JSON-friendly, size-bounded view of `value`, built without dumping it whole."""
+    if isinstance(value, BlobRef):
+        return f"<blob {_format_bytes(value.size)} sha256:{value.digest[:12]}>"
+    if isinstance(value, (bytes, bytearray)):
+        return f"<bytes {_format_bytes(len(value))} sha256:{content_hash(bytes(value))[:12]}>"
+    if isinstance(value, BaseModel):
+        return {name: summarize(getattr(value, name)) for name in type(value).model_fields}
+    if isinstance(value, dict):
+        return {str(key): summarize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shown = [summarize(item) for item in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            shown.append(f"... {len(value) - MAX_LIST_ITEMS} more ({len(value)} items)")
+        return shown
+    if isinstance(value, str) and len(value) > MAX_STRING_CHARS:
+        return f"{value[:MAX_STRING_CHARS]}... ({len(value)} chars)"
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)[:MAX_STRING_CHARS]
+
+
+def field_sizes(state: BaseModel) -> List[Dict[str, Any]]:
+    """Each top-level field's serialised size, largest first."""
+    sizes = []
+    for name in type(state).model_fields:
+        size = len(state.model_dump_json(include={name}))
+        sizes.append({"field": name, "bytes": size, "size": _format_bytes(size)})
+    return sorted(sizes, key=lambda row: row["bytes"], reverse=True)
+
+
+@st.fragment
+def show_state_inspector(state: BaseModel):
+    """Renders the inspector; switching it on or off reruns only this fragment."""
+    if not st.toggle("Inspect app state", key="state_inspector_open"):
+        return
+    st.dataframe(field_sizes(state), column_order=("field", "size"), hide_index=True, use_container_width=True)
+    st.json(summarize(state), expanded=1)
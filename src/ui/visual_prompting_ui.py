@@ -5,8 +5,24 @@ covering both Stage 1 (Image Prompt) and Stage 2 (Video Prompt).
 """
 
 import streamlit as st
+from ..core.config import CRITIQUE_POLL_SECONDS, FAST_PIPELINE_INSPECT, VISUAL_PIPELINE_MODE
 from ..core.schemas import VideoCreativeBrief
 
+# The Stage 2 form's defaults; the controller may prefetch a video prompt for them.
+DEFAULT_VIDEO_BRIEF = VideoCreativeBrief(
+    moods=["tense", "dreamy", "epic"], camera_movement="slow dolly zoom", additional_notes="Focus on the character's eyes.",
+)
+
+@st.fragment(run_every=CRITIQUE_POLL_SECONDS)
+def _show_pending_critique(controller):
+    """
+    Waits for the background critique of the prompt shown above: only this
+    fragment reruns on the poll interval, and the page reruns once it is ready.
+    """
+    if not controller.poll_prompt_critique():
+        st.rerun()
+    st.caption("🕵️‍♂️ Inspecting the prompt in the background...")
+
 def show_visual_prompting_ui(controller):
     """
     Renders the complete UI for the "Visual Prompting" tab.
@@ -23,8 +39,20 @@ def show_visual_prompting_ui(controller):
     if uploaded_image_s1:
         st.image(uploaded_image_s1, caption="Your uploaded image.", width=300)
         
+        mode_col, inspect_col = st.columns(2)
+        fast_mode = mode_col.toggle(
+            "⚡ Fast mode", value=VISUAL_PIPELINE_MODE == "fast", key="s1_fast_mode",
+            help="Analyze the image and write the prompt in one AI call instead of three steps.",
+        )
+        inspect = inspect_col.checkbox(
+            "Inspect the prompt", value=FAST_PIPELINE_INSPECT, key="s1_fast_inspect", disabled=not fast_mode,
+            help="The high-quality mode always inspects. In fast mode you can also inspect later.",
+        )
+
         if st.button("Analyze and Generate Prompt", type="primary", key="generate_prompt_a_button"):
-            controller.run_visual_workflow(image_bytes=uploaded_image_s1.getvalue())
+            controller.run_visual_workflow(
+                image_bytes=uploaded_image_s1.getvalue(), mode="fast" if fast_mode else "quality", inspect=inspect,
+            )
             # st.rerun() is handled by the controller now
 
     if controller.state.image_prompt:
@@ -41,12 +69,22 @@ def show_visual_prompting_ui(controller):
             st.markdown(f"**Accuracy Score:** <span style='color:{color}; font-weight:bold;'>{score}/10</span>", unsafe_allow_html=True)
             st.info(f"**Critique:** {critique.critique}")
             st.warning(f"**Suggestion:** {critique.suggested_improvement}")
+        elif controller.state.pending_critique:
+            _show_pending_critique(controller)
+        elif controller.state.visual_analysis:
+            if st.button("🕵️‍♂️ Inspect Prompt", key="inspect_prompt_a_button"):
+                controller.run_prompt_inspection()
+                st.rerun()
 
         with st.form("refine_prompt_a_form"):
             feedback = st.text_input("Want changes? Provide feedback.", placeholder="e.g., make it more futuristic, add a sense of urgency")
             submitted = st.form_submit_button("Refine Prompt A")
             if submitted and feedback:
-                controller.run_visual_workflow(feedback=feedback, refinement_target='image')
+                controller.run_visual_workflow(
+                    feedback=feedback, refinement_target='image',
+                    mode="fast" if st.session_state.get("s1_fast_mode", VISUAL_PIPELINE_MODE == "fast") else "quality",
+                    inspect=st.session_state.get("s1_fast_inspect", FAST_PIPELINE_INSPECT),
+                )
                 # st.rerun() is handled by the controller
                 
     st.divider()
@@ -56,7 +94,7 @@ def show_visual_prompting_ui(controller):
     st.markdown("Use an image and a creative brief to generate a cinematic video prompt.")
     
     # Check if we have an image from Stage 1 to use
-    image_for_stage2_available = controller.state.original_image_bytes is not None
+    image_for_stage2_available = controller.state.original_image_ref is not None
     st.info("💡 You can use the image from Stage 1 or upload a new one below.", icon="ℹ️")
 
     uploaded_image_s2 = st.file_uploader("Upload Image for Video (Optional)", type=["png", "jpg", "jpeg"], key="stage2_uploader")
@@ -65,9 +103,9 @@ def show_visual_prompting_ui(controller):
         st.image(uploaded_image_s2, caption="Image for video generation.", width=300)
 
     st.write("##### Creative Brief")
-    moods = st.text_input("Moods (comma-separated)", "tense, dreamy, epic", key="s2_moods")
-    camera = st.text_input("Camera Movement", "slow dolly zoom", key="s2_camera")
-    notes = st.text_area("Additional Notes", "Focus on the character's eyes.", key="s2_notes")
+    moods = st.text_input("Moods (comma-separated)", ", ".join(DEFAULT_VIDEO_BRIEF.moods), key="s2_moods")
+    camera = st.text_input("Camera Movement", DEFAULT_VIDEO_BRIEF.camera_movement, key="s2_camera")
+    notes = st.text_area("Additional Notes", DEFAULT_VIDEO_BRIEF.additional_notes, key="s2_notes")
     
     if st.button("Generate Video Prompt", type="primary", key="generate_prompt_b_button"):
         brief = VideoCreativeBrief(
@@ -76,10 +114,10 @@ def show_visual_prompting_ui(controller):
             additional_notes=notes
         )
         
-        # Use new image if uploaded, otherwise fall back to Stage 1 image
-        image_data = uploaded_image_s2.getvalue() if uploaded_image_s2 else controller.state.original_image_bytes
+        # Use new image if uploaded, otherwise the controller falls back to the Stage 1 image
+        image_data = uploaded_image_s2.getvalue() if uploaded_image_s2 else None
         
-        if not image_data:
+        if not image_data and not image_for_stage2_available:
             st.warning("Please upload an image or run Stage 1 first.")
         else:
             controller.run_visual_workflow(image_bytes=image_data, video_brief=brief)
@@ -0,0 +1,156 @@
+# tests/conftest.py
+"""
+Shared fixtures for the test suite.
+
+Settings are read from the environment when `src.core.config` is imported, so
+every store is pointed at a fresh temporary directory before anything in
+`src` is. The chat chains and the image generator are replaced by local stubs
+(`stub_backends`): the tests never call OpenAI, Replicate or Tavily.
+"""
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+_TMP_DIR = tempfile.mkdtemp(prefix="imagecodex-tests-")
+os.environ.update({
+    "IMAGECODEX_CACHE_DIR": os.path.join(_TMP_DIR, "cache"),
+    "IMAGECODEX_BLOB_DIR": os.path.join(_TMP_DIR, "blobs"),
+    "IMAGECODEX_VISUAL_ANALYSIS_CACHE": "0",
+    "IMAGECODEX_REFERENCE_CACHE_DISK": "0",
+    "IMAGECODEX_VISUAL_PIPELINE_MODE": "quality",
+    "IMAGECODEX_JOB_WORKERS": "2",
+    "IMAGECODEX_JOB_POLL_SECONDS": "0.05",
+    "IMAGECODEX_JOB_RETRY_BASE_SECONDS": "0.05",
+})
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from src.agents import (  # noqa: E402
+    fast_visual_prompt, image_generator, inspector, prompt_engineer, refiner, storytelling_agent, video_director, visual_analyst,
+)
+from src.core import config  # noqa: E402
+from src.core.schemas import ImageGenerationParams, ImagePrompt, PromptCritique, VisualAnalysis, VisualPromptDraft  # noqa: E402
+
+ANALYSIS = VisualAnalysis(
+    main_subject="a lighthouse on a cliff",
+    setting_and_environment="a stormy coastline at dusk",
+    artistic_style="painterly realism",
+    mood_and_atmosphere="brooding",
+    lighting_style="low, warm beam against cold light",
+    color_scheme=["slate blue", "amber"],
+    compositional_notes="rule of thirds, low horizon",
+)
+PROMPT = ImagePrompt(prompt_body="a lighthouse on a cliff in a storm, painterly realism")
+CRITIQUE = PromptCritique(is_accurate=True, accuracy_score=9, critique="Faithful.", suggested_improvement="Mention the waves.")
+VIDEO_PROMPT = "A slow dolly-in on the lighthouse as the beam sweeps the rain."
+STORY = {
+    "before_scene_cinematic": "The keeper climbs the stairs as the storm builds.",
+    "after_scene_cinematic": "At dawn a small boat reaches the harbour.",
+    "before_scene_prompt": "a keeper climbing a spiral staircase, storm outside",
+    "after_scene_prompt": "a small boat entering a calm harbour at dawn",
+}
+
+
+def png_base64(color: str = "red") -> str:
+    """A small PNG, base64-encoded as the API expects."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class StubImageGenerator(image_generator.ImageGenerator):
+    """The real generator with the provider request replaced; `gate` (if set) holds requests until it is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests: List[Tuple[str, str]] = []
+        self.gate: Optional[threading.Event] = None
+        self._lock = threading.Lock()
+
+    def _request_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str]:
+        if self.gate is not None:
+            self.gate.wait(10)
+        with self._lock:
+            self.requests.append((model, params.prompt))
+            return f"https://images.test/{model}/{len(self.requests)}.png", params.prompt
+
+    async def _arequest_one(self, model: str, params: ImageGenerationParams) -> Tuple[str, str]:
+        return self._request_one(model, params)
+
+
+class StubBackends:
+    """The stubbed backends of one test, with the calls each chain received."""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.image_generator = StubImageGenerator()
+
+    def chain(self, name: str, respond):
+        """A chain getter whose chain counts its calls and answers with `respond(inputs)`."""
+        def run(inputs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return respond(inputs)
+        return lambda: RunnableLambda(run)
+
+
+@pytest.fixture(autouse=True)
+def stub_backends(monkeypatch) -> StubBackends:
+    stubs = StubBackends()
+    monkeypatch.setattr(visual_analyst, "get_visual_analyst_chain", stubs.chain("visual_analyst", lambda _: ANALYSIS))
+    monkeypatch.setattr(prompt_engineer, "get_prompt_engineer_chain", stubs.chain("prompt_engineer", lambda _: PROMPT))
+    monkeypatch.setattr(inspector, "get_inspector_chain", stubs.chain("inspector", lambda _: CRITIQUE))
+    monkeypatch.setattr(refiner, "get_refiner_chain", stubs.chain(
+        "refiner", lambda inputs: AIMessage(content=f"{inputs['original_prompt']}, {inputs['user_feedback']}"),
+    ))
+    monkeypatch.setattr(video_director, "get_video_director_chain", stubs.chain("video_director", lambda _: AIMessage(content=VIDEO_PROMPT)))
+    monkeypatch.setattr(fast_visual_prompt, "get_fast_visual_prompt_chain", stubs.chain(
+        "fast_visual_prompt", lambda _: VisualPromptDraft(visual_analysis=ANALYSIS, image_prompt=PROMPT),
+    ))
+    monkeypatch.setattr(storytelling_agent, "get_storyteller_chain", stubs.chain("storyteller", lambda _: dict(STORY)))
+    # Streamed token by token (the fake model splits on whitespace), like the real text chain.
+    monkeypatch.setattr(storytelling_agent, "get_storyteller_text_chain", lambda: (
+        stubs.chain("storyteller", lambda inputs: inputs["initial_idea"])()
+        | GenericFakeChatModel(messages=iter([AIMessage(content=json.dumps(STORY))]))
+    ))
+    monkeypatch.setattr(image_generator, "get_image_generator", lambda: stubs.image_generator)
+    monkeypatch.setattr(image_generator, "archive_image_url", lambda url: None)
+    return stubs
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    """Builds an API client (workers started by its lifespan) with the given request limits."""
+    from src.api import create_app
+
+    clients = []
+
+    def make(max_concurrent: int = config.API_MAX_CONCURRENT_REQUESTS, queue_timeout: float = config.API_QUEUE_TIMEOUT_SECONDS) -> TestClient:
+        monkeypatch.setattr(config, "API_MAX_CONCURRENT_REQUESTS", max_concurrent)
+        monkeypatch.setattr(config, "API_QUEUE_TIMEOUT_SECONDS", queue_timeout)
+        client = TestClient(create_app())
+        client.__enter__()
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+@pytest.fixture
+def client(make_client) -> TestClient:
+    return make_client()
+
+
+def ndjson(response) -> List[dict]:
+    """The events of an NDJSON response."""
+    return [json.loads(line) for line in response.text.splitlines() if line]
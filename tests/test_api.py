@@ -0,0 +1,282 @@
+# tests/test_api.py
+"""The HTTP API end to end, with the stub backends from conftest.py."""
+import asyncio
+import json
+import sys
+import threading
+import time
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+from conftest import ANALYSIS, CRITIQUE, PROMPT, STORY, VIDEO_PROMPT, ndjson, png_base64
+
+import src.api.app  # noqa: F401
+from src.core import config
+
+# `src.api` re-exports the FastAPI instance under the module's name.
+api_app = sys.modules["src.api.app"]
+
+
+def _wait_for_job(client, job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/v1/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Job {job_id} did not finish within {timeout} s.")
+
+
+# ==============================================================================
+# == VISUAL PROMPTING (STAGES 1 & 2)
+# ==============================================================================
+def test_visual_prompt(client, stub_backends):
+    response = client.post("/v1/visual-prompt", json={"image_base64": png_base64()})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["visual_analysis"] == ANALYSIS.model_dump()
+    assert body["image_prompt"] == PROMPT.model_dump()
+    assert body["prompt_critique"] == CRITIQUE.model_dump()
+    assert body["error_message"] is None
+    assert stub_backends.calls == {"visual_analyst": 1, "prompt_engineer": 1, "inspector": 1}
+
+
+def test_visual_prompt_fast_mode(client, stub_backends):
+    response = client.post("/v1/visual-prompt", json={"image_base64": png_base64(), "mode": "fast", "inspect": False})
+
+    assert response.status_code == 200
+    assert response.json()["image_prompt"] == PROMPT.model_dump()
+    assert stub_backends.calls == {"fast_visual_prompt": 1}
+
+
+def test_visual_prompt_stream(client):
+    response = client.post("/v1/visual-prompt?stream=true", json={"image_base64": png_base64()})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = ndjson(response)
+    assert [event["node"] for event in events if event["event"] == "node"] == ["visual_analyst", "prompt_engineer", "inspector"]
+    assert events[-1]["event"] == "result"
+    assert events[-1]["result"]["image_prompt"] == PROMPT.model_dump()
+
+
+def test_visual_prompt_refinement_skips_analysis(client, stub_backends):
+    response = client.post("/v1/visual-prompt", json={
+        "user_feedback": "make it night", "active_prompt_for_refinement": "image", "image_prompt": PROMPT.model_dump(),
+    })
+
+    assert response.status_code == 200
+    assert response.json()["image_prompt"]["prompt_body"] == f"{PROMPT.prompt_body}, make it night"
+    assert stub_backends.calls == {"refiner": 1}
+
+
+def test_visual_prompt_video(client):
+    brief = {"moods": ["brooding"], "camera_movement": "slow dolly-in"}
+    response = client.post("/v1/visual-prompt", json={"image_base64": png_base64(), "video_creative_brief": brief})
+
+    assert response.status_code == 200
+    assert response.json()["video_prompt"] == VIDEO_PROMPT
+
+
+@pytest.mark.parametrize("payload, status", [
+    ({}, 422),
+    ({"image_base64": "not base64!"}, 422),
+])
+def test_visual_prompt_rejects_bad_input(client, payload, status):
+    assert client.post("/v1/visual-prompt", json=payload).status_code == status
+
+
+# ==============================================================================
+# == CINEMATIC NARRATIVE (STAGE 3)
+# ==============================================================================
+def test_cinematic_narrative(client, stub_backends):
+    response = client.post("/v1/cinematic-narrative", json={"initial_idea": "a lighthouse keeper's last night"})
+
+    assert response.status_code == 200
+    output = response.json()["narrative_state"]["cinematic_output"]
+    assert {key: output[key] for key in STORY} == STORY
+    assert stub_backends.calls == {"storyteller": 1}
+
+
+def test_cinematic_narrative_stream(client):
+    response = client.post("/v1/cinematic-narrative?stream=true", json={"initial_idea": "a lighthouse keeper's last night"})
+
+    assert response.status_code == 200
+    events = ndjson(response)
+    scenes = [event["data"] for event in events if event["event"] == "scene"]
+    assert len(scenes) > 1, "the scenes should arrive as they are written"
+    assert scenes[-1]["before_scene_cinematic"] == STORY["before_scene_cinematic"]
+    assert events[-1]["event"] == "result"
+    output = events[-1]["result"]["narrative_state"]["cinematic_output"]
+    assert {key: output[key] for key in STORY} == STORY
+
+
+# ==============================================================================
+# == IMAGE GENERATION (STAGE 4) JOBS
+# ==============================================================================
+def test_image_generation_job(client, stub_backends):
+    response = client.post("/v1/images/generations", json={"prompt": "a lighthouse", "num_candidates": 2})
+
+    assert response.status_code == 202
+    accepted = response.json()
+    assert accepted["status"] == "queued"
+    assert accepted["status_url"] == f"/v1/jobs/{accepted['job_id']}"
+
+    job = _wait_for_job(client, accepted["job_id"])
+    assert job["status"] == "succeeded"
+    assert len(job["images"]) == 2
+    assert all(image["model_used"] == "gpt-4o" and image["image_url"].startswith("https://images.test/") for image in job["images"])
+    assert len(stub_backends.image_generator.requests) == 2
+
+    # A client that connects after the batch has finished still gets every image.
+    events = ndjson(client.get(accepted["events_url"]))
+    assert [event["event"] for event in events] == ["status", "image", "image", "done"]
+    assert events[-1]["job"]["status"] == "succeeded"
+
+
+def test_job_events_stream_progress(client, stub_backends):
+    gate = stub_backends.image_generator.gate = threading.Event()
+    job_id = client.post("/v1/images/generations", json={"prompt": "a lighthouse"}).json()["job_id"]
+
+    threading.Timer(0.3, gate.set).start()
+    events = ndjson(client.get(f"/v1/jobs/{job_id}/events"))
+
+    assert events[0] == {"event": "status", "status": events[0]["status"]}
+    assert events[0]["status"] in ("queued", "running")
+    assert [event["event"] for event in events[-2:]] == ["image", "done"]
+
+
+def test_job_events_stop_without_progress(client, stub_backends, monkeypatch):
+    monkeypatch.setattr(api_app, "_events_idle_timeout", lambda: 0.3)
+    gate = stub_backends.image_generator.gate = threading.Event()
+    try:
+        job_id = client.post("/v1/images/generations", json={"prompt": "a lighthouse"}).json()["job_id"]
+        events = ndjson(client.get(f"/v1/jobs/{job_id}/events"))
+    finally:
+        gate.set()
+
+    assert events[-1]["event"] == "timeout"
+    assert events[-1]["job"]["status"] in ("queued", "running")
+    assert _wait_for_job(client, job_id)["status"] == "succeeded"
+
+
+def test_unknown_job(client):
+    assert client.get("/v1/jobs/does-not-exist").status_code == 404
+    assert client.get("/v1/jobs/does-not-exist/events").status_code == 404
+
+
+# ==============================================================================
+# == REQUEST LIMIT
+# ==============================================================================
+@pytest.fixture
+def blocked_analyst(monkeypatch, stub_backends):
+    """Holds every visual analysis until the returned event is set."""
+    from src.agents import visual_analyst
+
+    gate = threading.Event()
+
+    def analyse(_):
+        gate.wait(10)
+        return ANALYSIS
+
+    monkeypatch.setattr(visual_analyst, "get_visual_analyst_chain", stub_backends.chain("visual_analyst", analyse))
+    yield gate
+    gate.set()
+
+
+def _wait_for_call(stub_backends, name: str, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not stub_backends.calls.get(name):
+        assert time.monotonic() < deadline, f"{name} was never called"
+        time.sleep(0.01)
+
+
+def test_request_limit_rejects_when_full(make_client, stub_backends, blocked_analyst):
+    client = make_client(max_concurrent=1, queue_timeout=0.2)
+    first = {}
+    thread = threading.Thread(target=lambda: first.update(response=client.post("/v1/visual-prompt", json={"image_base64": png_base64()})))
+    thread.start()
+    try:
+        _wait_for_call(stub_backends, "visual_analyst")
+
+        rejected = client.post("/v1/visual-prompt", json={"image_base64": png_base64("blue")})
+        assert rejected.status_code == 429
+        assert rejected.headers["retry-after"] == "5"
+    finally:
+        blocked_analyst.set()
+        thread.join(10)
+
+    assert first["response"].status_code == 200
+    # The slot was released with the first response.
+    assert client.post("/v1/visual-prompt", json={"image_base64": png_base64("green")}).status_code == 200
+
+
+async def _asgi_post(app, path: str, payload: dict, spec_version: str = "2.0", hang_up=None) -> list:
+    """
+    Calls the ASGI app directly (TestClient buffers whole responses, so it
+    cannot hang up mid-stream). `hang_up(message)` decides, per message sent,
+    whether the client is gone: with ASGI spec 2.4 that makes `send` fail,
+    before it the server reports an `http.disconnect`.
+    """
+    body = json.dumps(payload).encode()
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "client": ("testclient", 50000), "server": ("testserver", 80),
+    }
+    messages, gone = [], asyncio.Event()
+    requests = iter([{"type": "http.request", "body": body, "more_body": False}])
+
+    async def receive():
+        request = next(requests, None)
+        if request is not None:
+            return request
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if hang_up is not None and hang_up(message):
+            gone.set()
+            if spec_version == "2.4":
+                raise OSError("Connection reset by peer")
+        messages.append(message)
+
+    try:
+        await asyncio.wait_for(app(scope, receive, send), 5)
+    except ClientDisconnect:
+        pass  # What Starlette raises (to the server) once `send` has failed.
+    return messages
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+@pytest.mark.parametrize("hang_up_on", ["http.response.start", "http.response.body"])
+def test_request_limit_released_by_abandoned_stream(monkeypatch, stub_backends, spec_version, hang_up_on):
+    from src.agents import inspector
+    from src.api import create_app
+
+    monkeypatch.setattr(config, "API_MAX_CONCURRENT_REQUESTS", 1)
+    monkeypatch.setattr(config, "API_QUEUE_TIMEOUT_SECONDS", 0.2)
+    # The inspection waits, so the run still holds the slot when the client
+    # hangs up: before the stream starts or on the visual_analyst event.
+    gate = threading.Event()
+    monkeypatch.setattr(inspector, "get_inspector_chain", stub_backends.chain("inspector", lambda _: gate.wait(10) and CRITIQUE))
+    app = create_app()
+
+    async def scenario():
+        abandoned = await _asgi_post(
+            app, "/v1/visual-prompt?stream=true", {"image_base64": png_base64()}, spec_version,
+            hang_up=lambda message: message["type"] == hang_up_on,
+        )
+        gate.set()
+        return abandoned, await _asgi_post(app, "/v1/visual-prompt", {"image_base64": png_base64("blue")})
+
+    try:
+        abandoned, messages = asyncio.run(scenario())
+    finally:
+        gate.set()
+    assert all(message.get("more_body", False) for message in abandoned if message["type"] == "http.response.body")
+    assert messages[0]["status"] == 200
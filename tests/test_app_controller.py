@@ -0,0 +1,102 @@
+# tests/test_app_controller.py
+"""
+The Streamlit controller (src/app.py) outside a script run: Streamlit's
+session state and query params work in bare mode and `st.rerun` does nothing,
+so the controller's methods can be called directly.
+"""
+import base64
+
+import pytest
+import streamlit as st
+
+from conftest import ANALYSIS, PROMPT, VIDEO_PROMPT, png_base64
+
+import src.app
+from src.app import AppController
+from src.core.blobs import resolve_blob
+from src.core.schemas import VideoCreativeBrief
+
+BRIEF = VideoCreativeBrief(moods=["brooding"], camera_movement="slow dolly-in")
+
+
+def _png_bytes(color: str = "red") -> bytes:
+    return base64.b64decode(png_base64(color))
+
+
+@pytest.fixture
+def controller(monkeypatch) -> AppController:
+    """A controller for a fresh session; a failed run raises instead of being shown."""
+    # Inspected in the graph, so no critique is still running when the stubs are removed.
+    monkeypatch.setattr(src.app, "BACKGROUND_INSPECTION_ENABLED", False)
+    st.session_state.clear()
+    st.query_params.clear()
+
+    def reraise(exception, *args, **kwargs):
+        raise exception
+
+    monkeypatch.setattr(st, "exception", reraise)
+    yield AppController()
+    st.session_state.clear()
+    st.query_params.clear()
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_stage2_uses_the_stage1_image(controller, stub_backends, monkeypatch, use_async):
+    monkeypatch.setattr(src.app, "ASYNC_EXECUTION_ENABLED", use_async)
+    image = _png_bytes()
+
+    controller.run_visual_workflow(image_bytes=image, mode="quality")
+
+    assert controller.state.visual_analysis == ANALYSIS
+    assert controller.state.image_prompt == PROMPT
+    assert resolve_blob(controller.state.original_image_ref) == image
+
+    # No new upload: the controller falls back to the Stage 1 image.
+    controller.run_visual_workflow(video_brief=BRIEF)
+
+    assert controller.state.video_prompt == VIDEO_PROMPT
+    assert controller.state.video_creative_brief == BRIEF
+    assert resolve_blob(controller.state.original_image_ref) == image
+    assert stub_backends.calls["video_director"] == 1
+
+
+def test_stage1_after_stage2_analyses_the_new_image(controller, stub_backends):
+    controller.run_visual_workflow(image_bytes=_png_bytes(), mode="quality")
+    controller.run_visual_workflow(video_brief=BRIEF)
+
+    controller.run_visual_workflow(image_bytes=_png_bytes("blue"), mode="quality")
+
+    assert stub_backends.calls["visual_analyst"] == 2
+    assert stub_backends.calls["video_director"] == 1
+    assert resolve_blob(controller.state.original_image_ref) == _png_bytes("blue")
+
+
+def test_refinement_clears_the_feedback(controller, stub_backends):
+    controller.run_visual_workflow(image_bytes=_png_bytes(), mode="quality")
+
+    controller.run_visual_workflow(feedback="make it night", refinement_target="image")
+
+    assert controller.state.image_prompt.prompt_body == f"{PROMPT.prompt_body}, make it night"
+    assert controller.state.user_feedback is None
+    assert stub_backends.calls["refiner"] == 1
+
+
+def test_stage2_claims_the_video_prompt_speculated_after_stage1(controller, stub_backends, monkeypatch):
+    from src.core.speculation import get_speculative_executor
+    from src.ui import DEFAULT_VIDEO_BRIEF
+
+    monkeypatch.setattr(src.app, "SPECULATION_ENABLED", True)
+    hits = get_speculative_executor().stats()["hits"]
+
+    controller.run_visual_workflow(image_bytes=_png_bytes(), mode="quality")
+    controller.run_visual_workflow(video_brief=DEFAULT_VIDEO_BRIEF)
+
+    assert controller.state.video_prompt == VIDEO_PROMPT
+    assert get_speculative_executor().stats()["hits"] == hits + 1
+    # The speculative run was the only one.
+    assert stub_backends.calls["video_director"] == 1
+
+    # Another brief misses and runs for real.
+    controller.run_visual_workflow(video_brief=BRIEF)
+    assert stub_backends.calls["video_director"] == 2
+    assert get_speculative_executor().stats()["hits"] == hits + 1
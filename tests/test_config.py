@@ -0,0 +1,42 @@
+# tests/test_config.py
+"""Settings parsing (src/core/config.py), in a fresh interpreter since it is read at import."""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PATH_SETTINGS = {
+    "BLOB_DIR": "IMAGECODEX_BLOB_DIR",
+    "CACHE_DIR": "IMAGECODEX_CACHE_DIR",
+    "STYLE_BANK_PATH": "IMAGECODEX_STYLE_BANK_PATH",
+    "ARTIFACT_DIR": "IMAGECODEX_ARTIFACT_DIR",
+    "GALLERY_DB_PATH": "IMAGECODEX_GALLERY_DB_PATH",
+    "JOB_DB_PATH": "IMAGECODEX_JOB_DB_PATH",
+    "TRACE_JSONL_PATH": "IMAGECODEX_TRACE_JSONL_PATH",
+    "METRICS_PATH": "IMAGECODEX_METRICS_PATH",
+}
+
+
+def _load_config(env: dict) -> dict:
+    script = f"import json; from src.core import config; print(json.dumps({{name: str(getattr(config, name)) for name in {list(PATH_SETTINGS)!r}}}))"
+    result = subprocess.run(
+        [sys.executable, "-c", script], env={**os.environ, **env}, capture_output=True, text=True, check=True,
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    return json.loads(result.stdout)
+
+
+def test_path_settings_expand_the_home_directory(tmp_path):
+    home = tmp_path / "home"
+    paths = _load_config({"HOME": str(home), **{variable: f"~/{name.lower()}" for name, variable in PATH_SETTINGS.items()}})
+
+    for name in PATH_SETTINGS:
+        assert paths[name] == str(home / name.lower()), name
+
+
+@pytest.mark.parametrize("name", ["TRACE_JSONL_PATH", "METRICS_PATH"])
+def test_optional_paths_default_to_none(name):
+    assert _load_config({PATH_SETTINGS[name]: ""})[name] == "None"
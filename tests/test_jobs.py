@@ -0,0 +1,178 @@
+# tests/test_jobs.py
+"""The durable job queue (src/jobs/queue.py) and its worker pool."""
+import sqlite3
+import time
+
+import pytest
+
+from src.jobs.queue import JobQueue, QueueFullError
+from src.jobs.worker import WorkerPool
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=0.2)
+    yield queue
+    queue.close()
+
+
+# ==============================================================================
+# == QUEUE
+# ==============================================================================
+def test_claim_fail_retry_complete(queue):
+    batch_id = queue.submit("image", [("openai", {"n": 1})], max_attempts=3)
+    assert queue.get_batch(batch_id).status == "queued"
+
+    job = queue.claim("worker-a")
+    assert (job.batch_id, job.status, job.attempts) == (batch_id, "running", 1)
+    assert queue.claim("worker-b") is None, "a running job is leased to one worker"
+
+    assert queue.fail(job.id, "worker-a", "RateLimitError: slow down", retry_in=0.05)
+    retried = queue.get_batch(batch_id).jobs[0]
+    assert (retried.status, retried.error) == ("queued", "RateLimitError: slow down")
+    assert queue.claim("worker-b") is None, "not before the backoff"
+
+    time.sleep(0.06)
+    job = queue.claim("worker-b")
+    assert job.attempts == 2
+    queue.complete(job.id, "worker-b", {"image_url": "https://images.test/1.png"})
+
+    batch = queue.get_batch(batch_id)
+    assert batch.finished and batch.status == "succeeded"
+    assert (batch.jobs[0].result, batch.jobs[0].error) == ({"image_url": "https://images.test/1.png"}, None)
+
+
+def test_failure_without_retry_or_attempts_left_is_final(queue):
+    batch_id = queue.submit("image", [("openai", {}), ("replicate", {})], max_attempts=1)
+    first, second = queue.claim("worker"), queue.claim("worker")
+
+    assert not queue.fail(first.id, "worker", "BadRequestError", retry_in=None)
+    assert not queue.fail(second.id, "worker", "Timeout", retry_in=0.0)
+
+    batch = queue.get_batch(batch_id)
+    assert [job.status for job in batch.jobs] == ["failed", "failed"]
+    assert batch.status == "failed"
+
+
+def test_expired_lease_hands_the_job_to_another_worker(queue):
+    batch_id = queue.submit("image", [("openai", {})], max_attempts=2)
+    lost = queue.claim("dead-worker")
+
+    time.sleep(0.25)
+    job = queue.claim("worker")
+    assert (job.id, job.attempts) == (lost.id, 2)
+    # The first worker lost the lease: its outcome is ignored.
+    assert not queue.fail(lost.id, "dead-worker", "late", retry_in=0.0)
+    queue.complete(lost.id, "dead-worker", {"late": True})
+    assert queue.get_batch(batch_id).jobs[0].status == "running"
+
+
+def test_renewed_lease_outlives_the_first_one(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=1.0)
+    try:
+        queue.submit("image", [("openai", {})])
+        job = queue.claim("worker")
+        time.sleep(0.6)
+        queue.renew_leases("worker", [job.id])
+        time.sleep(0.6)
+        assert queue.claim("other-worker") is None
+    finally:
+        queue.close()
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(queue):
+    batch_id = queue.submit("image", [("openai", {})], max_attempts=1)
+    queue.claim("dead-worker")
+
+    time.sleep(0.25)
+    assert queue.claim("worker") is None
+    job = queue.get_batch(batch_id).jobs[0]
+    assert job.status == "failed"
+    assert job.error == "The worker running this job stopped responding."
+
+
+def test_claim_respects_backend_caps_and_kinds(queue):
+    queue.submit("image", [("openai", {"n": 1}), ("openai", {"n": 2}), ("replicate", {"n": 3})])
+    queue.submit("other", [("openai", {"n": 4})])
+    caps = {"openai": 1}
+
+    assert queue.claim("worker", caps, kinds=["image"]).payload == {"n": 1}
+    # openai is at its cap, so the replicate job goes next.
+    assert queue.claim("worker", caps, kinds=["image"]).payload == {"n": 3}
+    assert queue.claim("worker", caps, kinds=["image"]) is None
+    assert queue.claim("worker", kinds=["other"]).payload == {"n": 4}
+
+
+def test_submit_refuses_when_too_many_jobs_wait(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", max_queued=2)
+    try:
+        queue.submit("image", [("openai", {}), ("openai", {})])
+        with pytest.raises(QueueFullError):
+            queue.submit("image", [("openai", {})])
+        assert queue.counts() == {"queued": 2}
+    finally:
+        queue.close()
+
+
+def test_purge_finished_keeps_unfinished_jobs(queue):
+    done = queue.submit("image", [("openai", {})])
+    waiting = queue.submit("image", [("openai", {})])
+    job = queue.claim("worker")
+    queue.complete(job.id, "worker", {})
+
+    assert queue.purge_finished(older_than_seconds=0) == 1
+    assert queue.get_batch(done) is None
+    assert queue.get_batch(waiting) is not None
+
+
+def test_batches_survive_reopening_the_file(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    first = JobQueue(path)
+    batch_id = first.submit("image", [("openai", {"n": 1})])
+    first.close()
+
+    second = JobQueue(path)
+    try:
+        assert second.get_batches([batch_id, "unknown"]).keys() == {batch_id}
+        assert second.claim("worker").payload == {"n": 1}
+    finally:
+        second.close()
+
+
+# ==============================================================================
+# == WORKER POOL
+# ==============================================================================
+class FlakyQueue(JobQueue):
+    """Fails to record the first completion, as a locked queue file would."""
+
+    failed_completions = 0
+
+    def complete(self, job_id, worker_id, result):
+        if not self.failed_completions:
+            self.failed_completions += 1
+            raise sqlite3.OperationalError("database is locked")
+        super().complete(job_id, worker_id, result)
+
+
+def test_worker_survives_a_failure_to_record_the_outcome(tmp_path):
+    queue = FlakyQueue(tmp_path / "jobs.sqlite3", lease_seconds=0.3)
+    pool = WorkerPool(queue, {"echo": lambda payload: {"echo": payload["n"]}}, num_workers=1, poll_seconds=0.01).start()
+    try:
+        first = queue.submit("echo", [("local", {"n": 1})])
+        _wait_for(lambda: queue.failed_completions == 1)
+        second = queue.submit("echo", [("local", {"n": 2})])
+
+        # The same (only) worker runs the second job, then the first once its lease expires.
+        _wait_for(lambda: queue.get_batch(second).status == "succeeded")
+        _wait_for(lambda: queue.get_batch(first).status == "succeeded")
+        assert queue.get_batch(first).jobs[0].attempts == 2
+    finally:
+        pool.stop(timeout=5)
+        queue.close()
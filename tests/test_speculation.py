@@ -0,0 +1,96 @@
+# tests/test_speculation.py
+"""SpeculativeExecutor: keyed claims, slots, budget and TTL."""
+import asyncio
+import threading
+
+import pytest
+
+from src.core.speculation import SpeculativeExecutor, speculation_key
+
+
+class FakeGraph:
+    """Streams one node update, optionally after `gate` is set."""
+
+    def __init__(self, update, gate: threading.Event = None):
+        self.update = update
+        self.gate = gate
+        self.runs = 0
+
+    async def astream(self, payload, config=None, stream_mode=None):
+        self.runs += 1
+        if self.gate is not None:
+            await asyncio.to_thread(self.gate.wait, 5)
+        yield {"node": dict(self.update, payload=payload)}
+
+
+def _executor(**overrides) -> SpeculativeExecutor:
+    settings = {"max_in_flight": 4, "session_budget": 10, "budget_window_seconds": 3600.0, "ttl_seconds": 600.0}
+    return SpeculativeExecutor(**{**settings, **overrides})
+
+
+def test_claim_returns_the_updates_for_the_same_key():
+    executor, graph = _executor(), FakeGraph({"video_prompt": "pan"})
+    key = speculation_key("video_prompt", "image", {"moods": ["calm"]})
+
+    assert executor.speculate("session", "video_prompt", key, lambda: graph, "payload")
+
+    assert executor.claim("session", key) == [{"video_prompt": "pan", "payload": "payload"}]
+    # A speculation is used once.
+    assert executor.claim("session", key) is None
+    assert executor.stats()["hits"] == 1
+
+
+def test_claim_misses_other_keys_and_sessions():
+    executor = _executor()
+    key = speculation_key("video_prompt", "image", "brief")
+    executor.speculate("session", "video_prompt", key, lambda: FakeGraph({}), None)
+
+    assert executor.claim("session", speculation_key("video_prompt", "image", "other brief")) is None
+    assert executor.claim("other session", key) is None
+    assert executor.claim("session", key) is not None
+
+
+def test_new_speculation_replaces_the_slot():
+    executor, gate = _executor(), threading.Event()
+    try:
+        executor.speculate("session", "images", "old", lambda: FakeGraph({}, gate), None)
+        executor.speculate("session", "images", "new", lambda: FakeGraph({}), None)
+
+        assert executor.claim("session", "old") is None
+        assert executor.claim("session", "new") is not None
+        assert executor.stats()["cancelled"] == 1
+    finally:
+        gate.set()
+
+
+def test_claim_without_wait_cancels_a_running_speculation():
+    executor, gate = _executor(), threading.Event()
+    try:
+        executor.speculate("session", "images", "key", lambda: FakeGraph({}, gate), None)
+
+        assert executor.claim("session", "key", wait=False) is None
+        assert executor.stats()["cancelled"] == 1
+    finally:
+        gate.set()
+
+
+def test_budget_caps_each_session():
+    executor = _executor(session_budget=3)
+
+    assert executor.speculate("session", "scene_images", "a", lambda: FakeGraph({}), None, cost=2)
+    assert not executor.speculate("session", "images", "b", lambda: FakeGraph({}), None, cost=2)
+    assert executor.speculate("session", "video_prompt", "c", lambda: FakeGraph({}), None, cost=1)
+    # Other sessions have their own budget.
+    assert executor.speculate("other session", "images", "b", lambda: FakeGraph({}), None, cost=2)
+    assert executor.stats()["over_budget"] == 1
+
+
+@pytest.mark.parametrize("ttl_seconds, claimed", [(600.0, True), (0.0, False)])
+def test_unclaimed_results_expire(ttl_seconds, claimed):
+    executor = _executor(ttl_seconds=ttl_seconds)
+    executor.speculate("session", "video_prompt", "key", lambda: FakeGraph({"video_prompt": "pan"}), None)
+    entry = next(iter(executor._entries.values()))
+    entry.future.result(5)
+
+    assert (executor.claim("session", "key") is not None) == claimed
+    assert executor.stats()["expired"] == (0 if claimed else 1)
@@ -0,0 +1,73 @@
+# tests/test_state.py
+"""Graph payloads and node updates applied to AppState (src/core/state.py)."""
+from conftest import ANALYSIS, CRITIQUE, PROMPT
+
+from src.core.blobs import BlobRef
+from src.core.schemas import AppState, GeneratedImage, VideoCreativeBrief, VisualWorkflowState
+from src.core.state import apply_graph_updates, graph_input, iter_node_updates
+
+IMAGE_REF = BlobRef(digest="0" * 64, size=3)
+BRIEF = VideoCreativeBrief(moods=["calm"])
+
+
+def _image(url: str) -> GeneratedImage:
+    return GeneratedImage(image_url=url, model_used="gpt-4o", prompt_used="a lighthouse")
+
+
+def test_graph_input_passes_set_fields_and_overrides():
+    state = AppState(visual_analysis=ANALYSIS, image_prompt=PROMPT)
+
+    payload = graph_input(state, VisualWorkflowState.__annotations__, original_image_ref=IMAGE_REF, inspect_prompt=True)
+
+    assert payload == {"visual_analysis": ANALYSIS, "image_prompt": PROMPT, "original_image_ref": IMAGE_REF, "inspect_prompt": True}
+    # The objects themselves, not copies.
+    assert payload["visual_analysis"] is state.visual_analysis
+
+
+def test_updates_replace_only_the_keys_they_return():
+    state = AppState(visual_analysis=ANALYSIS, image_prompt=PROMPT, prompt_critique=CRITIQUE)
+
+    new_state = apply_graph_updates(state, [{"video_prompt": "pan"}, None, {"prompt_critique": None}])
+
+    assert new_state.video_prompt == "pan"
+    assert new_state.prompt_critique is None
+    assert new_state.visual_analysis is state.visual_analysis
+    # The previous state is left as it was.
+    assert state.prompt_critique == CRITIQUE
+
+
+def test_input_overrides_are_kept_and_later_updates_win():
+    # What the controller applies for a Stage 2 run: the run's inputs, then the node updates.
+    inputs = {"original_image_ref": IMAGE_REF, "video_creative_brief": BRIEF, "user_feedback": "slower", "inspect_prompt": True}
+    updates = [{"video_prompt": "pan"}, {"user_feedback": None}]
+
+    new_state = apply_graph_updates(AppState(), [inputs, *updates])
+
+    assert new_state.original_image_ref == IMAGE_REF
+    assert new_state.video_creative_brief == BRIEF
+    assert new_state.video_prompt == "pan"
+    assert new_state.user_feedback is None
+
+
+def test_graph_only_keys_are_ignored():
+    state = AppState()
+
+    assert apply_graph_updates(state, [{"inspect_prompt": True, "enrichment_phrases": ["x"]}]) is state
+
+
+def test_reducer_fields_accumulate():
+    state = AppState(generated_images=[_image("https://images.test/1.png")])
+
+    new_state = apply_graph_updates(state, [
+        {"generated_images": [_image("https://images.test/2.png")]},
+        {"generated_images": [_image("https://images.test/3.png")]},
+    ])
+
+    assert [image.image_url for image in new_state.generated_images] == [f"https://images.test/{n}.png" for n in (1, 2, 3)]
+    assert len(state.generated_images) == 1
+
+
+def test_iter_node_updates_flattens_stream_chunks():
+    chunks = [{"visual_analyst": {"visual_analysis": ANALYSIS}}, {"__interrupt__": ()}, {"prompt_engineer": {"image_prompt": PROMPT}}]
+
+    assert list(iter_node_updates(chunks)) == [{"visual_analysis": ANALYSIS}, {"image_prompt": PROMPT}]
@@ -0,0 +1,75 @@
+# tests/test_tracing.py
+"""The LangChain tracing handler (src/graph/tracing.py) against a private tracer."""
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+
+from src.core.tracing import Tracer
+from src.graph.tracing import TracingCallbackHandler
+
+
+def _handler(max_open_runs: int = TracingCallbackHandler.MAX_OPEN_RUNS):
+    tracer = Tracer(buffer_spans=100)
+    handler = TracingCallbackHandler(tracer)
+    handler.MAX_OPEN_RUNS = max_open_runs
+    return handler, tracer
+
+
+def _spans(tracer: Tracer) -> dict:
+    return {span["name"]: span for span in tracer.recent_spans()}
+
+
+def test_spans_nest_under_their_graph_and_node():
+    handler, tracer = _handler()
+    graph, node, llm = uuid4(), uuid4(), uuid4()
+
+    handler.on_chain_start({}, {}, run_id=graph, name="visual_workflow")
+    handler.on_chain_start({}, {}, run_id=node, parent_run_id=graph, name="visual_analyst", metadata={"langgraph_node": "visual_analyst"})
+    handler.on_chat_model_start({}, [[HumanMessage(content="hi")]], run_id=llm, parent_run_id=node, metadata={"ls_model_name": "gpt-4o"})
+    for run_id in (llm, node, graph):
+        handler.on_chain_end({}, run_id=run_id)
+
+    spans = _spans(tracer)
+    assert spans["gpt-4o"]["parent_id"] == spans["visual_analyst"]["span_id"]
+    assert spans["visual_analyst"]["parent_id"] == spans["visual_workflow"]["span_id"]
+    assert {span["graph"] for span in spans.values()} == {"visual_workflow"}
+    assert {span["trace_id"] for span in spans.values()} == {spans["visual_workflow"]["trace_id"]}
+
+
+def test_abandoned_runs_are_evicted_before_runs_in_flight():
+    handler, tracer = _handler(max_open_runs=4)
+    # Two streams that were never drained, then a graph still running.
+    for _ in range(2):
+        handler.on_chain_start({}, {}, run_id=uuid4(), name="abandoned")
+    graph, node = uuid4(), uuid4()
+    handler.on_chain_start({}, {}, run_id=graph, name="visual_workflow")
+    handler.on_chain_start({}, {}, run_id=node, parent_run_id=graph, name="inspector", metadata={"langgraph_node": "inspector"})
+
+    # The cap is reached: the oldest abandoned run makes room, not the graph.
+    llm = uuid4()
+    handler.on_chat_model_start({}, [[HumanMessage(content="hi")]], run_id=llm, parent_run_id=node, metadata={"ls_model_name": "gpt-4o"})
+    handler.on_llm_end(None, run_id=llm)
+    handler.on_chain_end({}, run_id=node)
+    handler.on_chain_end({}, run_id=graph)
+
+    spans = _spans(tracer)
+    assert spans["gpt-4o"]["graph"] == "visual_workflow"
+    assert spans["gpt-4o"]["parent_id"] == spans["inspector"]["span_id"]
+    assert len(handler._runs) == 1
+
+
+def test_payload_bytes_counts_utf8_bytes():
+    handler, tracer = _handler()
+    chat, completion, tool = uuid4(), uuid4(), uuid4()
+
+    handler.on_chat_model_start({}, [[HumanMessage(content="café")]], run_id=chat, metadata={"ls_model_name": "chat"})
+    handler.on_llm_start({}, ["naïve", "ok"], run_id=completion, metadata={"ls_model_name": "completion"})
+    handler.on_tool_start({"name": "search"}, "Zürich", run_id=tool)
+    handler.on_llm_end(None, run_id=chat)
+    handler.on_llm_end(None, run_id=completion)
+    handler.on_tool_end("", run_id=tool)
+
+    spans = _spans(tracer)
+    assert spans["chat"]["payload_bytes"] == 5
+    assert spans["completion"]["payload_bytes"] == 8
+    assert spans["search"]["payload_bytes"] == 7